@@ -363,8 +363,8 @@ class ChatThreadAdmin(admin.ModelAdmin):
     
     def sla_status(self, obj):
         status = obj.sla_status
-        color = 'red' if status == 'breached' else 'green'
-        return format_html('<span style="color: {};">{}</span>', color, status.title())
+        color = {'breached': 'red', 'at_risk': 'orange'}.get(status, 'green')
+        return format_html('<span style="color: {};">{}</span>', color, status.replace('_', ' ').title())
     sla_status.short_description = 'SLA Status'
 
 
@@ -373,7 +373,7 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'thread_link', 'sender_link', 'content_preview', 'has_attachments', 'created_at']
     list_filter = ['thread__tenant', 'sender', 'created_at']
     search_fields = ['content', 'thread__incident_id', 'sender__username']
-    readonly_fields = ['hash', 'previous_hash', 'created_at', 'attachment_count']
+    readonly_fields = ['sequence', 'hash', 'previous_hash', 'created_at', 'attachment_count']
     date_hierarchy = 'created_at'
     
     fieldsets = [
@@ -381,7 +381,7 @@ class MessageAdmin(admin.ModelAdmin):
             'fields': ('thread', 'sender', 'content', 'created_at')
         }),
         ('Security & Integrity', {
-            'fields': ('hash', 'previous_hash'),
+            'fields': ('sequence', 'hash', 'previous_hash'),
             'classes': ('collapse',)
         }),
         ('Attachments', {
@@ -0,0 +1,37 @@
+"""
+Renderers for admin API exports
+"""
+
+import csv
+import io
+from rest_framework.renderers import BaseRenderer
+
+
+class UsageReportCSVRenderer(BaseRenderer):
+    """Render a tenant usage report's daily breakdown as CSV (``?format=csv``)"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+    columns = ('date', 'threads_created', 'messages_sent', 'active_users')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        if isinstance(data, dict) and 'daily_breakdown' in data:
+            writer.writerow(self.columns)
+            for row in data['daily_breakdown']:
+                writer.writerow([row[column] for column in self.columns])
+
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                period = data['period']
+                response['Content-Disposition'] = (
+                    f'attachment; filename="usage_report_{period["start_date"]}_{period["end_date"]}.csv"'
+                )
+        else:
+            # Errors and other payloads as key/value rows
+            for key, value in (data or {}).items():
+                writer.writerow([key, value])
+
+        return output.getvalue().encode(self.charset)
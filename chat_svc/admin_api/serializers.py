@@ -45,7 +45,7 @@ class AdminThreadSerializer(serializers.ModelSerializer):
         model = ChatThread
         fields = [
             'id', 'tenant', 'tenant_name', 'incident_id', 'created_at',
-            'sla_status', 'message_count', 'template'
+            'sla_status', 'priority', 'sla_deadline', 'message_count', 'template'
         ]
 
 
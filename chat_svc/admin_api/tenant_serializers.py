@@ -4,12 +4,13 @@ Supports full CRUD operations for all tenant-related settings
 """
 
 from rest_framework import serializers
-from decimal import Decimal
+from django.db.models.manager import BaseManager
 from django.utils import timezone
 from chat_svc.models import (
     Tenant, TenantConfiguration, TenantBilling, 
     TenantTheme, TenantIntegration, User, ChatThread
 )
+from chat_svc.services.tenant_stats import TenantStatsService
 
 
 class TenantConfigurationSerializer(serializers.ModelSerializer):
@@ -158,6 +159,18 @@ class TenantStatsSerializer(serializers.Serializer):
     sla_breached_count = serializers.IntegerField(read_only=True)
     sla_at_risk_count = serializers.IntegerField(read_only=True)
     avg_response_time_hours = serializers.FloatField(read_only=True)
+    
+    # When the snapshot was computed
+    computed_at = serializers.DateTimeField(read_only=True)
+
+
+class TenantListSerializer(serializers.ListSerializer):
+    """Reads every listed tenant's stats snapshot in one pass"""
+
+    def to_representation(self, data):
+        tenants = list(data.all() if isinstance(data, BaseManager) else data)
+        self.context['tenant_stats'] = TenantStatsService.get_many(tenant.id for tenant in tenants)
+        return super().to_representation(tenants)
 
 
 class ComprehensiveTenantSerializer(serializers.ModelSerializer):
@@ -169,102 +182,37 @@ class ComprehensiveTenantSerializer(serializers.ModelSerializer):
     integrations = TenantIntegrationSerializer(many=True, read_only=True)
     stats = TenantStatsSerializer(read_only=True)
     
-    # Computed fields
-    current_user_count = serializers.ReadOnlyField()
-    current_thread_count = serializers.ReadOnlyField()
+    # Computed fields, read from the stats snapshot
+    current_user_count = serializers.SerializerMethodField()
+    current_thread_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Tenant
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
+        list_serializer_class = TenantListSerializer
+
+    def _stats(self, instance):
+        """The tenant's stats snapshot, fetched for the whole list when serializing many"""
+        stats_by_tenant = self.context.setdefault('tenant_stats', {})
+        if instance.id not in stats_by_tenant:
+            stats_by_tenant[instance.id] = TenantStatsService.get(instance)
+        return stats_by_tenant[instance.id]
+
+    def get_current_user_count(self, obj):
+        return self._stats(obj).get('total_users', 0)
+
+    def get_current_thread_count(self, obj):
+        return self._stats(obj).get('threads_today', 0)
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
         
-        # Add computed statistics
-        stats_data = self._calculate_tenant_stats(instance)
-        data['stats'] = stats_data
+        # Embed the stats snapshot
+        data['stats'] = self._stats(instance)
         
         return data
 
-    def _calculate_tenant_stats(self, tenant):
-        """Calculate comprehensive tenant statistics"""
-        from django.db.models import Count, Sum
-        from datetime import timedelta
-        
-        now = timezone.now()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        # Basic counts
-        total_users = tenant.users.filter(is_active=True).count()
-        total_threads = tenant.chatthread_set.count()
-        total_messages = sum(thread.messages.count() for thread in tenant.chatthread_set.all())
-        
-        # Time-based counts
-        messages_today = sum(
-            thread.messages.filter(created_at__gte=today).count() 
-            for thread in tenant.chatthread_set.all()
-        )
-        messages_this_week = sum(
-            thread.messages.filter(created_at__gte=week_ago).count() 
-            for thread in tenant.chatthread_set.all()
-        )
-        messages_this_month = sum(
-            thread.messages.filter(created_at__gte=month_ago).count() 
-            for thread in tenant.chatthread_set.all()
-        )
-        
-        threads_today = tenant.chatthread_set.filter(created_at__gte=today).count()
-        threads_this_week = tenant.chatthread_set.filter(created_at__gte=week_ago).count()
-        threads_this_month = tenant.chatthread_set.filter(created_at__gte=month_ago).count()
-        
-        # Active users (users who sent messages in last 24h)
-        active_users = tenant.users.filter(
-            message__created_at__gte=today,
-            is_active=True
-        ).distinct().count()
-        
-        # Active threads (threads with messages in last 24h)
-        active_threads = tenant.chatthread_set.filter(
-            messages__created_at__gte=today
-        ).distinct().count()
-        
-        # Resource utilization
-        user_limit_utilization = (total_users / tenant.max_users * 100) if tenant.max_users > 0 else 0
-        
-        # SLA metrics
-        config = getattr(tenant, 'config', None)
-        sla_hours = config.default_sla_hours if config else 24
-        sla_threshold = now - timedelta(hours=sla_hours)
-        
-        sla_breached_count = tenant.chatthread_set.filter(created_at__lt=sla_threshold).count()
-        sla_at_risk_count = tenant.chatthread_set.filter(
-            created_at__lt=now - timedelta(hours=sla_hours * 0.8),
-            created_at__gte=sla_threshold
-        ).count()
-        
-        return {
-            'total_users': total_users,
-            'active_users': active_users,
-            'total_threads': total_threads,
-            'active_threads': active_threads,
-            'total_messages': total_messages,
-            'messages_today': messages_today,
-            'messages_this_week': messages_this_week,
-            'messages_this_month': messages_this_month,
-            'threads_today': threads_today,
-            'threads_this_week': threads_this_week,
-            'threads_this_month': threads_this_month,
-            'storage_used_gb': Decimal('0.00'),  # TODO: Calculate actual storage
-            'storage_limit_gb': Decimal('100.00'),  # TODO: Make configurable
-            'user_limit_utilization': user_limit_utilization,
-            'sla_breached_count': sla_breached_count,
-            'sla_at_risk_count': sla_at_risk_count,
-            'avg_response_time_hours': 4.2,  # TODO: Calculate actual response time
-        }
-
 
 class TenantCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating new tenants with initial configuration"""
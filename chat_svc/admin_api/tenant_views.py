@@ -4,15 +4,16 @@ Provides full CRUD operations for tenant settings, billing, themes, and integrat
 """
 
 import json
-from datetime import datetime, timedelta
 from decimal import Decimal
 from django.db import transaction
 from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.conf import settings
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.permissions import IsAdminUser
 from rest_framework.exceptions import ValidationError, PermissionDenied
 
@@ -25,6 +26,10 @@ from .tenant_serializers import (
     TenantConfigurationSerializer, TenantBillingSerializer, 
     TenantThemeSerializer, TenantIntegrationSerializer, TenantStatsSerializer
 )
+from chat_svc.services.response_cache import cached_endpoint
+from chat_svc.services.tenant_stats import TenantStatsService
+from chat_svc.services.usage_reports import UsageReportService
+from .renderers import UsageReportCSVRenderer
 
 
 class TenantConfigurationViewSet(viewsets.ModelViewSet):
@@ -46,7 +51,7 @@ class TenantConfigurationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = self.queryset.select_related(
             'config', 'billing', 'theme'
-        ).prefetch_related('integrations', 'users', 'chatthread_set')
+        ).prefetch_related('integrations')
         
         # Filter by status
         status_filter = self.request.query_params.get('status')
@@ -273,93 +278,43 @@ class TenantConfigurationViewSet(viewsets.ModelViewSet):
         return Response(test_result)
 
     @action(detail=True, methods=['get'])
+    @cached_endpoint('tenant_stats', tenant_kwarg='pk')
     def stats(self, request, pk=None):
         """Get comprehensive tenant statistics"""
         tenant = self.get_object()
         
-        # Use the serializer's statistics calculation
-        serializer = ComprehensiveTenantSerializer(tenant)
-        stats_data = serializer._calculate_tenant_stats(tenant)
-        
-        return Response(stats_data)
+        return Response(TenantStatsService.get(tenant))
 
-    @action(detail=True, methods=['get'])
+    @action(
+        detail=True, methods=['get'],
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, UsageReportCSVRenderer],
+    )
+    @cached_endpoint('tenant_usage_report', tenant_kwarg='pk')
     def usage_report(self, request, pk=None):
-        """Generate detailed usage report for tenant"""
-        tenant = self.get_object()
+        """Generate detailed usage report for tenant
         
-        # Date range
-        days = int(request.query_params.get('days', 30))
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        Covers ``start``..``end`` (ISO dates) or the last ``days`` days, in the
+        tenant's timezone. Add ``?format=csv`` for the daily breakdown as CSV.
+        """
+        tenant = self.get_object()
+        tz = UsageReportService.tenant_timezone(tenant)
         
-        # Daily usage data
-        daily_stats = []
-        current_date = start_date.date()
+        params = request.query_params
+        try:
+            start = parse_date(params['start']) if params.get('start') else None
+            end = parse_date(params['end']) if params.get('end') else None
+            days = int(params.get('days', 30))
+        except ValueError:
+            raise ValidationError({'detail': 'start/end must be YYYY-MM-DD dates and days an integer'})
+        if (params.get('start') and start is None) or (params.get('end') and end is None) or days < 0:
+            raise ValidationError({'detail': 'start/end must be YYYY-MM-DD dates and days non-negative'})
         
-        while current_date <= end_date.date():
-            day_start = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-            day_end = day_start + timedelta(days=1)
-            
-            threads_count = tenant.chatthread_set.filter(
-                created_at__gte=day_start,
-                created_at__lt=day_end
-            ).count()
-            
-            messages_count = sum(
-                thread.messages.filter(
-                    created_at__gte=day_start,
-                    created_at__lt=day_end
-                ).count()
-                for thread in tenant.chatthread_set.all()
-            )
-            
-            daily_stats.append({
-                'date': current_date.isoformat(),
-                'threads_created': threads_count,
-                'messages_sent': messages_count,
-                'active_users': tenant.users.filter(
-                    message__created_at__gte=day_start,
-                    message__created_at__lt=day_end,
-                    is_active=True
-                ).distinct().count()
-            })
-            
-            current_date += timedelta(days=1)
-        
-        # Summary statistics
-        total_threads = tenant.chatthread_set.filter(
-            created_at__gte=start_date
-        ).count()
-        
-        total_messages = sum(
-            thread.messages.filter(created_at__gte=start_date).count()
-            for thread in tenant.chatthread_set.all()
-        )
-        
-        summary = {
-            'period': {
-                'start_date': start_date.date().isoformat(),
-                'end_date': end_date.date().isoformat(),
-                'days': days
-            },
-            'totals': {
-                'threads_created': total_threads,
-                'messages_sent': total_messages,
-                'unique_active_users': tenant.users.filter(
-                    message__created_at__gte=start_date,
-                    is_active=True
-                ).distinct().count()
-            },
-            'averages': {
-                'threads_per_day': total_threads / days if days > 0 else 0,
-                'messages_per_day': total_messages / days if days > 0 else 0,
-                'messages_per_thread': total_messages / total_threads if total_threads > 0 else 0
-            },
-            'daily_breakdown': daily_stats
-        }
+        try:
+            start, end = UsageReportService.resolve_range(tz, start=start, end=end, days=days)
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
         
-        return Response(summary)
+        return Response(UsageReportService.build(tenant, start, end, tz=tz))
 
     @action(detail=True, methods=['post'])
     def suspend(self, request, pk=None):
@@ -408,6 +363,7 @@ class TenantConfigurationViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @cached_endpoint('tenant_overview')
     def overview(self, request):
         """Get system-wide tenant overview"""
         tenants = self.get_queryset()
@@ -428,9 +384,10 @@ class TenantConfigurationViewSet(viewsets.ModelViewSet):
             plan = plan_choice[0]
             plan_stats[plan] = tenants.filter(billing__plan_type=plan).count()
         
-        # Resource utilization
-        total_users = sum(tenant.current_user_count for tenant in tenants)
-        total_threads = sum(tenant.current_thread_count for tenant in tenants)
+        # Resource utilization, counted in one query each
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        total_users = User.objects.filter(tenant__in=tenants, is_active=True).count()
+        total_threads = ChatThread.objects.filter(tenant__in=tenants, created_at__gte=today).count()
         
         # Recent activity
         recent_tenants = tenants.order_by('-created_at')[:5]
@@ -16,6 +16,7 @@ from .views import (
     export_system_data,
     system_health,
     activity_feed,
+    verify_message_chains,
 )
 
 # Import tenant management views
@@ -42,4 +43,7 @@ urlpatterns = [
     
     # Export & Reporting
     path('export/system/', export_system_data, name='admin-export-system'),
+    
+    # Integrity
+    path('integrity/verify/', verify_message_chains, name='admin-verify-chains'),
 ]
\ No newline at end of file
@@ -13,8 +13,9 @@ import csv
 import io
 from datetime import datetime, timedelta
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q, Avg, Max, F, Case, When, IntegerField
-from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.db.models import Count, Q, Avg, Max, F, Case, When, IntegerField, OuterRef, Subquery
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.conf import settings
 from rest_framework import status, viewsets, permissions
@@ -22,19 +23,26 @@ from rest_framework import serializers
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.pagination import PageNumberPagination
 
 from chat_svc.models import (
     ChatThread, Message, QuestionTemplate, Tenant, 
-    User, Device, Attachment, MessageLog, ThreadTemplateResponse
+    User, Device, Attachment, MessageLog, ThreadTemplateResponse, ThreadSubscription
 )
-from integrations import event_bus
 from .serializers import (
     AdminUserSerializer, AdminTenantSerializer, AdminThreadSerializer,
     AdminQuestionTemplateSerializer, UserApprovalSerializer, MessageLogSerializer
 )
 from chat_svc.tenant_api.serializers import MessageSerializer as EnhancedMessageSerializer
+from chat_svc.tenant_api.pagination import MessageCursorPagination
+from chat_svc.services.activity_counters import ActivityCounters
+from chat_svc.services.device_directory import DeviceTokenDirectory
+from chat_svc.services.outbox import OutboxService
+from chat_svc.services.response_cache import cached_endpoint
+from chat_svc.services.sla_service import SLAService
+from integrations import itsm
+from chat_svc.services.thread_sync import ThreadSyncService
 
 User = get_user_model()
 
@@ -60,7 +68,7 @@ class AdminThreadDetailSerializer(AdminThreadSerializer):
             'assigned_to_name': self._get_assigned_user(instance),
             'message_count': messages.count(),
             'participant_count': messages.values('sender').distinct().count(),
-            'last_activity': messages.order_by('-created_at').first().created_at if messages.exists() else instance.created_at,
+            'last_activity': messages.order_by('-sequence').first().created_at if messages.exists() else instance.created_at,
             'escalated': self._is_escalated(instance),
             'priority': self._get_priority(instance),
             'status': self._get_status(instance),
@@ -83,7 +91,7 @@ class AdminThreadDetailSerializer(AdminThreadSerializer):
     
     def _get_assigned_user(self, instance):
         # Check for most recent assignment or default assignee
-        latest_message = instance.messages.order_by('-created_at').first()
+        latest_message = instance.messages.order_by('-sequence').first()
         if latest_message and hasattr(latest_message.sender, 'is_staff') and latest_message.sender.is_staff:
             return latest_message.sender.username
         return None
@@ -93,7 +101,9 @@ class AdminThreadDetailSerializer(AdminThreadSerializer):
         return instance.sla_status == 'breached' or self._get_priority(instance) == 'high'
     
     def _get_priority(self, instance):
-        # Determine priority based on various factors
+        if instance.priority:
+            return instance.priority
+        # No explicit priority: derive one from SLA status
         if instance.sla_status == 'breached':
             return 'high'
         elif instance.sla_status == 'at_risk':
@@ -103,7 +113,7 @@ class AdminThreadDetailSerializer(AdminThreadSerializer):
     
     def _get_status(self, instance):
         # Determine status based on recent activity and messages
-        latest_message = instance.messages.order_by('-created_at').first()
+        latest_message = instance.messages.order_by('-sequence').first()
         if not latest_message:
             return 'open'
         
@@ -118,7 +128,7 @@ class AdminThreadDetailSerializer(AdminThreadSerializer):
     
     def _get_title(self, instance):
         # Extract title from first message or template
-        first_message = instance.messages.order_by('created_at').first()
+        first_message = instance.messages.order_by('sequence').first()
         if first_message:
             content = first_message.content[:100]  # First 100 chars as title
             return content.split('.')[0] if '.' in content else content
@@ -142,19 +152,28 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
     pagination_class = AdminPagination
     
     def retrieve(self, request, pk=None):
-        """Get a single thread with messages for chat interface compatibility"""
+        """Get a single thread with its newest page of messages for the chat interface
+        
+        Older messages are paged through messages/?before=<before_cursor>;
+        ?before= / ?after= / ?page_size= are honoured here too.
+        """
         thread = self.get_object()
+        # From the chain head, not the page: a ?before= page is not the tip.
+        # Read before the page so nothing written meanwhile falls behind it
+        sync_cursor = ThreadSyncService.cursor_for(thread.id)
         
-        # Get all messages for this thread with proper prefetch for read receipts
+        # One page of messages with proper prefetch for read receipts
         messages = thread.messages.select_related('sender').prefetch_related(
             'receipts__user',
             'structured__template',
             'attachments'
-        ).order_by('created_at')
+        )
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
         
         # Use enhanced MessageSerializer to get read receipt data
         message_data = EnhancedMessageSerializer(
-            messages, 
+            page, 
             many=True, 
             context={'request': request}
         ).data
@@ -164,11 +183,15 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
         
         # Add messages array for chat interface compatibility
         thread_data['messages'] = message_data
+        thread_data['has_older_messages'] = paginator.has_older
+        thread_data['before_cursor'] = paginator.first_sequence
+        thread_data['sync_cursor'] = sync_cursor
         
         return Response(thread_data)
     
     def get_queryset(self):
-        qs = self.queryset.select_related('tenant', 'template').prefetch_related('messages__sender')
+        # No message prefetch: that would load and decrypt every thread's full history
+        qs = self.queryset.select_related('tenant', 'template')
         
         # Filtering
         tenant_id = self.request.query_params.get('tenant')
@@ -184,17 +207,11 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
         if tenant_id:
             qs = qs.filter(tenant_id=tenant_id)
         
+        if priority:
+            qs = qs.filter(priority=priority)
+        
         if sla_status:
-            sla_hours = getattr(settings, 'INCIDENT_SLA_HOURS', 24)
-            threshold = timezone.now() - timedelta(hours=sla_hours)
-            at_risk_threshold = timezone.now() - timedelta(hours=sla_hours * 0.8)
-            
-            if sla_status == 'breached':
-                qs = qs.filter(created_at__lt=threshold)
-            elif sla_status == 'at_risk':
-                qs = qs.filter(created_at__lt=at_risk_threshold, created_at__gte=threshold)
-            elif sla_status == 'active':
-                qs = qs.filter(created_at__gte=at_risk_threshold)
+            qs = SLAService.filter_by_status(qs, sla_status)
         
         if search:
             qs = qs.filter(
@@ -219,7 +236,7 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
     def bulk_action(self, request):
         """
         Handle bulk operations on multiple threads
-        Actions: assign, change_status, archive, delete, export, escalate, mark_urgent
+        Actions: assign, change_status, change_priority, archive, delete, export, escalate
         """
         action_type = request.data.get('action')
         thread_ids = request.data.get('thread_ids', [])
@@ -240,6 +257,7 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
                 if user_id:
                     assignee = User.objects.get(id=user_id)
                     for thread in threads:
+                        ThreadSubscription.subscribe(thread.id, [assignee.id], ThreadSubscription.ASSIGNEE)
                         # Create assignment message
                         Message.objects.create(
                             thread=thread,
@@ -267,6 +285,8 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
                         sender=request.user,
                         content=f"Status changed to {new_status}"
                     )
+                    if str(new_status).lower() in ('closed', 'resolved'):
+                        itsm.flush_incident(thread.incident_id, thread.tenant_id)
                     result['processed'] += 1
                 
                 result['message'] = f"Changed status for {result['processed']} threads"
@@ -282,18 +302,23 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
                         sender=request.user,
                         content="Thread archived"
                     )
+                    itsm.flush_incident(thread.incident_id, thread.tenant_id)
                     result['processed'] += 1
                 
                 result['message'] = f"Archived {result['processed']} threads"
             
             elif action_type == 'delete':
+                closing = list(threads.values_list('incident_id', 'tenant_id'))
                 count = threads.count()
                 threads.delete()
+                for incident_id, tenant_id in closing:
+                    itsm.flush_incident(incident_id, tenant_id)
                 result['processed'] = count
                 result['message'] = f"Deleted {count} threads"
             
             elif action_type == 'escalate':
                 for thread in threads:
+                    SLAService.update_thread_priority(thread, ChatThread.PRIORITY_HIGH)
                     Message.objects.create(
                         thread=thread,
                         sender=request.user,
@@ -303,6 +328,21 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
                 
                 result['message'] = f"Escalated {result['processed']} threads"
             
+            elif action_type == 'change_priority':
+                new_priority = params.get('priority') or None
+                if new_priority not in SLAService.PRIORITY_HOURS_FIELDS:
+                    return Response({'error': f'Unknown priority: {new_priority}'}, status=400)
+                for thread in threads:
+                    SLAService.update_thread_priority(thread, new_priority)
+                    Message.objects.create(
+                        thread=thread,
+                        sender=request.user,
+                        content=f"Priority changed to {new_priority or 'default'}"
+                    )
+                    result['processed'] += 1
+                
+                result['message'] = f"Changed priority for {result['processed']} threads"
+            
             else:
                 return Response({'error': f'Unknown action: {action_type}'}, status=400)
         
@@ -316,7 +356,7 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
         data = []
         
         for thread in threads:
-            messages = thread.messages.all().order_by('created_at')
+            messages = thread.messages.all().order_by('sequence')
             thread_data = {
                 'thread_id': thread.id,
                 'incident_id': thread.incident_id,
@@ -365,7 +405,7 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
         thread = self.get_object()
         
         # Get all messages with sender details
-        messages = thread.messages.select_related('sender').order_by('created_at')
+        messages = thread.messages.select_related('sender').order_by('sequence')
         message_data = [{
             'id': msg.id,
             'sender': msg.sender.username,
@@ -408,21 +448,38 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
-        """Get all messages for a thread"""
+        """Get a page of messages for a thread (?before= / ?after= sequence cursors)"""
         thread = self.get_object()
-        messages = thread.messages.select_related('sender').order_by('created_at')
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(
+            thread.messages.select_related('sender'), request, view=self
+        )
         
         message_data = []
-        for msg in messages:
+        for msg in page:
             message_data.append({
                 'id': msg.id,
+                'sequence': msg.sequence,
                 'content': msg.content,
                 'sender': msg.sender.username,
                 'is_admin': msg.sender.is_staff,
                 'created_at': msg.created_at.isoformat(),
             })
         
-        return Response(message_data)
+        return paginator.get_paginated_response(message_data)
+    
+    @action(detail=True, methods=['get'])
+    def sync(self, request, pk=None):
+        """Catch up on a thread since ?cursor= (new messages, receipts, responses, presence)"""
+        thread = self.get_object()
+        cursor = request.query_params.get('cursor')
+        if not cursor:
+            return Response({'error': 'cursor is required'}, status=400)
+        try:
+            limit = int(request.query_params.get('limit', ThreadSyncService.DEFAULT_LIMIT))
+            return Response(ThreadSyncService.sync(thread, cursor, limit=limit, request=request))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
     
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -433,22 +490,32 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
         if not content:
             return Response({'error': 'Content is required'}, status=400)
         
-        # Create the message
-        message = Message.objects.create(
-            thread=thread,
-            sender=request.user,
-            content=content
-        )
-        
-        # Create message log
-        version = MessageLog.objects.filter(message=message).count() + 1
-        MessageLog.objects.create(
-            message=message,
-            thread=thread,
-            sender=request.user,
-            content=content,
-            version=version
-        )
+        with transaction.atomic():
+            # Create the message
+            message = Message.objects.create(
+                thread=thread,
+                sender=request.user,
+                content=content
+            )
+            
+            # Create message log
+            version = MessageLog.objects.filter(message=message).count() + 1
+            MessageLog.objects.create(
+                message=message,
+                thread=thread,
+                sender=request.user,
+                content=content,
+                version=version
+            )
+            
+            # Kafka event, published by the outbox relay once this commits
+            OutboxService.emit("chat-events", {
+                "type": "admin_message_created",
+                "message_id": message.id,
+                "thread_id": thread.id,
+                "admin_id": request.user.id,
+                "timestamp": message.created_at.isoformat(),
+            }, key=thread.id)
         
         # Send real-time notifications using existing service
         from chat_svc.chat_api.services import ChatService
@@ -460,15 +527,6 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
             "is_admin": True,
         })
         
-        # Publish Kafka event
-        event_bus.publish_event("chat-events", {
-            "type": "admin_message_created",
-            "message_id": message.id,
-            "thread_id": thread.id,
-            "admin_id": request.user.id,
-            "timestamp": message.created_at.isoformat(),
-        })
-        
         return Response({
             'message_id': message.id,
             'status': 'sent'
@@ -479,82 +537,107 @@ class AdminThreadViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@cached_endpoint('admin_dashboard')
 def admin_dashboard_stats(request):
     """
     Comprehensive dashboard statistics and KPIs
+    Message, thread and user volumes come from the activity counters, so the
+    number of queries does not grow with the data
     """
     now = timezone.now()
     last_24h = now - timedelta(hours=24)
     last_7d = now - timedelta(days=7)
-    last_30d = now - timedelta(days=30)
     
-    # Thread statistics
-    total_threads = ChatThread.objects.count()
-    active_threads = ChatThread.objects.filter(
-        messages__created_at__gte=last_24h
-    ).distinct().count()
+    # Hourly buckets cover the last 24 hours, daily buckets the trend window
+    hour_start = ActivityCounters.buckets(last_24h)[0][1]
+    trend_start = ActivityCounters.buckets(last_7d)[1][1]
+    hourly, daily = ActivityCounters.recent(hour_start, trend_start)
+    totals = ActivityCounters.totals_by_tenant()
     
-    # SLA calculations
-    sla_hours = getattr(settings, 'INCIDENT_SLA_HOURS', 24)
-    sla_threshold = now - timedelta(hours=sla_hours)
-    at_risk_threshold = now - timedelta(hours=sla_hours * 0.8)
+    # Thread statistics
+    total_threads = sum(t['threads'] for t in totals.values())
+    active_threads = Message.objects.filter(
+        created_at__gte=last_24h
+    ).values('thread_id').distinct().count()
     
-    sla_breached = ChatThread.objects.filter(created_at__lt=sla_threshold).count()
-    sla_at_risk = ChatThread.objects.filter(
-        created_at__lt=at_risk_threshold,
-        created_at__gte=sla_threshold
-    ).count()
+    # SLA and priority breakdowns come from one live query, so their parts
+    # always add up even when the counters lag (e.g. before the backfill).
+    # SLA ranges match SLAService.filter_by_status
+    live_threads = ChatThread.objects.aggregate(
+        total=Count('id'),
+        sla_active=Count('id', filter=Q(sla_warning_at__gte=now)),
+        sla_at_risk=Count('id', filter=Q(sla_warning_at__lt=now, sla_deadline__gte=now)),
+        sla_breached=Count('id', filter=Q(sla_deadline__lt=now)),
+        high=Count('id', filter=Q(priority=ChatThread.PRIORITY_HIGH)),
+        medium=Count('id', filter=Q(priority=ChatThread.PRIORITY_MEDIUM)),
+        low=Count('id', filter=Q(priority=ChatThread.PRIORITY_LOW)),
+    )
+    sla_breached = live_threads['sla_breached']
+    sla_at_risk = live_threads['sla_at_risk']
     
     # User statistics
-    total_users = User.objects.filter(is_active=True).count()
-    pending_approvals = User.objects.filter(is_active=False).count()
+    user_counts = User.objects.aggregate(
+        active=Count('id', filter=Q(is_active=True)),
+        pending=Count('id', filter=Q(is_active=False)),
+    )
+    total_users = user_counts['active']
+    pending_approvals = user_counts['pending']
     online_users = User.objects.filter(
         devices__created_at__gte=last_24h
     ).distinct().count()
     
     # Message statistics
-    total_messages = Message.objects.count()
-    messages_24h = Message.objects.filter(created_at__gte=last_24h).count()
-    messages_7d = Message.objects.filter(created_at__gte=last_7d).count()
+    total_messages = sum(t['messages'] for t in totals.values())
+    messages_24h = sum(bucket['messages'] for bucket in hourly.values())
+    week_start = trend_start + timedelta(days=1)
+    messages_7d = sum(bucket['messages'] for day, bucket in daily.items() if day >= week_start)
     
     # Tenant statistics
-    tenant_stats = Tenant.objects.annotate(
-        thread_count=Count('chatthread'),
-        user_count=Count('users', filter=Q(users__is_active=True)),
-        message_count=Count('chatthread__messages')
-    ).values('id', 'name', 'thread_count', 'user_count', 'message_count')
+    active_users_by_tenant = dict(
+        User.objects.filter(is_active=True).order_by().values_list('tenant_id').annotate(n=Count('id'))
+    )
+    tenant_stats = [{
+        'id': tenant_id,
+        'name': name,
+        'thread_count': totals.get(tenant_id, {}).get('threads', 0),
+        'user_count': active_users_by_tenant.get(tenant_id, 0),
+        'message_count': totals.get(tenant_id, {}).get('messages', 0),
+    } for tenant_id, name in Tenant.objects.values_list('id', 'name')]
     
     # Priority breakdown
-    high_priority = ChatThread.objects.filter(created_at__lt=sla_threshold).count()
-    medium_priority = ChatThread.objects.filter(
-        created_at__lt=at_risk_threshold,
-        created_at__gte=sla_threshold
-    ).count()
-    low_priority = total_threads - high_priority - medium_priority
+    high_priority = live_threads['high']
+    medium_priority = live_threads['medium']
+    low_priority = live_threads['low']
     
     # Recent activity
-    recent_threads = ChatThread.objects.select_related('tenant').order_by('-created_at')[:10]
+    recent_threads = ChatThread.objects.select_related('tenant').annotate(
+        message_count=Subquery(
+            Message.objects.filter(thread=OuterRef('pk')).order_by()
+            .values('thread').annotate(n=Count('id')).values('n')
+        )
+    ).order_by('-created_at')[:10]
     recent_activity = [{
         'id': thread.id,
         'incident_id': thread.incident_id,
         'tenant': thread.tenant.name if thread.tenant else 'Unknown',
         'created_at': thread.created_at.isoformat(),
-        'message_count': thread.messages.count()
+        'message_count': thread.message_count or 0
     } for thread in recent_threads]
     
     # Chart data for trends
     chart_data = {
-        'threads_trend': _get_trend_data(ChatThread, 'created_at', last_7d),
-        'messages_trend': _get_trend_data(Message, 'created_at', last_7d),
+        'threads_trend': _get_trend_data(daily, 'threads', trend_start),
+        'messages_trend': _get_trend_data(daily, 'messages', trend_start),
         'sla_breakdown': {
-            'active': total_threads - sla_at_risk - sla_breached,
+            'active': live_threads['sla_active'],
             'at_risk': sla_at_risk,
             'breached': sla_breached
         },
         'priority_breakdown': {
             'high': high_priority,
             'medium': medium_priority,
-            'low': low_priority
+            'low': low_priority,
+            'unset': live_threads['total'] - high_priority - medium_priority - low_priority
         }
     }
     
@@ -571,7 +654,7 @@ def admin_dashboard_stats(request):
             'messages_24h': messages_24h,
             'messages_7d': messages_7d
         },
-        'tenant_stats': list(tenant_stats),
+        'tenant_stats': tenant_stats,
         'recent_activity': recent_activity,
         'charts': chart_data,
         'system_health': {
@@ -581,23 +664,20 @@ def admin_dashboard_stats(request):
         }
     })
 
-def _get_trend_data(model, date_field, since):
-    """Generate trend data for charts"""
+
+def _get_trend_data(daily, metric, since):
+    """Generate trend data for charts from daily activity counter totals"""
     data = []
     current = since
-    now = timezone.now()
+    today = timezone.localtime(timezone.now()).date()
     
-    while current <= now:
-        next_day = current + timedelta(days=1)
-        count = model.objects.filter(
-            **{f'{date_field}__gte': current, f'{date_field}__lt': next_day}
-        ).count()
-        
+    while current.date() <= today:
+        bucket = daily.get(current, {})
         data.append({
             'date': current.strftime('%Y-%m-%d'),
-            'count': count
+            'count': bucket.get(metric, 0)
         })
-        current = next_day
+        current = timezone.localtime(current + timedelta(days=1)).replace(hour=0)
     
     return data
 
@@ -773,6 +853,7 @@ class AdminUserViewSet(viewsets.ViewSet):
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdminUser])
+@cached_endpoint('manage_tenants')
 def manage_tenants(request):
     """Manage tenant organizations"""
     if request.method == 'GET':
@@ -920,10 +1001,45 @@ def export_system_data(request):
         return response
 
 
+# ===================== INTEGRITY APIs =====================
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def verify_message_chains(request):
+    """
+    Verify message hash chains and stream one JSON result per thread (NDJSON).
+    Only messages written since each thread's last signed checkpoint are re-hashed
+    unless ?full=true is given.
+    """
+    from chat_svc.services.chain_verifier import ChainVerifier
+
+    # Parse filters before streaming starts; a bad id mid-stream would cut the response short
+    try:
+        tenant_id = int(request.GET['tenant']) if request.GET.get('tenant') else None
+        thread_ids = [int(t) for t in request.GET.get('threads', '').split(',') if t.strip()]
+    except ValueError:
+        raise ValidationError({'detail': 'tenant and threads must be integer ids'})
+
+    threads = ChatThread.objects.order_by('id')
+    if tenant_id is not None:
+        threads = threads.filter(tenant_id=tenant_id)
+    if thread_ids:
+        threads = threads.filter(id__in=thread_ids)
+    full = request.GET.get('full', '').lower() == 'true'
+
+    async def stream():
+        # Async so ASGI servers send each line as its thread finishes
+        async for result in ChainVerifier.stream_many(threads.values_list('id', flat=True), full=full):
+            yield json.dumps(result) + '\n'
+
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+
 # ===================== REAL-TIME MONITORING APIs =====================
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@cached_endpoint('system_health', ttl=10)
 def system_health(request):
     """Real-time system health monitoring"""
     now = timezone.now()
@@ -959,6 +1075,10 @@ def system_health(request):
             'warning_count': 2,
             'critical_count': 0
         },
+        # Per-process counters of this worker
+        'caches': {
+            'device_tokens': DeviceTokenDirectory.stats(),
+        },
         'last_updated': now.isoformat()
     }
     
@@ -967,6 +1087,7 @@ def system_health(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@cached_endpoint('activity_feed', ttl=10)
 def activity_feed(request):
     """Real-time activity feed for admin dashboard"""
     limit = int(request.GET.get('limit', 50))
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ChatSvcConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat_svc'
-    verbose_name = 'Chat Service Core'
\ No newline at end of file
+    verbose_name = 'Chat Service Core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -24,6 +24,7 @@ from chat_api import routing
 
 # Import JWT authentication middleware
 from auth.middleware import JWTAuthMiddleware
+from chat_api.pipeline import lifespan
 
 application = ProtocolTypeRouter({
     # Django's ASGI application to handle traditional HTTP requests
@@ -35,4 +36,7 @@ application = ProtocolTypeRouter({
             URLRouter(routing.websocket_urlpatterns)
         )
     ),
+
+    # Drains queued write-behind jobs on shutdown (servers with lifespan support)
+    "lifespan": lifespan,
 })
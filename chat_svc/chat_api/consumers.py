@@ -1,23 +1,31 @@
+import asyncio
 import json
 import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.db.models import Count, Q, Subquery
+from django.utils import timezone
 from chat_svc.models import (
     ChatThread,
     Message,
     ReadReceipt,
-    Device,
+    ThreadReadState,
+    ThreadSubscription,
     StructuredReply,
     MessageLog,
 )
-from integrations import event_bus, push
+from chat_svc.services.notifications import NotificationService
+from chat_svc.services.outbox import OutboxService
+from chat_svc.services.thread_sync import ThreadSyncService
 from channels.layers import get_channel_layer
-import redis.asyncio as redis
+from . import frames, pipeline
+from .services import PresenceService
 
 logger = logging.getLogger(__name__)
-REDIS_PRESENCE_PREFIX = "presence:thread"
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -25,6 +33,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.group_name = f"chat_{self.thread_id}"
         self.username = self.scope["user"].username
         self.user = self.scope["user"]
+        self._pending_reads = set()
+        self._pending_read_through = None
+        self._read_flush_task = None
+        self._write_behind_jobs = set()
 
         if not self.user or isinstance(self.user, AnonymousUser):
             logger.warning("[WS] Rejected unauthenticated connection.")
@@ -47,43 +59,88 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
-        await self._add_online(self.username)
+        self.presence = PresenceService()
+        await self.presence.add_connection(self.thread_id, self.username, self.channel_name)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
 
         await self.channel_layer.group_send(
             self.group_name,
-            {
-                "type": "chat.presence",
-                "user": self.username,
-                "online": True,
-            },
+            frames.event("chat.presence", frames.presence(self.username, True)),
         )
 
         logger.info(f"[WS] {self.username} connected to thread {self.thread_id}")
 
-        current = await self._get_online()
-        for user in current:
-            if user != self.username:
-                await self.send(text_data=json.dumps({
-                    "type": "presence",
-                    "user": user,
-                    "online": True
-                }))
+        current = await self.presence.get_online_users(self.thread_id)
+        await self.send(text_data=json.dumps({
+            "type": "presence_snapshot",
+            "users": [user for user in current if user != self.username],
+        }))
+
+        since = parse_qs(self.scope.get("query_string", b"").decode()).get("since")
+        if since:
+            await self._send_catch_up(since[0])
+
+    async def _send_catch_up(self, cursor):
+        """Replay what the client missed since ``cursor`` as one or more sync frames"""
+        while True:
+            try:
+                delta = await database_sync_to_async(ThreadSyncService.sync)(
+                    self.thread, cursor, include_presence=False
+                )
+            except ValueError as e:
+                await self.send(text_data=json.dumps({"type": "sync_error", "error": str(e)}))
+                return
+            await self.send(text_data=json.dumps({"type": "sync", **delta}, default=str))
+            if not delta["has_more"]:
+                return
+            cursor = delta["cursor"]
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
-        await self._remove_online(self.username)
+        heartbeat = getattr(self, "_heartbeat_task", None)
+        if heartbeat is None:
+            # Connection was rejected before it was registered
+            return
+        heartbeat.cancel()
+
+        if self._read_flush_task is not None:
+            self._read_flush_task.cancel()
+            self._read_flush_task = None
+        await self._flush_reads()
+
+        pending_jobs = getattr(self, "_write_behind_jobs", None)
+        if pending_jobs:
+            # Let this socket's queued audit log and push jobs finish
+            _, unfinished = await asyncio.wait(
+                pending_jobs, timeout=getattr(settings, "CHAT_WRITE_BEHIND_DRAIN_SECONDS", 10)
+            )
+            if unfinished:
+                logger.warning(f"[WS] {len(unfinished)} write-behind jobs still pending for {self.username}")
 
-        await self.channel_layer.group_send(
-            self.group_name,
-            {
-                "type": "chat.presence",
-                "user": self.username,
-                "online": False,
-            },
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        still_online = await self.presence.remove_connection(
+            self.thread_id, self.username, self.channel_name
         )
 
+        if not still_online:
+            await self.channel_layer.group_send(
+                self.group_name,
+                frames.event("chat.presence", frames.presence(self.username, False)),
+            )
+
         logger.info(f"[WS] {self.username} disconnected from thread {self.thread_id}")
 
+    async def _heartbeat(self):
+        """Keep this connection's presence entry alive while the socket is open"""
+        interval = getattr(settings, "PRESENCE_HEARTBEAT_SECONDS", 20)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.presence.refresh_connection(
+                    self.thread_id, self.username, self.channel_name
+                )
+            except Exception:
+                logger.exception(f"[WS] Presence heartbeat failed for {self.username}")
+
     async def receive(self, text_data=None, bytes_data=None):
         if not text_data:
             return
@@ -96,69 +153,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 content = data.get("content", "")
                 structured = data.get("structured")
 
-                msg = Message(thread=self.thread, sender=user, content=content)
-                await database_sync_to_async(msg.save)()
-
-                if structured:
-                    reply = StructuredReply(
-                        message=msg,
-                        template=self.thread.template,
-                        answer=json.dumps(structured)
-                    )
-                    await database_sync_to_async(reply.save)()
-
-                version = await database_sync_to_async(
-                    lambda: MessageLog.objects.filter(message=msg).count() + 1
-                )()
-
-                log = MessageLog(
-                    message=msg,
-                    thread=self.thread,
-                    sender=user,
-                    content=content,
-                    structured=structured or None,
-                    version=version
-                )
-                await database_sync_to_async(log.save)()
-
-                event_bus.publish_event("chat-events", {
-                    "type": "message_created",
-                    "message_id": msg.id,
-                    "thread_id": self.thread.id,
-                    "tenant_id": self.thread.tenant_id,
-                    "sender_id": user.id,
-                })
-
-                tokens = await database_sync_to_async(
-                    lambda: list(
-                        Device.objects.filter(user__tenant_id=self.thread.tenant_id)
-                        .exclude(user=user)
-                        .values_list("token", flat=True)
-                    )
-                )()
-                if tokens:
-                    await sync_to_async(push.send_push)(tokens, "New message", msg.content)
-
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        "type": "chat.message",
-                        "message": {
-                            "id": msg.id,
-                            "content": msg.content,
-                            "sender": user.username,
-                            "created_at": msg.created_at.isoformat(),
-                            "structured": structured or None,
-                            "is_admin": user.is_staff,
-                        },
-                    },
-                )
-
-                await self.send(text_data=json.dumps({
-                    "type": "confirmation",
-                    "status": "saved",
-                    "message_id": msg.id,
-                }))
+                msg = await database_sync_to_async(self._save_message)(content, structured)
+
+                if pipeline.is_enabled():
+                    # Confirm as soon as the row is durable; the rest is write-behind
+                    await self._broadcast_message(msg, structured)
+                    job = await pipeline.get_stage().submit(self._after_save, msg, content, structured)
+                    self._write_behind_jobs.add(job)
+                    job.add_done_callback(self._write_behind_jobs.discard)
+                else:
+                    await self._after_save(msg, content, structured)
+                    await self._broadcast_message(msg, structured)
             except Exception as e:
                 logger.exception(f"[WS] Failed to save message: {e}")
                 await self.send(text_data=json.dumps({
@@ -169,84 +174,188 @@ class ChatConsumer(AsyncWebsocketConsumer):
         elif msg_type == "typing":
             await self.channel_layer.group_send(
                 self.group_name,
-                {"type": "chat.typing", "user": user.username},
+                frames.event("chat.typing", frames.typing(user.username)),
             )
 
         elif msg_type == "read":
-            msg_id = data.get("message_id")
-            if not msg_id:
-                return
-
+            # Accepts {"message_id": id}, {"message_ids": [...]} and/or
+            # {"through_message_id": id} (everything up to and including id)
+            ids = data.get("message_ids") or []
+            if data.get("message_id"):
+                ids = [*ids, data["message_id"]]
+            through = data.get("through_message_id")
             try:
-                # Fetch the message
-                message = await database_sync_to_async(Message.objects.get)(id=msg_id)
-            except Message.DoesNotExist:
-                logger.warning(f"[WS] Tried to read nonexistent message {msg_id}")
+                ids = {int(i) for i in ids}
+                through = int(through) if through else None
+            except (TypeError, ValueError):
+                logger.warning(f"[WS] Ignored malformed read frame from {user.username}")
                 return
-
-            # 1) Don’t let users mark their own messages as seen
-            if message.sender_id == user.id:
-                logger.info(f"[WS] Skipped read receipt: {user.username} is sender of message {msg_id}")
+            if not ids and not through:
                 return
 
-            # 2) Avoid duplicate receipts
-            seen_qs = ReadReceipt.objects.filter(message=message, user=user)
-            already_seen = await database_sync_to_async(seen_qs.exists)()
-            if already_seen:
-                return
+            self._pending_reads |= ids
+            if through:
+                self._pending_read_through = max(self._pending_read_through or 0, through)
+            if self._read_flush_task is None:
+                self._read_flush_task = asyncio.create_task(self._flush_reads_later())
+
+    async def _flush_reads_later(self):
+        await asyncio.sleep(getattr(settings, "READ_RECEIPT_COALESCE_MS", 250) / 1000)
+        self._read_flush_task = None
+        await self._flush_reads()
+
+    async def _flush_reads(self):
+        """Write all read events coalesced in this window and broadcast them once"""
+        ids, through = self._pending_reads, self._pending_read_through
+        self._pending_reads, self._pending_read_through = set(), None
+        if not ids and not through:
+            return
 
-            # 3) Create the receipt and broadcast
-            receipt = await database_sync_to_async(ReadReceipt.objects.create)(
-                message=message, user=user
-            )
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "chat.read",
-                    "message_id": msg_id,
-                    "user": user.username,
-                    "timestamp": receipt.timestamp.isoformat(),
-                    "read_count": await database_sync_to_async(
-                        lambda: message.receipts.count()
-                    )(),
-                },
+        try:
+            timestamp, read_counts = await database_sync_to_async(self._record_reads)(ids, through)
+        except Exception:
+            logger.exception(f"[WS] Failed to record read receipts for {self.username}")
+            return
+        if not read_counts:
+            return
+
+        await self.channel_layer.group_send(
+            self.group_name,
+            frames.event("chat.read", frames.read(
+                sorted(int(i) for i in read_counts),
+                read_counts,
+                self.username,
+                timestamp.isoformat(),
+            )),
+        )
+
+    def _record_reads(self, message_ids, through_message_id):
+        """Bulk-insert receipts for readable messages and return {message_id: read_count}"""
+        user = self.user
+        selector = Q(id__in=message_ids)
+        if through_message_id:
+            through_sequence = Message.objects.filter(
+                id=through_message_id, thread_id=self.thread.id
+            ).values("sequence")[:1]
+            selector |= Q(sequence__lte=Subquery(through_sequence))
+
+        # Users never mark their own messages as seen
+        candidates = set(
+            Message.objects.filter(thread_id=self.thread.id)
+            .exclude(sender=user)
+            .filter(selector)
+            .values_list("id", flat=True)
+        )
+        if not candidates:
+            return None, {}
+
+        already_seen = set(
+            ReadReceipt.objects.filter(user=user, message_id__in=candidates)
+            .values_list("message_id", flat=True)
+        )
+        new_ids = candidates - already_seen
+        if not new_ids:
+            return None, {}
+
+        timestamp = timezone.now()
+        ReadReceipt.objects.bulk_create(
+            [ReadReceipt(message_id=i, user=user, timestamp=timestamp) for i in new_ids],
+            ignore_conflicts=True,
+        )
+        ThreadReadState.advance(user.id, self.thread.id, timestamp)
+        # String keys: the channel layer's msgpack codec rejects integer map keys
+        read_counts = {
+            str(message_id): count
+            for message_id, count in ReadReceipt.objects.filter(message_id__in=new_ids)
+            .values("message_id")
+            .annotate(count=Count("id"))
+            .values_list("message_id", "count")
+        }
+        return timestamp, read_counts
+
+    def _save_message(self, content, structured=None):
+        """Persist the message row, its hash-chain link, structured reply and outbox event in one transaction"""
+        with transaction.atomic():
+            msg = Message(thread=self.thread, sender=self.user, content=content)
+            msg.save()
+            ThreadSubscription.subscribe_sender(self.thread.id, self.user)
+            if structured:
+                StructuredReply.objects.create(
+                    message=msg,
+                    template=self.thread.template,
+                    answer=json.dumps(structured)
+                )
+            OutboxService.emit("chat-events", {
+                "type": "message_created",
+                "message_id": msg.id,
+                "thread_id": self.thread.id,
+                "tenant_id": self.thread.tenant_id,
+                "sender_id": self.user.id,
+            }, key=self.thread.id)
+        return msg
+
+    def _save_audit_records(self, msg, content, structured):
+        """Write the message log entry"""
+        with transaction.atomic():
+            version = MessageLog.objects.filter(message=msg).count() + 1
+            MessageLog.objects.create(
+                message=msg,
+                thread=self.thread,
+                sender=self.user,
+                content=content,
+                structured=structured or None,
+                version=version
             )
 
+    async def _after_save(self, msg, content, structured):
+        """Side effects of a saved message: audit trail and push"""
+        await database_sync_to_async(self._save_audit_records)(msg, content, structured)
 
-    async def chat_message(self, event):
-        await self.send(text_data=json.dumps({"type": "message", **event["message"]}))
+        await database_sync_to_async(NotificationService.notify_message)(self.thread, msg)
 
-    async def chat_typing(self, event):
-        await self.send(text_data=json.dumps({"type": "typing", "user": event["user"]}))
+    async def _broadcast_message(self, msg, structured):
+        user = self.user
+        await self.channel_layer.group_send(
+            self.group_name,
+            frames.event("chat.message", frames.message({
+                "id": msg.id,
+                "sequence": msg.sequence,
+                "content": msg.content,
+                "sender": user.username,
+                "created_at": msg.created_at.isoformat(),
+                "structured": structured or None,
+                "is_admin": user.is_staff,
+            })),
+        )
 
-    async def chat_read(self, event):
         await self.send(text_data=json.dumps({
-            "type": "read",
-            "message_id": event["message_id"],
-            "user": event["user"],
-            "timestamp": event.get("timestamp"),
-            "read_count": event.get("read_count", 1),
+            "type": "confirmation",
+            "status": "saved",
+            "message_id": msg.id,
         }))
 
-    async def chat_presence(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "presence",
-            "user": event["user"],
-            "online": event["online"],
-        }))
+    # Group events normally carry a frame pre-encoded by the sender (see
+    # frames.py); the structured fallback covers events from older senders.
 
-    def _redis(self):
-        return redis.Redis.from_url("redis://localhost")
+    async def chat_message(self, event):
+        await self.send(text_data=event.get("frame") or frames.message(event["message"]))
 
-    async def _add_online(self, username):
-        r = self._redis()
-        await r.sadd(f"{REDIS_PRESENCE_PREFIX}:{self.thread_id}", username)
+    async def chat_typing(self, event):
+        await self.send(text_data=event.get("frame") or frames.typing(event["user"]))
 
-    async def _remove_online(self, username):
-        r = self._redis()
-        await r.srem(f"{REDIS_PRESENCE_PREFIX}:{self.thread_id}", username)
+    async def chat_read(self, event):
+        frame = event.get("frame")
+        if frame is None:
+            if "message_ids" in event:
+                message_ids = event["message_ids"]
+                read_counts = event["read_counts"]
+            else:
+                message_ids = [event["message_id"]]
+                read_counts = {str(event["message_id"]): event.get("read_count", 1)}
+            frame = frames.read(message_ids, read_counts, event["user"], event.get("timestamp"))
+        await self.send(text_data=frame)
 
-    async def _get_online(self):
-        r = self._redis()
-        users = await r.smembers(f"{REDIS_PRESENCE_PREFIX}:{self.thread_id}")
-        return [u.decode("utf-8") for u in users]
+    async def chat_presence(self, event):
+        await self.send(
+            text_data=event.get("frame") or frames.presence(event["user"], event["online"])
+        )
@@ -0,0 +1,51 @@
+"""
+Pre-encoded WebSocket frames for channel-layer broadcasts.
+
+A group event carries the client-facing JSON text under ``"frame"``, encoded
+once by whoever calls ``group_send``. Each receiving ChatConsumer forwards
+that text unchanged instead of running ``json.dumps`` per connection, so a
+broadcast costs one serialization no matter how large the group is.
+
+Events without a ``"frame"`` (sent by code that predates this module) are
+still encoded by the consumer from their structured fields.
+"""
+
+import json
+
+
+def encode(payload) -> str:
+    """Serialize a client frame to the text sent over the socket."""
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+def message(message: dict) -> str:
+    return encode({"type": "message", **message})
+
+
+def typing(user: str) -> str:
+    return encode({"type": "typing", "user": user})
+
+
+def presence(user: str, online: bool) -> str:
+    return encode({"type": "presence", "user": user, "online": online})
+
+
+def read(message_ids, read_counts, user: str, timestamp=None) -> str:
+    """Read-receipt frame; ``read_counts`` is keyed by stringified message id"""
+    frame = {
+        "type": "read",
+        "message_ids": message_ids,
+        "read_counts": read_counts,
+        "user": user,
+        "timestamp": timestamp,
+    }
+    if len(message_ids) == 1:
+        # Single-message shape understood by older clients
+        frame["message_id"] = message_ids[0]
+        frame["read_count"] = read_counts[str(message_ids[0])]
+    return encode(frame)
+
+
+def event(handler: str, frame: str) -> dict:
+    """Channel-layer event that delivers ``frame`` through ``handler`` (e.g. "chat.message")"""
+    return {"type": handler, "frame": frame}
@@ -0,0 +1,100 @@
+"""
+Write-behind stage for WebSocket message side effects.
+
+Once the core Message row, its structured reply and outbox event are
+durable, the consumer confirms and broadcasts straight away and hands the
+remaining work (audit log, push fan-out) to this bounded stage. When the
+queue is full, ``submit`` waits for a free slot, so producers slow down
+instead of the process buffering without limit. Queued jobs are drained
+when a socket disconnects and on ASGI lifespan shutdown.
+"""
+
+import asyncio
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+_stage = None
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "CHAT_WRITE_BEHIND_ENABLED", False)
+
+
+class WriteBehindStage:
+    """Bounded queue drained by a fixed pool of asyncio worker tasks."""
+
+    def __init__(self, maxsize: int, workers: int):
+        self.maxsize = maxsize
+        self.workers = workers
+        self._queue = None
+        self._tasks = []
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+
+    async def submit(self, func, *args) -> asyncio.Future:
+        """Queue ``await func(*args)`` for background execution.
+
+        Returns a future that resolves once the job has run.
+        """
+        self._ensure_started()
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((func, args, done))
+        return done
+
+    async def drain(self, timeout=None) -> bool:
+        """Wait until every queued job has finished; False if ``timeout`` ran out first."""
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("[WS] Write-behind drain timed out with %d jobs pending", self.pending)
+            return False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, index: int):
+        while True:
+            func, args, done = await self._queue.get()
+            try:
+                await func(*args)
+            except Exception:
+                logger.exception("[WS] Write-behind job %s failed in worker %d", func.__name__, index)
+            finally:
+                if not done.done():
+                    done.set_result(None)
+                self._queue.task_done()
+
+
+def get_stage() -> WriteBehindStage:
+    """Return the process-wide write-behind stage."""
+    global _stage
+    if _stage is None:
+        _stage = WriteBehindStage(
+            maxsize=getattr(settings, "CHAT_WRITE_BEHIND_QUEUE_SIZE", 1000),
+            workers=getattr(settings, "CHAT_WRITE_BEHIND_WORKERS", 4),
+        )
+    return _stage
+
+
+async def lifespan(scope, receive, send):
+    """ASGI lifespan handler that drains the write-behind stage on shutdown."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _stage is not None:
+                await _stage.drain(getattr(settings, "CHAT_WRITE_BEHIND_DRAIN_SECONDS", 10))
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -1,9 +1,14 @@
 import logging
+import time
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.conf import settings
-from chat_svc.models import ChatThread, Message, Device, User
-from integrations import event_bus, push
+from django.db import transaction
+from chat_svc.models import ChatThread, Message, MessageLog, StructuredReply, ThreadSubscription, User
+from chat_svc.services.notifications import NotificationService
+from chat_svc.services.outbox import OutboxService
+from integrations import redis_client
+from . import frames
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +25,7 @@ class ChatService:
         # Send to WebSocket group
         async_to_sync(channel_layer.group_send)(
             group_name,
-            {
-                "type": "chat.message",
-                "message": message_data,
-            }
+            frames.event("chat.message", frames.message(message_data)),
         )
     
     @staticmethod
@@ -34,11 +36,7 @@ class ChatService:
         
         async_to_sync(channel_layer.group_send)(
             group_name,
-            {
-                "type": "chat.presence",
-                "user": username,
-                "online": online,
-            }
+            frames.event("chat.presence", frames.presence(username, online)),
         )
     
     @staticmethod
@@ -49,10 +47,7 @@ class ChatService:
         
         async_to_sync(channel_layer.group_send)(
             group_name,
-            {
-                "type": "chat.typing",
-                "user": username,
-            }
+            frames.event("chat.typing", frames.typing(username)),
         )
     
     @staticmethod
@@ -63,49 +58,34 @@ class ChatService:
         
         async_to_sync(channel_layer.group_send)(
             group_name,
-            {
-                "type": "chat.read",
-                "message_id": message_id,
-                "user": username,
-            }
+            frames.event("chat.read", frames.read([message_id], {str(message_id): 1}, username)),
         )
     
     @staticmethod
     def send_push_notifications(thread, message, exclude_user=None):
-        """Send push notifications to relevant users"""
+        """Send push notifications to the thread's subscribers (excluding the sender)"""
         try:
-            # Get device tokens for tenant users (excluding sender)
-            tokens_query = Device.objects.filter(
-                user__tenant_id=thread.tenant_id
-            )
-            
-            if exclude_user:
-                tokens_query = tokens_query.exclude(user=exclude_user)
-            
-            tokens = list(tokens_query.values_list("token", flat=True))
-            
-            if tokens:
-                title = f"New message in {thread.incident_id}"
-                body = message.content[:100] + ("..." if len(message.content) > 100 else "")
-                push.send_push(tokens, title, body)
+            title = f"New message in {thread.incident_id}"
+            body = message.content[:100] + ("..." if len(message.content) > 100 else "")
+            NotificationService.notify_message(thread, message, title=title, body=body)
                 
         except Exception as e:
             logger.exception(f"Failed to send push notifications: {e}")
     
     @staticmethod
     def publish_message_event(message):
-        """Publish message event to event bus"""
-        try:
-            event_bus.publish_event("chat-events", {
-                "type": "message_created",
-                "message_id": message.id,
-                "thread_id": message.thread_id,
-                "tenant_id": message.thread.tenant_id,
-                "sender_id": message.sender_id,
-                "timestamp": message.created_at.isoformat(),
-            })
-        except Exception as e:
-            logger.exception(f"Failed to publish message event: {e}")
+        """Record a message event in the outbox; call inside the message's transaction
+
+        Errors propagate so the message is rolled back with its event.
+        """
+        OutboxService.emit("chat-events", {
+            "type": "message_created",
+            "message_id": message.id,
+            "thread_id": message.thread_id,
+            "tenant_id": message.thread.tenant_id,
+            "sender_id": message.sender_id,
+            "timestamp": message.created_at.isoformat(),
+        }, key=message.thread_id)
     
     @staticmethod
     def get_thread_participants(thread_id):
@@ -133,25 +113,62 @@ class ChatService:
 
 
 class PresenceService:
-    """Service for managing user presence in threads"""
-    
+    """Service for managing user presence in threads.
+
+    Each WebSocket connection owns one member of a per-thread sorted set,
+    scored by the time its entry expires. Heartbeats push the score
+    forward; entries left behind by a crashed worker simply age out.
+    """
+
     def __init__(self):
         self.redis_prefix = "presence:thread"
-    
-    def add_user_to_thread(self, thread_id, username):
-        """Add user to thread presence"""
-        # This would integrate with Redis in a real implementation
-        pass
-    
-    def remove_user_from_thread(self, thread_id, username):
-        """Remove user from thread presence"""
-        # This would integrate with Redis in a real implementation
-        pass
-    
-    def get_online_users(self, thread_id):
+        self.ttl = getattr(settings, "PRESENCE_TTL_SECONDS", 60)
+
+    def _key(self, thread_id):
+        return f"{self.redis_prefix}:{thread_id}:conns"
+
+    @staticmethod
+    def _member(username, connection_id):
+        return f"{username}|{connection_id}"
+
+    async def add_connection(self, thread_id, username, connection_id):
+        """Register a connection and sweep entries that have expired"""
+        r = redis_client.get_async_client()
+        key = self._key(thread_id)
+        now = time.time()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.zadd(key, {self._member(username, connection_id): now + self.ttl})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def refresh_connection(self, thread_id, username, connection_id):
+        """Heartbeat: extend the TTL of a live connection"""
+        r = redis_client.get_async_client()
+        key = self._key(thread_id)
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {self._member(username, connection_id): time.time() + self.ttl})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def remove_connection(self, thread_id, username, connection_id):
+        """Drop a connection and return whether the user is still online elsewhere"""
+        r = redis_client.get_async_client()
+        key = self._key(thread_id)
+        await r.zrem(key, self._member(username, connection_id))
+        return username in await self.get_online_users(thread_id)
+
+    async def get_online_users(self, thread_id):
         """Get list of users currently online in a thread"""
-        # This would query Redis in a real implementation
-        return []
+        r = redis_client.get_async_client()
+        members = await r.zrangebyscore(self._key(thread_id), time.time(), "+inf")
+        return sorted({m.rsplit("|", 1)[0] for m in members})
+
+    def get_online_users_sync(self, thread_id):
+        """Blocking variant of get_online_users for request/response code"""
+        r = redis_client.get_client()
+        members = r.zrangebyscore(self._key(thread_id), time.time(), "+inf")
+        return sorted({m.rsplit("|", 1)[0] for m in members})
 
 
 class MessageService:
@@ -161,33 +178,36 @@ class MessageService:
     def create_message(thread, sender, content, structured_data=None):
         """Create a new message with proper validation and side effects"""
         try:
-            # Create the message
-            message = Message.objects.create(
-                thread=thread,
-                sender=sender,
-                content=content
-            )
-            
-            # Handle structured data if provided
-            if structured_data and thread.template:
-                from models import StructuredReply
-                StructuredReply.objects.create(
+            # The message, its records and its outbox event commit together
+            with transaction.atomic():
+                message = Message.objects.create(
+                    thread=thread,
+                    sender=sender,
+                    content=content
+                )
+                ThreadSubscription.subscribe_sender(thread.id, sender)
+                
+                # Handle structured data if provided
+                if structured_data and thread.template:
+                    StructuredReply.objects.create(
+                        message=message,
+                        template=thread.template,
+                        answer=structured_data
+                    )
+                
+                # Create message log
+                version = MessageLog.objects.filter(message=message).count() + 1
+                MessageLog.objects.create(
                     message=message,
-                    template=thread.template,
-                    answer=structured_data
+                    thread=thread,
+                    sender=sender,
+                    content=content,
+                    structured=structured_data,
+                    version=version
                 )
-            
-            # Create message log
-            from models import MessageLog
-            version = MessageLog.objects.filter(message=message).count() + 1
-            MessageLog.objects.create(
-                message=message,
-                thread=thread,
-                sender=sender,
-                content=content,
-                structured=structured_data,
-                version=version
-            )
+                
+                # Event bus
+                ChatService.publish_message_event(message)
             
             # Send notifications
             ChatService.notify_thread_users(thread.id, {
@@ -201,12 +221,12 @@ class MessageService:
             # Push notifications
             ChatService.send_push_notifications(thread, message, exclude_user=sender)
             
-            # Event bus
-            ChatService.publish_message_event(message)
-            
             # ITSM integration
             from integrations import itsm
-            itsm.update_ticket_timeline(thread.incident_id, message.content)
+            itsm.update_ticket_timeline(
+                thread.incident_id, message.content, tenant_id=thread.tenant_id,
+                author=sender.username, timestamp=message.created_at,
+            )
             
             return message
             
@@ -1,39 +1,163 @@
+"""
+Event publishing for chat, thread and SLA lifecycle events.
+
+Delivery goes through a transport (``EVENT_BUS_TRANSPORT``): ``kafka``,
+``memory``, ``file`` or the dotted path of a class with the same interface.
+Lifecycle events are recorded in the transactional outbox
+(``chat_svc.services.outbox``), whose relay sends them through the transport
+in batches; that replaces the former in-process buffered mode.
+``publish_event`` sends one event and waits for the broker, for callers
+outside the outbox. Its delivery counters are available from ``get_metrics()``.
+"""
+
 import json
 import logging
+import threading
 from django.conf import settings
+from django.utils.module_loading import import_string
 try:
     from kafka import KafkaProducer
 except Exception:  # pragma: no cover
     KafkaProducer = None
 
 logger = logging.getLogger(__name__)
-_producer = None
-
-def _get_producer():
-    global _producer
-    if _producer is not None:
-        return _producer
-    servers = getattr(settings, "KAFKA_BOOTSTRAP_SERVERS", "")
-    if not servers or KafkaProducer is None:
-        return None
+_transport = None
+_lock = threading.Lock()
+
+
+class KafkaTransport:
+    """Sends through a shared KafkaProducer, flushing once per batch."""
+
+    def __init__(self):
+        self._producer = None
+        servers = getattr(settings, "KAFKA_BOOTSTRAP_SERVERS", "")
+        if not servers or KafkaProducer is None:
+            return
+        try:
+            self._producer = KafkaProducer(
+                bootstrap_servers=[s.strip() for s in servers.split(',') if s.strip()],
+                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                key_serializer=lambda k: k.encode('utf-8') if k is not None else None,
+                linger_ms=getattr(settings, "EVENT_BUS_LINGER_MS", 50),
+            )
+        except Exception:
+            logger.exception("Failed to create Kafka producer")
+
+    @property
+    def available(self) -> bool:
+        return self._producer is not None
+
+    def send_batch(self, records):
+        """Deliver ``[(topic, event, key), ...]`` and return ``[(index, exc), ...]`` for failures"""
+        futures = [self._producer.send(topic, event, key=key) for topic, event, key in records]
+        self._producer.flush()
+        return [(index, future.exception) for index, future in enumerate(futures) if future.failed()]
+
+    def close(self):
+        if self._producer is not None:
+            self._producer.close()
+
+
+class MemoryTransport:
+    """Keeps delivered records in a list; for tests and local development."""
+
+    def __init__(self):
+        self.available = True
+        self.records = []
+
+    def send_batch(self, records):
+        self.records.extend(records)
+        return []
+
+    def close(self):
+        pass
+
+
+class FileTransport:
+    """Appends one JSON line per record to ``EVENT_BUS_FILE_PATH``."""
+
+    def __init__(self):
+        self.available = True
+        self.path = getattr(settings, "EVENT_BUS_FILE_PATH", "logs/events.jsonl")
+        self._lock = threading.Lock()
+
+    def send_batch(self, records):
+        lines = [
+            json.dumps({"topic": topic, "key": key, "event": event}, default=str)
+            for topic, event, key in records
+        ]
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+        return []
+
+    def close(self):
+        pass
+
+
+TRANSPORTS = {
+    "kafka": KafkaTransport,
+    "memory": MemoryTransport,
+    "file": FileTransport,
+}
+
+
+class Metrics:
+    """Thread-safe delivery counters."""
+
+    FIELDS = ("delivered", "failed", "batches")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+metrics = Metrics()
+
+
+def _deliver(transport, records) -> int:
+    """Send one batch, update metrics and return the number of failed records."""
     try:
-        _producer = KafkaProducer(
-            bootstrap_servers=[s.strip() for s in servers.split(',') if s.strip()],
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-        )
+        failures = transport.send_batch(records)
     except Exception:
-        logger.exception("Failed to create Kafka producer")
-        _producer = None
-    return _producer
-
-def publish_event(topic: str, event: dict) -> None:
-    """Publish an event dict to the given Kafka topic if configured."""
-    producer = _get_producer()
-    if not producer:
-        logger.debug("Kafka producer not configured; skipping publish")
+        logger.exception("Failed to publish batch of %d events", len(records))
+        failures = [(index, None) for index in range(len(records))]
+    for index, exc in failures:
+        logger.error("Failed to publish event to %s: %s", records[index][0], exc)
+    metrics.incr("batches")
+    metrics.incr("delivered", len(records) - len(failures))
+    metrics.incr("failed", len(failures))
+    return len(failures)
+
+
+def get_transport():
+    """Return the process-wide transport configured by ``EVENT_BUS_TRANSPORT``."""
+    global _transport
+    with _lock:
+        if _transport is None:
+            name = getattr(settings, "EVENT_BUS_TRANSPORT", "kafka")
+            cls = TRANSPORTS.get(name) or import_string(name)
+            _transport = cls()
+    return _transport
+
+
+def get_metrics() -> dict:
+    """Delivery counters for ``publish_event``."""
+    return metrics.snapshot()
+
+
+def publish_event(topic: str, event: dict, key: str = None) -> None:
+    """Publish an event dict to the given topic if a transport is configured."""
+    transport = get_transport()
+    if not transport.available:
+        logger.debug("Event bus transport not configured; skipping publish")
         return
-    try:
-        producer.send(topic, event)
-        producer.flush()
-    except Exception:
-        logger.exception("Failed to publish event to Kafka")
\ No newline at end of file
+    _deliver(transport, [(topic, event, key)])
+
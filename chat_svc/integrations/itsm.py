@@ -1,25 +1,395 @@
+"""
+ITSM ticket timeline client.
+
+Each tenant gets its own client built from its enabled ``itsm``
+TenantIntegration (endpoint, api key, ``timeout_seconds``,
+``retry_attempts``), falling back to ``ITSM_API_URL`` / ``ITSM_API_TOKEN``.
+Clients keep a pooled keep-alive ``requests.Session`` and a circuit breaker
+that stops calling an ITSM that keeps failing until a cool-down has passed.
+
+``update_ticket_timeline`` buffers the update per incident and returns at
+once; coalesced batches are posted from a small thread pool, so ITSM
+latency never reaches the request path. Every HTTP attempt
+is counted in the integration's ``total_calls`` / ``failed_calls`` /
+``last_error`` with atomic updates.
+
+Point ``ITSM_API_URL`` (or the integration endpoint) at
+``manage.py itsm_stub`` to exercise this without a real ITSM.
+"""
+
+import atexit
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
+_clients = {}
+_clients_lock = threading.Lock()
+_executor = None
+_slots = None
+_coalescer = None
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures and lets one trial call
+    through once ``reset_seconds`` have passed (half-open)."""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                # Admit one trial call; a failure re-opens for another full period
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class ItsmClient:
+    """Timeline client for one tenant's ITSM endpoint."""
+
+    def __init__(self, base_url: str, token: str = None, timeout: float = 5,
+                 retries: int = 0, integration_id: int = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.integration_id = integration_id
+        self.breaker = CircuitBreaker(
+            threshold=getattr(settings, "ITSM_CIRCUIT_FAILURE_THRESHOLD", 5),
+            reset_seconds=getattr(settings, "ITSM_CIRCUIT_RESET_SECONDS", 30),
+        )
+        self.session = requests.Session()
+        pool_size = getattr(settings, "ITSM_POOL_SIZE", 4)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def post_timeline(self, incident_id: str, payload: dict) -> bool:
+        """POST one timeline entry, retrying transient failures; returns success."""
+        if not self.breaker.allow():
+            logger.warning("ITSM circuit open; skipped timeline update for %s", incident_id)
+            return False
+
+        url = f"{self.base_url}/incidents/{incident_id}/timeline"
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.session.post(url, json=payload, timeout=self.timeout)
+                resp.raise_for_status()
+            except requests.RequestException as e:
+                self._record_call(error=f"{type(e).__name__}: {e}")
+                status = getattr(e.response, "status_code", None)
+                if status is not None and 400 <= status < 500 and status != 429:
+                    break  # The request itself is wrong; retrying will not help
+                if attempt < self.retries:
+                    time.sleep(min(0.5 * 2 ** attempt, 5))
+                continue
+            self._record_call()
+            self.breaker.record_success()
+            return True
+
+        self.breaker.record_failure()
+        logger.error("Failed to update ticket %s after %d attempt(s)", incident_id, attempt + 1)
+        return False
+
+    def _record_call(self, error: str = None) -> None:
+        if self.integration_id is None:
+            return
+        from chat_svc.models import TenantIntegration
+
+        values = {"total_calls": F("total_calls") + 1}
+        if error:
+            values.update(failed_calls=F("failed_calls") + 1, last_error=error[:1000])
+        else:
+            values["last_successful_call"] = timezone.now()
+        try:
+            TenantIntegration.objects.filter(id=self.integration_id).update(**values)
+        except Exception:
+            logger.exception("Failed to record ITSM call stats for integration %s", self.integration_id)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _load_config(tenant_id):
+    """(base_url, token, timeout, retries, integration_id) for a tenant, or None"""
+    if tenant_id is not None:
+        from chat_svc.models import TenantIntegration
+
+        integration = (
+            TenantIntegration.objects.filter(
+                tenant_id=tenant_id, integration_type='itsm', is_enabled=True
+            )
+            .exclude(endpoint_url__isnull=True).exclude(endpoint_url="")
+            .order_by('id').first()
+        )
+        if integration:
+            return (integration.endpoint_url, integration.api_key, integration.timeout_seconds,
+                    integration.retry_attempts, integration.id)
 
-def update_ticket_timeline(incident_id: str, message: str) -> None:
-    """Send the chat message to the ITSM ticket timeline."""
     url_base = getattr(settings, "ITSM_API_URL", None)
     if not url_base:
-        logger.info("No ITSM_API_URL configured; skipping update for %s", incident_id)
-        return
-    url = f"{url_base.rstrip('/')}/incidents/{incident_id}/timeline"
-    headers = {}
-    token = getattr(settings, "ITSM_API_TOKEN", None)
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+        return None
+    return (url_base, getattr(settings, "ITSM_API_TOKEN", None),
+            getattr(settings, "ITSM_TIMEOUT_SECONDS", 5),
+            getattr(settings, "ITSM_RETRY_ATTEMPTS", 2), None)
+
+
+def get_client(tenant_id=None):
+    """Return the cached client for a tenant, rebuilding it when its settings change.
+
+    Settings are re-read at most every ``ITSM_CONFIG_TTL_SECONDS``; the
+    session and circuit state survive a reload that changes nothing.
+    """
+    ttl = getattr(settings, "ITSM_CONFIG_TTL_SECONDS", 60)
+    now = time.monotonic()
+    with _clients_lock:
+        cached = _clients.get(tenant_id)
+        if cached and now - cached[2] < ttl:
+            return cached[0]
+
+    config = _load_config(tenant_id)
+    with _clients_lock:
+        client, loaded, _ = _clients.get(tenant_id) or (None, None, None)
+        if config != loaded:
+            if client:
+                client.close()
+            client = None
+            if config:
+                base_url, token, timeout, retries, integration_id = config
+                client = ItsmClient(base_url, token=token, timeout=timeout,
+                                    retries=retries, integration_id=integration_id)
+        _clients[tenant_id] = (client, config, now)
+    return client
+
+
+def _get_executor():
+    global _executor, _slots
+    with _clients_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ITSM_WORKERS", 4), thread_name_prefix="itsm"
+            )
+            _slots = threading.BoundedSemaphore(getattr(settings, "ITSM_QUEUE_SIZE", 1000))
+    return _executor
 
+
+def post_timeline(incident_id: str, payload: dict, tenant_id=None) -> bool:
+    """Blocking timeline update through the tenant's client."""
+    client = get_client(tenant_id)
+    if client is None:
+        logger.info("No ITSM endpoint configured; skipping update for %s", incident_id)
+        return False
+    return client.post_timeline(incident_id, payload)
+
+
+def _run(incident_id, payload, tenant_id):
+    close_old_connections()
     try:
-        resp = requests.post(
-            url, json={"message": message}, headers=headers or None, timeout=5
-        )
-        resp.raise_for_status()
+        return post_timeline(incident_id, payload, tenant_id)
     except Exception:
-        logger.exception("Failed to update ticket %s", incident_id)
\ No newline at end of file
+        logger.exception("Failed to update ticket %s", incident_id)
+        return False
+    finally:
+        _slots.release()
+        close_old_connections()
+
+
+def _submit(incident_id, payload, tenant_id, on_done=None):
+    """Queue one timeline POST on the pool; returns its Future, or None when dropped"""
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        logger.warning("ITSM queue full; dropped timeline update for %s", incident_id)
+        return None
+    future = executor.submit(_run, incident_id, payload, tenant_id)
+    if on_done is not None:
+        future.add_done_callback(on_done)
+    return future
+
+
+def _timeline_payload(entries):
+    """One timeline entry for one or more chat messages, oldest first"""
+    lines = [f"{e['author']}: {e['message']}" if e.get('author') else e['message'] for e in entries]
+    return {"message": "\n".join(lines), "entries": entries}
+
+
+class TimelineCoalescer:
+    """Buffers timeline updates per incident and sends each buffer as one entry.
+
+    A buffer is flushed ``window`` seconds after its first update, as soon
+    as it holds ``max_entries`` updates, or on demand (thread closed,
+    shutdown). At most one POST per incident is in flight: a batch flushed
+    while the previous one is still sending waits for it, so the ticket
+    sees updates in the order they were written.
+    """
+
+    def __init__(self, window: float, max_entries: int):
+        self.window = window
+        self.max_entries = max_entries
+        self._buffers = {}   # (tenant_id, incident_id) -> [deadline, entries]
+        self._inflight = set()
+        self._held = {}      # batches waiting for an in-flight POST to finish
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="itsm-coalescer", daemon=True)
+        self._thread.start()
+
+    def add(self, tenant_id, incident_id, entry) -> None:
+        key = (tenant_id, incident_id)
+        with self._cond:
+            buffer = self._buffers.setdefault(key, [time.monotonic() + self.window, []])
+            buffer[1].append(entry)
+            if len(buffer[1]) >= self.max_entries:
+                self._dispatch(key)
+            else:
+                self._cond.notify()
+
+    def flush(self, tenant_id, incident_id) -> None:
+        with self._cond:
+            if (tenant_id, incident_id) in self._buffers:
+                self._dispatch((tenant_id, incident_id))
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Send everything still buffered or held, blocking until done.
+
+        Each incident's remaining entries are sent only after its in-flight
+        POST finished, so the ticket still sees them in order.
+        """
+        with self._cond:
+            self._closed = True
+            pending = {}
+            for key, entries in self._held.items():
+                pending.setdefault(key, []).extend(entries)
+            for key, (_, entries) in self._buffers.items():
+                pending.setdefault(key, []).extend(entries)
+            self._buffers.clear()
+            self._held.clear()
+            self._cond.notify_all()
+
+            deadline = time.monotonic() + timeout
+            while any(key in self._inflight for key in pending):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("In-flight timeline updates did not finish within %.1fs; "
+                                   "flushing the rest anyway", timeout)
+                    break
+                self._cond.wait(remaining)
+        for (tenant_id, incident_id), entries in pending.items():
+            try:
+                post_timeline(incident_id, _timeline_payload(entries), tenant_id)
+            except Exception:
+                logger.exception("Failed to flush timeline updates for %s", incident_id)
+
+    def _dispatch(self, key) -> None:
+        # Caller holds self._cond
+        _, entries = self._buffers.pop(key)
+        if key in self._inflight:
+            self._held.setdefault(key, []).extend(entries)
+        else:
+            self._send(key, entries)
+
+    def _send(self, key, entries) -> None:
+        tenant_id, incident_id = key
+        self._inflight.add(key)
+        future = _submit(incident_id, _timeline_payload(entries), tenant_id,
+                         on_done=lambda _: self._sent(key))
+        if future is None:
+            self._inflight.discard(key)
+
+    def _sent(self, key) -> None:
+        with self._cond:
+            self._inflight.discard(key)
+            held = self._held.pop(key, None)
+            if held and not self._closed:
+                self._send(key, held)
+            # Wakes close() waiting for in-flight POSTs
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                for key in [k for k, (deadline, _) in self._buffers.items() if deadline <= now]:
+                    self._dispatch(key)
+                deadlines = [deadline for deadline, _ in self._buffers.values()]
+                self._cond.wait(max(min(deadlines) - now, 0.01) if deadlines else None)
+
+
+def _get_coalescer():
+    global _coalescer
+    with _clients_lock:
+        if _coalescer is None:
+            _coalescer = TimelineCoalescer(
+                window=getattr(settings, "ITSM_COALESCE_WINDOW_SECONDS", 10),
+                max_entries=getattr(settings, "ITSM_COALESCE_MAX_ENTRIES", 20),
+            )
+    return _coalescer
+
+
+def update_ticket_timeline(incident_id: str, message: str, tenant_id=None,
+                           author: str = None, timestamp=None) -> None:
+    """Queue the chat message for the ITSM ticket timeline and return immediately.
+
+    Updates for the same incident are coalesced into one timeline entry
+    (see TimelineCoalescer); with ``ITSM_COALESCE_WINDOW_SECONDS = 0`` each
+    message is sent on its own.
+    """
+    entry = {
+        "author": author,
+        "message": message,
+        "timestamp": (timestamp or timezone.now()).isoformat(),
+    }
+    if getattr(settings, "ITSM_COALESCE_WINDOW_SECONDS", 10) <= 0:
+        _submit(incident_id, _timeline_payload([entry]), tenant_id)
+    else:
+        _get_coalescer().add(tenant_id, incident_id, entry)
+
+
+def flush_incident(incident_id: str, tenant_id=None) -> None:
+    """Send any buffered timeline updates for an incident now, e.g. when its thread closes."""
+    if _coalescer is not None:
+        _coalescer.flush(tenant_id, incident_id)
+
+
+@atexit.register
+def shutdown() -> None:
+    """Flush buffered timeline updates synchronously at interpreter exit."""
+    global _coalescer
+    with _clients_lock:
+        coalescer, _coalescer = _coalescer, None
+    if coalescer is not None:
+        coalescer.close()
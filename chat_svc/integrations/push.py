@@ -1,26 +1,176 @@
+"""
+FCM push notification dispatch.
+
+``send_push`` deduplicates the tokens and hands the notification to a
+background worker, then returns at once. The worker splits the tokens
+into chunks of at most ``FCM_MAX_TOKENS_PER_REQUEST`` and posts the chunks
+concurrently over one pooled keep-alive session. It reads the per-token
+results and deletes ``Device`` rows whose tokens FCM reports as invalid,
+in a single bulk delete per notification.
+
+``FCM_URL`` can point at a local stub; ``manage.py bench_push`` starts one
+and measures dispatch throughput.
+"""
+
 import logging
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.db import close_old_connections
+import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
 FCM_URL = "https://fcm.googleapis.com/fcm/send"
 
-def send_push(tokens, title: str, body: str) -> None:
-    """Send a push notification via FCM to the given device tokens."""
-    key = getattr(settings, "FCM_SERVER_KEY", None)
-    if not key or not tokens:
-        return
-    headers = {
-        "Authorization": f"key={key}",
-        "Content-Type": "application/json",
-    }
+# Per-token errors after which a registration will never work again
+INVALID_TOKEN_ERRORS = {"NotRegistered", "InvalidRegistration", "MismatchSenderId"}
+
+_session = None
+_chunk_executor = None
+_worker = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            size = getattr(settings, "PUSH_CONCURRENCY", 8)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+    return _session
+
+
+def _get_chunk_executor():
+    global _chunk_executor
+    with _lock:
+        if _chunk_executor is None:
+            _chunk_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PUSH_CONCURRENCY", 8), thread_name_prefix="push-chunk"
+            )
+    return _chunk_executor
+
+
+def _get_worker():
+    global _worker, _slots
+    with _lock:
+        if _worker is None:
+            _worker = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PUSH_WORKERS", 2), thread_name_prefix="push"
+            )
+            _slots = threading.BoundedSemaphore(getattr(settings, "PUSH_QUEUE_SIZE", 1000))
+    return _worker
+
+
+def _dedup(tokens):
+    """Unique, non-empty tokens in first-seen order"""
+    return list(dict.fromkeys(t for t in tokens if t))
+
+
+def _send_chunk(url, key, tokens, title, body, data):
+    """POST one chunk and return (sent, failed, invalid_tokens)"""
     payload = {
-        "registration_ids": list(tokens),
+        "registration_ids": tokens,
         "notification": {"title": title, "body": body},
     }
+    if data:
+        payload["data"] = data
+    headers = {"Authorization": f"key={key}", "Content-Type": "application/json"}
     try:
-        resp = requests.post(FCM_URL, json=payload, headers=headers, timeout=5)
+        resp = _get_session().post(
+            url, json=payload, headers=headers,
+            timeout=getattr(settings, "PUSH_TIMEOUT_SECONDS", 5),
+        )
         resp.raise_for_status()
+        results = resp.json().get("results") or []
+    except Exception:
+        logger.exception("Failed to send push chunk of %d tokens", len(tokens))
+        return 0, len(tokens), []
+
+    invalid = []
+    # Tokens without a result were not confirmed, so they count as failed
+    failed = max(len(tokens) - len(results), 0)
+    aligned = len(results) == len(tokens)
+    if not aligned:
+        logger.warning("FCM returned %d results for %d tokens; not pruning this chunk",
+                       len(results), len(tokens))
+    for token, result in zip(tokens, results):
+        error = result.get("error")
+        if error:
+            failed += 1
+            # Results are positional; only trust them for pruning when they line up
+            if aligned and error in INVALID_TOKEN_ERRORS:
+                invalid.append(token)
+    return len(tokens) - failed, failed, invalid
+
+
+def prune_tokens(tokens) -> int:
+    """Delete Device rows for tokens FCM rejected; returns rows deleted"""
+    if not tokens:
+        return 0
+    from chat_svc.models import Device
+
+    deleted, _ = Device.objects.filter(token__in=tokens).delete()
+    if deleted:
+        logger.info("Pruned %d invalid push registrations", deleted)
+    return deleted
+
+
+def send_push_now(tokens, title: str, body: str, data: dict = None) -> dict:
+    """Send a notification and wait for every chunk; returns delivery counts."""
+    key = getattr(settings, "FCM_SERVER_KEY", None)
+    tokens = _dedup(tokens)
+    stats = {"tokens": len(tokens), "sent": 0, "failed": 0, "pruned": 0}
+    if not key or not tokens:
+        return stats
+
+    url = getattr(settings, "FCM_URL", FCM_URL)
+    size = getattr(settings, "FCM_MAX_TOKENS_PER_REQUEST", 1000)
+    chunks = [tokens[i:i + size] for i in range(0, len(tokens), size)]
+    if len(chunks) == 1:
+        results = [_send_chunk(url, key, chunks[0], title, body, data)]
+    else:
+        executor = _get_chunk_executor()
+        results = list(executor.map(lambda c: _send_chunk(url, key, c, title, body, data), chunks))
+
+    invalid = []
+    for sent, failed, bad in results:
+        stats["sent"] += sent
+        stats["failed"] += failed
+        invalid.extend(bad)
+    stats["pruned"] = prune_tokens(invalid)
+    return stats
+
+
+def _run(tokens, title, body, data):
+    close_old_connections()
+    try:
+        return send_push_now(tokens, title, body, data)
     except Exception:
-        logger.exception("Failed to send push notification")
\ No newline at end of file
+        logger.exception("Failed to send push notification")
+    finally:
+        _slots.release()
+        close_old_connections()
+
+
+def send_push(tokens, title: str, body: str, data: dict = None):
+    """Queue a push notification via FCM to the given device tokens.
+
+    Returns a Future with the delivery counts, or None when there is nothing
+    to send or the queue is full.
+    """
+    if not getattr(settings, "FCM_SERVER_KEY", None):
+        return None
+    tokens = _dedup(tokens)
+    if not tokens:
+        return None
+    worker = _get_worker()
+    if not _slots.acquire(blocking=False):
+        logger.warning("Push queue full; dropped notification to %d tokens", len(tokens))
+        return None
+    return worker.submit(_run, tokens, title, body, data)
@@ -0,0 +1,42 @@
+import logging
+from django.conf import settings
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+_client = None
+_async_client = None
+
+
+def _redis_url() -> str:
+    return getattr(settings, "REDIS_URL", "redis://localhost:6379/0")
+
+
+def get_client():
+    """Return the process-wide pooled synchronous Redis client."""
+    global _client
+    if _client is None:
+        pool = redis.ConnectionPool.from_url(
+            _redis_url(),
+            max_connections=getattr(settings, "REDIS_MAX_CONNECTIONS", 50),
+            decode_responses=True,
+        )
+        _client = redis.Redis(connection_pool=pool)
+    return _client
+
+
+def get_async_client():
+    """Return the process-wide pooled asyncio Redis client.
+
+    The pool is created lazily on first use so it binds to the event loop
+    of the ASGI server rather than to whatever loop imported the module.
+    """
+    global _async_client
+    if _async_client is None:
+        pool = aioredis.ConnectionPool.from_url(
+            _redis_url(),
+            max_connections=getattr(settings, "REDIS_MAX_CONNECTIONS", 50),
+            decode_responses=True,
+        )
+        _async_client = aioredis.Redis(connection_pool=pool)
+    return _async_client
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from chat_svc.services.activity_counters import ActivityCounters
+
+
+class Command(BaseCommand):
+    help = "Rebuild hourly and daily activity counters from messages, threads and users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, default=None, help='Only rebuild this tenant id')
+
+    def handle(self, *args, **options):
+        written = ActivityCounters.backfill(options['tenant'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} activity counter rows"))
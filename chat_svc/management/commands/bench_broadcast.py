@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+from django.core.management.base import BaseCommand
+from chat_svc.chat_api import frames
+from chat_svc.chat_api.consumers import ChatConsumer
+
+
+class Command(BaseCommand):
+    help = "Measure consumer CPU per broadcast by group size, per-connection vs encode-once frames"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50,100,300,1000',
+                            help='Comma-separated group sizes to measure')
+        parser.add_argument('--rounds', type=int, default=200,
+                            help='Broadcasts per group size and mode')
+        parser.add_argument('--content-bytes', type=int, default=512,
+                            help='Size of the message body in each broadcast')
+        parser.add_argument('--json', action='store_true', help='Emit one JSON result per line')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        message = {
+            "id": 1,
+            "sequence": 1,
+            "content": "x" * options['content_bytes'],
+            "sender": "analyst",
+            "created_at": "2026-01-01T00:00:00+00:00",
+            "structured": {"severity": "high", "affected_hosts": ["web-1", "web-2"]},
+            "is_admin": True,
+        }
+
+        if not options['json']:
+            self.stdout.write(f"{'group':>6} {'per-conn µs':>12} {'encode-once µs':>15} {'speedup':>8}")
+        for size in sizes:
+            legacy = asyncio.run(self._measure(size, options['rounds'], message, pre_encoded=False))
+            framed = asyncio.run(self._measure(size, options['rounds'], message, pre_encoded=True))
+            result = {
+                "group_size": size,
+                "per_connection_us": round(legacy, 1),
+                "encode_once_us": round(framed, 1),
+                "speedup": round(legacy / framed, 2) if framed else None,
+            }
+            if options['json']:
+                self.stdout.write(json.dumps(result))
+            else:
+                self.stdout.write(
+                    f"{size:>6} {result['per_connection_us']:>12} "
+                    f"{result['encode_once_us']:>15} {result['speedup']:>7}x"
+                )
+
+    @staticmethod
+    async def _measure(size, rounds, message, pre_encoded):
+        """CPU microseconds per broadcast delivered to ``size`` consumers on one worker"""
+        async def discard(text_data=None, bytes_data=None, close=False):
+            pass
+
+        consumers = []
+        for _ in range(size):
+            consumer = ChatConsumer()
+            consumer.send = discard
+            consumers.append(consumer)
+
+        start = time.process_time()
+        for _ in range(rounds):
+            if pre_encoded:
+                # The sender encodes once; the cost is charged to the broadcast
+                event = frames.event("chat.message", frames.message(message))
+            else:
+                event = {"type": "chat.message", "message": message}
+            for consumer in consumers:
+                await consumer.chat_message(event)
+        return (time.process_time() - start) / rounds * 1_000_000
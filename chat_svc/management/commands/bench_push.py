@@ -0,0 +1,82 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from integrations import push
+
+
+class Command(BaseCommand):
+    help = "Benchmark push dispatch (chunking, concurrency, result parsing) against a local FCM stub"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=10000,
+                            help='Number of distinct device tokens per notification')
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help='Fraction of extra duplicate tokens mixed in')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency-ms', type=int, default=50,
+                            help='Stub response delay per request')
+        parser.add_argument('--invalid-rate', type=float, default=0.01,
+                            help='Fraction of tokens the stub reports as NotRegistered')
+        parser.add_argument('--rounds', type=int, default=3)
+        parser.add_argument('--port', type=int, default=0, help='Stub port (0 picks a free one)')
+
+    def handle(self, *args, **options):
+        lock = threading.Lock()
+        requests_seen = [0]
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                if options['latency_ms']:
+                    time.sleep(options['latency_ms'] / 1000)
+                with lock:
+                    requests_seen[0] += 1
+                results = [
+                    {"error": "NotRegistered"} if random.random() < options['invalid_rate']
+                    else {"message_id": f"0:{random.getrandbits(48)}"}
+                    for _ in payload["registration_ids"]
+                ]
+                data = json.dumps({"results": results}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/fcm/send"
+
+        tokens = [f"bench-token-{i}" for i in range(options['tokens'])]
+        tokens += random.choices(tokens, k=int(len(tokens) * options['duplicates']))
+        random.shuffle(tokens)
+
+        try:
+            with override_settings(
+                FCM_URL=url, FCM_SERVER_KEY='bench',
+                FCM_MAX_TOKENS_PER_REQUEST=options['chunk_size'],
+                PUSH_CONCURRENCY=options['concurrency'],
+            ):
+                for round_no in range(1, options['rounds'] + 1):
+                    requests_seen[0] = 0
+                    started = time.perf_counter()
+                    stats = push.send_push_now(tokens, "Benchmark", "Push dispatch benchmark")
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"round {round_no}: {len(tokens)} tokens in, {stats['tokens']} unique, "
+                        f"{requests_seen[0]} requests, {stats['sent']} sent, {stats['failed']} failed, "
+                        f"{elapsed * 1000:.0f} ms ({stats['tokens'] / elapsed:,.0f} tokens/s)"
+                    )
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,77 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+TIMELINE_PATH = re.compile(r"^/incidents/(?P<incident_id>[^/]+)/timeline/?$")
+
+
+class Command(BaseCommand):
+    help = "Run a local ITSM stub that accepts and prints ticket timeline updates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=9099)
+        parser.add_argument('--latency-ms', type=int, default=0,
+                            help='Delay before answering each request')
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help='Fraction of requests answered with --fail-status (0-1)')
+        parser.add_argument('--fail-status', type=int, default=503)
+
+    def handle(self, *args, **options):
+        command = self
+        lock = threading.Lock()
+        counts = {"received": 0, "failed": 0}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like a real ITSM
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if options['latency_ms']:
+                    time.sleep(options['latency_ms'] / 1000)
+
+                match = TIMELINE_PATH.match(self.path)
+                if not match:
+                    return self._reply(404, {"error": "not found"})
+                if random.random() < options['fail_rate']:
+                    with lock:
+                        counts["failed"] += 1
+                    return self._reply(options['fail_status'], {"error": "injected failure"})
+
+                with lock:
+                    counts["received"] += 1
+                    total = counts["received"]
+                try:
+                    entry = json.loads(body or b"{}")
+                except ValueError:
+                    return self._reply(400, {"error": "invalid JSON"})
+                command.stdout.write(
+                    f"[{total}] {match['incident_id']} "
+                    f"auth={self.headers.get('Authorization', '-')}: {json.dumps(entry)}"
+                )
+                self._reply(201, {"status": "created"})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f"ITSM stub listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"{counts['received']} updates received, {counts['failed']} failures injected")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from chat_svc.services.tenant_stats import TenantStatsService
+
+
+class Command(BaseCommand):
+    help = "Recompute tenant statistics snapshots for all tenants in one pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, default=None, help='Only this tenant id')
+
+    def handle(self, *args, **options):
+        tenant_ids = [options['tenant']] if options['tenant'] else None
+        written = len(TenantStatsService.refresh(tenant_ids))
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {written} tenant stats snapshots"))
@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from chat_svc.services.outbox import OutboxService
+
+
+class Command(BaseCommand):
+    help = "Publish pending outbox events to the event bus in ordered batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Drain what is pending and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Events per batch (default: OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--replay-since', metavar='ISO_DATETIME',
+                            help='Re-publish every event created at or after this time, then relay')
+        parser.add_argument('--purge-days', type=int, default=None,
+                            help='Delete published events older than this many days, then relay')
+
+    def handle(self, *args, **options):
+        if options['replay_since']:
+            since = parse_datetime(options['replay_since'])
+            if since is None:
+                raise CommandError(f"Invalid datetime: {options['replay_since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            count = OutboxService.replay(since)
+            self.stdout.write(f"Queued {count} events for replay since {since.isoformat()}")
+
+        if options['purge_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['purge_days'])
+            self.stdout.write(f"Purged {OutboxService.purge(cutoff)} published events")
+
+        total = 0
+        try:
+            while True:
+                published = OutboxService.relay_batch(options['batch_size'])
+                total += published
+                if published:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Published {total} events"))
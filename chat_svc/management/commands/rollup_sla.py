@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from chat_svc.models import Tenant
+from chat_svc.services.sla_service import SLAService
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily SLA rollups for recently settled days (run daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Settled days to rebuild per tenant, picking up late messages')
+        parser.add_argument('--tenant', type=int, default=None, help='Only this tenant id')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        tenants = Tenant.objects.select_related('config')
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        written = 0
+        for tenant in tenants:
+            end = SLAService.settled_before(tenant, now)
+            written += SLAService.refresh_rollups(tenant, end - timedelta(days=options['days']), end, now)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily SLA rollups"))
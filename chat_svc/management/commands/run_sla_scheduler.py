@@ -0,0 +1,58 @@
+import logging
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from chat_svc.services.sla_service import SLAService, ShardLease
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Record SLA warnings and breaches as they come due, sharing shards with other workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single tick and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep when no thread is due')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Due threads per tick (default: SLA_BATCH_SIZE)')
+        parser.add_argument('--all-shards', action='store_true',
+                            help='Process every shard without taking leases (single worker)')
+
+    def handle(self, *args, **options):
+        lease = ShardLease()
+        limit = options['batch_size'] or getattr(settings, 'SLA_BATCH_SIZE', 500)
+        totals = {'violations': 0, 'warnings': 0}
+        try:
+            while True:
+                close_old_connections()
+                shards = None
+                if not options['all_shards']:
+                    try:
+                        shards = lease.acquire()
+                    except Exception:
+                        # Claims stay exactly-once without leases, only the work is no longer split
+                        logger.exception("SLA shard leasing failed; processing every shard this tick")
+
+                result = {'total_threads_checked': 0, 'violations': [], 'warnings': []}
+                if shards is None or shards:
+                    result = SLAService.process_due(
+                        shards=shards, total_shards=lease.shards, limit=limit
+                    )
+                    totals['violations'] += len(result['violations'])
+                    totals['warnings'] += len(result['warnings'])
+
+                if options['once']:
+                    break
+                # A full batch means more may be due already
+                if result['total_threads_checked'] < limit:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            lease.release()
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {totals['violations']} breaches and {totals['warnings']} warnings"
+        ))
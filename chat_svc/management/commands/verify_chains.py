@@ -0,0 +1,51 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from chat_svc.models import ChatThread
+from chat_svc.services.chain_verifier import ChainVerifier
+
+
+class Command(BaseCommand):
+    help = "Verify message hash chains, resuming from each thread's last signed checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--thread', type=int, action='append', dest='threads',
+                            help='Thread ID to verify (repeatable); defaults to all threads')
+        parser.add_argument('--tenant', type=int, help='Only verify threads of this tenant')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore checkpoints and re-verify every message')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker processes to fan out across threads')
+        parser.add_argument('--json', action='store_true', help='Emit one JSON result per line')
+
+    def handle(self, *args, **options):
+        threads = ChatThread.objects.order_by('id')
+        if options['threads']:
+            threads = threads.filter(id__in=options['threads'])
+        if options['tenant']:
+            threads = threads.filter(tenant_id=options['tenant'])
+        thread_ids = list(threads.values_list('id', flat=True))
+
+        broken = 0
+        checked = 0
+        for result in ChainVerifier.verify_many(
+            thread_ids, full=options['full'], workers=options['workers']
+        ):
+            checked += result.get('messages_checked', 0)
+            if result['status'] != 'ok':
+                broken += 1
+
+            if options['json']:
+                self.stdout.write(json.dumps(result))
+            elif result['status'] == 'ok':
+                self.stdout.write(self.style.SUCCESS(
+                    f"✔ Thread {result['thread_id']}: verified {result['verified_from']}"
+                    f"-{result['verified_to']} ({result['messages_checked']} messages)"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f"✘ Thread {result['thread_id']}: {result['error']}"
+                ))
+
+        self.stdout.write(f"{len(thread_ids)} threads, {checked} messages re-verified, {broken} broken")
+        if broken:
+            raise CommandError(f"{broken} thread(s) failed chain verification")
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-17 16:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_sequences(apps, schema_editor):
+    """Number existing messages per thread and seed each thread's chain head."""
+    ChatThread = apps.get_model('chat_svc', 'ChatThread')
+    Message = apps.get_model('chat_svc', 'Message')
+    MessageChainHead = apps.get_model('chat_svc', 'MessageChainHead')
+
+    for thread_id in ChatThread.objects.values_list('id', flat=True).iterator():
+        rows = list(
+            Message.objects.filter(thread_id=thread_id)
+            .order_by('created_at', 'id')
+            .values_list('id', 'hash')
+        )
+        batch = []
+        for sequence, (message_id, _) in enumerate(rows, start=1):
+            batch.append(Message(id=message_id, sequence=sequence))
+        Message.objects.bulk_update(batch, ['sequence'], batch_size=1000)
+        MessageChainHead.objects.create(
+            thread_id=thread_id,
+            last_sequence=len(rows),
+            last_hash=rows[-1][1] if rows else '',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0004_tenant_billing_address_tenant_contact_email_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageChainHead',
+            fields=[
+                ('thread', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chain_head', serialize=False, to='chat_svc.chatthread')),
+                ('last_sequence', models.PositiveBigIntegerField(default=0)),
+                ('last_hash', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='message',
+            options={'ordering': ['created_at', 'id']},
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sequence',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_sequences, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='sequence',
+            field=models.PositiveBigIntegerField(editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='message',
+            unique_together={('thread', 'sequence')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-17 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0005_message_sequence_chain_head'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+                ('signature', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='chat_svc.chatthread')),
+            ],
+            options={
+                'ordering': ['thread', 'sequence'],
+                'unique_together': {('thread', 'sequence')},
+            },
+        ),
+    ]
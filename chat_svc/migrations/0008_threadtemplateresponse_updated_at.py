@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-17 17:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0007_threadreadstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='threadtemplateresponse',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-17 18:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def subscribe_existing_participants(apps, schema_editor):
+    """Subscribe everyone who has already posted in a thread"""
+    Message = apps.get_model('chat_svc', 'Message')
+    ThreadSubscription = apps.get_model('chat_svc', 'ThreadSubscription')
+    pairs = Message.objects.values_list('thread_id', 'sender_id').distinct().iterator()
+    batch = []
+    for thread_id, user_id in pairs:
+        batch.append(ThreadSubscription(thread_id=thread_id, user_id=user_id, reason='participant'))
+        if len(batch) >= 1000:
+            ThreadSubscription.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ThreadSubscription.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0009_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('participant', 'Participant'), ('assignee', 'Assignee'), ('watcher', 'Watcher')], default='participant', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='chat_svc.chatthread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'thread'], name='subscription_user_idx')],
+                'unique_together': {('thread', 'user')},
+            },
+        ),
+        migrations.RunPython(subscribe_existing_participants, migrations.RunPython.noop),
+    ]
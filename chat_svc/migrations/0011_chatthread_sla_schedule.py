@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:20
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_existing_threads(apps, schema_editor):
+    """Put existing threads on the SLA schedule
+
+    Threads already past their deadline were escalated by the old full-scan
+    checker, so they start out breached instead of being escalated again.
+    """
+    ChatThread = apps.get_model('chat_svc', 'ChatThread')
+    TenantConfiguration = apps.get_model('chat_svc', 'TenantConfiguration')
+    configs = {c.tenant_id: c for c in TenantConfiguration.objects.all()}
+    default_hours = getattr(settings, 'INCIDENT_SLA_HOURS', 24)
+    now = timezone.now()
+
+    batch = []
+    for thread in ChatThread.objects.only('id', 'tenant_id', 'created_at').iterator():
+        config = configs.get(thread.tenant_id)
+        hours = config.default_sla_hours if config else default_hours
+        deadline = thread.created_at + timedelta(hours=hours)
+        warning_at = None
+        if config and config.enable_auto_escalation:
+            warning_at = deadline - timedelta(hours=min(hours * 0.2, config.escalation_warning_hours))
+
+        if now > deadline:
+            thread.sla_stage, thread.sla_next_at = 'breached', None
+        elif warning_at and now >= warning_at:
+            thread.sla_stage, thread.sla_next_at = 'warned', deadline
+        else:
+            thread.sla_stage, thread.sla_next_at = 'active', warning_at or deadline
+        batch.append(thread)
+        if len(batch) >= 1000:
+            ChatThread.objects.bulk_update(batch, ['sla_stage', 'sla_next_at'])
+            batch = []
+    ChatThread.objects.bulk_update(batch, ['sla_stage', 'sla_next_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0010_threadsubscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatthread',
+            name='sla_stage',
+            field=models.CharField(choices=[('active', 'Active'), ('warned', 'Warned'), ('breached', 'Breached')], default='active', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='sla_next_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(fields=['sla_next_at'], name='thread_sla_due_idx'),
+        ),
+        migrations.RunPython(schedule_existing_threads, migrations.RunPython.noop),
+    ]
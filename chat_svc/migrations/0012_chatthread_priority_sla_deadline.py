@@ -0,0 +1,70 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:05
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_deadlines(apps, schema_editor):
+    """Store each thread's deadlines from its tenant's default SLA hours
+
+    Existing threads have no priority yet, so one UPDATE per tenant is enough.
+    """
+    ChatThread = apps.get_model('chat_svc', 'ChatThread')
+    Tenant = apps.get_model('chat_svc', 'Tenant')
+    TenantConfiguration = apps.get_model('chat_svc', 'TenantConfiguration')
+    configs = {
+        tenant_id: (hours, warning_hours)
+        for tenant_id, hours, warning_hours in TenantConfiguration.objects.values_list(
+            'tenant_id', 'default_sla_hours', 'escalation_warning_hours'
+        )
+    }
+    default_hours = getattr(settings, 'INCIDENT_SLA_HOURS', 24)
+
+    for tenant_id in Tenant.objects.values_list('id', flat=True):
+        hours, warning_hours = configs.get(tenant_id, (default_hours, None))
+        # Same lead as SLAService.warning_lead
+        lead = hours * 0.2 if warning_hours is None else min(hours * 0.2, warning_hours)
+        ChatThread.objects.filter(tenant_id=tenant_id).update(
+            sla_deadline=F('created_at') + timedelta(hours=hours),
+            sla_warning_at=F('created_at') + timedelta(hours=hours - lead),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0011_chatthread_sla_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatthread',
+            name='priority',
+            field=models.CharField(blank=True, choices=[('high', 'High'), ('medium', 'Medium'), ('low', 'Low')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='sla_deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='sla_warning_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(fields=['sla_deadline'], name='thread_sla_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(fields=['sla_warning_at'], name='thread_sla_warning_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(fields=['tenant', 'sla_deadline'], name='thread_tenant_sla_idx'),
+        ),
+        migrations.RunPython(backfill_deadlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0012_chatthread_priority_sla_deadline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLADailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_threads', models.PositiveIntegerField(default=0)),
+                ('breached_threads', models.PositiveIntegerField(default=0)),
+                ('resolved_threads', models.PositiveIntegerField(default=0)),
+                ('resolution_hours', models.FloatField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sla_rollups', to='chat_svc.tenant')),
+            ],
+            options={
+                'unique_together': {('tenant', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0013_sladailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('messages', models.BigIntegerField(default=0)),
+                ('threads', models.BigIntegerField(default=0)),
+                ('users', models.BigIntegerField(default=0)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_counters', to='chat_svc.tenant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket'], name='activity_period_idx')],
+                'unique_together': {('tenant', 'period', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_sizes(apps, schema_editor):
+    """Record the stored size of existing attachments
+
+    Stored files are encrypted, so this is within a few bytes of the upload.
+    """
+    Attachment = apps.get_model('chat_svc', 'Attachment')
+    batch = []
+    for attachment in Attachment.objects.only('id', 'file').iterator():
+        try:
+            attachment.size = attachment.file.storage.size(attachment.file.name)
+        except (OSError, ValueError):
+            continue
+        batch.append(attachment)
+        if len(batch) >= 1000:
+            Attachment.objects.bulk_update(batch, ['size'])
+            batch = []
+    Attachment.objects.bulk_update(batch, ['size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_svc', '0014_activitycounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='TenantStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stats', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats_snapshot', to='chat_svc.tenant')),
+            ],
+        ),
+        migrations.RunPython(backfill_sizes, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from decimal import Decimal
+import uuid
 from integrations.encryption import EncryptedTextField
 from integrations.encrypted_storage import EncryptedFileSystemStorage
 
@@ -318,6 +319,25 @@ class QuestionTemplate(models.Model):
 
 
 class ChatThread(models.Model):
+    # SLA escalation stages, each recorded once by the SLA scheduler
+    SLA_STAGE_ACTIVE = "active"
+    SLA_STAGE_WARNED = "warned"
+    SLA_STAGE_BREACHED = "breached"
+    SLA_STAGE_CHOICES = [
+        (SLA_STAGE_ACTIVE, "Active"),
+        (SLA_STAGE_WARNED, "Warned"),
+        (SLA_STAGE_BREACHED, "Breached"),
+    ]
+
+    PRIORITY_HIGH = "high"
+    PRIORITY_MEDIUM = "medium"
+    PRIORITY_LOW = "low"
+    PRIORITY_CHOICES = [
+        (PRIORITY_HIGH, "High"),
+        (PRIORITY_MEDIUM, "Medium"),
+        (PRIORITY_LOW, "Low"),
+    ]
+
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE)
     incident_id = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -326,10 +346,25 @@ class ChatThread(models.Model):
         on_delete=models.SET_NULL,
         related_name="threads"
     )
+    # No priority means the tenant's default SLA hours
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, null=True, blank=True)
+    # Derived from created_at, priority and the tenant's SLA hours by SLAService;
+    # the thread is at risk after sla_warning_at and breached after sla_deadline
+    sla_deadline = models.DateTimeField(null=True, blank=True)
+    sla_warning_at = models.DateTimeField(null=True, blank=True)
+    sla_stage = models.CharField(max_length=10, choices=SLA_STAGE_CHOICES, default=SLA_STAGE_ACTIVE)
+    # When the next SLA stage is due; null once there is nothing left to escalate
+    sla_next_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         app_label = 'chat_svc'
         unique_together = ("tenant", "incident_id")  
+        indexes = [
+            models.Index(fields=["sla_next_at"], name="thread_sla_due_idx"),
+            models.Index(fields=["sla_deadline"], name="thread_sla_deadline_idx"),
+            models.Index(fields=["sla_warning_at"], name="thread_sla_warning_idx"),
+            models.Index(fields=["tenant", "sla_deadline"], name="thread_tenant_sla_idx"),
+        ]
 
     def __str__(self):
         if self.template:
@@ -341,9 +376,16 @@ class ChatThread(models.Model):
         from django.conf import settings
         from django.utils import timezone
         from datetime import timedelta
-        hours = getattr(settings, "INCIDENT_SLA_HOURS", 24)
-        due = self.created_at + timedelta(hours=hours)
-        return "breached" if timezone.now() > due else "active"
+        deadline, warning_at = self.sla_deadline, self.sla_warning_at
+        if deadline is None:
+            # Not scheduled yet
+            hours = getattr(settings, "INCIDENT_SLA_HOURS", 24)
+            deadline = self.created_at + timedelta(hours=hours)
+            warning_at = self.created_at + timedelta(hours=hours * 0.8)
+        now = timezone.now()
+        if now > deadline:
+            return "breached"
+        return "at_risk" if now > warning_at else "active"
 
 
 class ThreadTemplateResponse(models.Model):
@@ -355,35 +397,94 @@ class ThreadTemplateResponse(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     response_data = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class Message(models.Model):
     class Meta:
         app_label = 'chat_svc'
-        ordering = ['created_at']
+        ordering = ['created_at', 'id']
+        unique_together = ("thread", "sequence")
     
     thread = models.ForeignKey(ChatThread, related_name='messages', on_delete=models.CASCADE)
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     content = EncryptedTextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    sequence = models.PositiveBigIntegerField(editable=False)
     previous_hash = models.CharField(max_length=64, blank=True)
     hash = models.CharField(max_length=64, blank=True)
 
     def save(self, *args, **kwargs):
-        if not self.hash:
-            prev = (
-                Message.objects.filter(thread=self.thread)
-                .order_by("-created_at")
-                .first()
-            )
-            prev_hash = prev.hash if prev else ""
+        if self.hash:
+            return super().save(*args, **kwargs)
+
+        from django.db import transaction
+        import hashlib
+
+        with transaction.atomic():
+            head = MessageChainHead.claim_next(self.thread_id)
+            prev_hash = head.last_hash
+            self.sequence = head.last_sequence
             self.previous_hash = prev_hash
-            import hashlib
 
             sha = hashlib.sha256()
             sha.update((prev_hash + str(self.sender_id) + self.content).encode())
             self.hash = sha.hexdigest()
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+
+            head.last_hash = self.hash
+            head.save(update_fields=["last_hash", "updated_at"])
+
+
+class MessageChainHead(models.Model):
+    """Tip of a thread's message hash chain.
+
+    Holds the last issued sequence number and hash so inserts never scan
+    the messages table. Bumping ``last_sequence`` with an UPDATE takes the
+    row lock, which serializes concurrent writers to the same thread and
+    keeps the chain from forking.
+    """
+    class Meta:
+        app_label = 'chat_svc'
+
+    thread = models.OneToOneField(
+        ChatThread, on_delete=models.CASCADE, primary_key=True, related_name='chain_head'
+    )
+    last_sequence = models.PositiveBigIntegerField(default=0)
+    last_hash = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def claim_next(cls, thread_id):
+        """Reserve the next sequence number; must run inside a transaction."""
+        from django.db.models import F
+
+        bump = cls.objects.filter(thread_id=thread_id)
+        if not bump.update(last_sequence=F("last_sequence") + 1):
+            cls.objects.get_or_create(thread_id=thread_id)
+            bump.update(last_sequence=F("last_sequence") + 1)
+        return cls.objects.get(thread_id=thread_id)
+
+
+class ChainCheckpoint(models.Model):
+    """Signed record that a thread's hash chain verified up to ``sequence``.
+
+    The chain verifier resumes from the latest checkpoint whose signature
+    still matches instead of re-hashing the thread from its first message.
+    """
+    class Meta:
+        app_label = 'chat_svc'
+        unique_together = ("thread", "sequence")
+        ordering = ['thread', 'sequence']
+
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='checkpoints')
+    sequence = models.PositiveBigIntegerField()
+    hash = models.CharField(max_length=64)
+    signature = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Thread #{self.thread_id} @ {self.sequence}"
 
 
 class StructuredReply(models.Model):
@@ -407,6 +508,133 @@ class ReadReceipt(models.Model):
         unique_together = ("message", "user")
 
 
+class ThreadReadState(models.Model):
+    """Per-user read watermark for a thread.
+
+    ``last_read_sequence`` is the highest sequence up to which every message
+    from other participants has been read, so unread counts only look at the
+    messages past it. Detailed per-message ``ReadReceipt`` rows are still
+    written for ``read_by`` / ``read_receipts``.
+    """
+    class Meta:
+        app_label = 'chat_svc'
+        unique_together = ("user", "thread")
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='thread_read_states')
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='read_states')
+    last_read_sequence = models.PositiveBigIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} read #{self.thread_id} through {self.last_read_sequence}"
+
+    @classmethod
+    def mark_through(cls, user_id, thread_id, sequence, timestamp=None):
+        """Move the watermark forward to ``sequence``; never moves it back."""
+        values = {"last_read_sequence": sequence, "last_read_at": timestamp or timezone.now()}
+        bump = cls.objects.filter(
+            user_id=user_id, thread_id=thread_id, last_read_sequence__lt=sequence
+        )
+        if not bump.update(**values):
+            _, created = cls.objects.get_or_create(
+                user_id=user_id, thread_id=thread_id, defaults=values
+            )
+            if not created:
+                bump.update(**values)
+
+    @classmethod
+    def advance(cls, user_id, thread_id, timestamp=None):
+        """Move the watermark up to the first message the user has not read yet.
+
+        Only the messages past the current watermark are looked at, so this
+        stays cheap when reads arrive in order.
+        """
+        current = (
+            cls.objects.filter(user_id=user_id, thread_id=thread_id)
+            .values_list("last_read_sequence", flat=True)
+            .first()
+        ) or 0
+        first_unread = (
+            Message.objects.filter(thread_id=thread_id, sequence__gt=current)
+            .exclude(sender_id=user_id)
+            .exclude(receipts__user_id=user_id)
+            .order_by("sequence")
+            .values_list("sequence", flat=True)
+            .first()
+        )
+        if first_unread is None:
+            through = (
+                MessageChainHead.objects.filter(thread_id=thread_id)
+                .values_list("last_sequence", flat=True)
+                .first()
+            ) or 0
+        else:
+            through = first_unread - 1
+        if through > current:
+            cls.mark_through(user_id, thread_id, through, timestamp)
+        return max(through, current)
+
+
+class ThreadSubscription(models.Model):
+    """Who gets notified about a thread.
+
+    Tenant users are subscribed as participants when they post through the
+    chat send paths (staff and system senders are not), assignees when a
+    thread is assigned to them, and anyone can watch a thread explicitly.
+    Notification fan-out reads this table instead of every device in the
+    tenant.
+    """
+    PARTICIPANT = 'participant'
+    ASSIGNEE = 'assignee'
+    WATCHER = 'watcher'
+    REASONS = [
+        (PARTICIPANT, 'Participant'),
+        (ASSIGNEE, 'Assignee'),
+        (WATCHER, 'Watcher'),
+    ]
+
+    class Meta:
+        app_label = 'chat_svc'
+        unique_together = ("thread", "user")
+        indexes = [models.Index(fields=['user', 'thread'], name='subscription_user_idx')]
+
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='subscriptions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='thread_subscriptions')
+    reason = models.CharField(max_length=20, choices=REASONS, default=PARTICIPANT)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} -> #{self.thread_id} ({self.reason})"
+
+    @classmethod
+    def subscribe(cls, thread_id, user_ids, reason=PARTICIPANT):
+        """Subscribe users; existing subscriptions keep their reason unless this is an assignment."""
+        user_ids = {u for u in user_ids if u}
+        if not user_ids:
+            return
+        if reason == cls.ASSIGNEE:
+            cls.objects.filter(thread_id=thread_id, user_id__in=user_ids).update(reason=reason)
+        cls.objects.bulk_create(
+            [cls(thread_id=thread_id, user_id=u, reason=reason) for u in user_ids],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def subscribe_sender(cls, thread_id, user):
+        """Subscribe a message sender as participant, unless staff or a system account"""
+        if user.is_staff or user.is_superuser:
+            return
+        cls.subscribe(thread_id, [user.id])
+
+    @classmethod
+    def subscriber_ids(cls, thread_id, exclude_user_id=None):
+        qs = cls.objects.filter(thread_id=thread_id, user__is_active=True)
+        if exclude_user_id:
+            qs = qs.exclude(user_id=exclude_user_id)
+        return list(qs.values_list('user_id', flat=True))
+
+
 class Attachment(models.Model):
     """File attachment linked to a message."""
     class Meta:
@@ -420,6 +648,8 @@ class Attachment(models.Model):
         storage=EncryptedFileSystemStorage(),
     )
     checksum = models.CharField(max_length=64, editable=False, blank=True)
+    # Bytes uploaded, so storage usage can be summed without touching the files
+    size = models.PositiveBigIntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
         if self.file and not self.checksum:
@@ -430,6 +660,7 @@ class Attachment(models.Model):
             sha = hashlib.sha256()
             sha.update(data)
             self.checksum = sha.hexdigest()
+            self.size = len(data)
             self.file = ContentFile(data, name=self.file.name)
         super().save(*args, **kwargs)
 
@@ -459,4 +690,97 @@ class MessageLog(models.Model):
     content = EncryptedTextField(blank=True)
     structured = models.JSONField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
-    version = models.PositiveIntegerField()
\ No newline at end of file
+    version = models.PositiveIntegerField()
+
+class OutboxEvent(models.Model):
+    """Event waiting to be published to the event bus.
+
+    Rows are inserted in the same transaction as the data they describe and
+    published afterwards by the outbox relay in ``id`` order. ``event_id`` is
+    sent with the event so consumers can drop redeliveries.
+    """
+    class Meta:
+        app_label = 'chat_svc'
+        ordering = ['id']
+        indexes = [models.Index(fields=['published_at', 'id'], name='outbox_pending_idx')]
+
+    event_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    topic = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.topic}:{self.payload.get('type')} #{self.id}"
+
+
+class SLADailyRollup(models.Model):
+    """SLA outcome of one tenant's threads created on one day.
+
+    Only written for settled days, whose threads are all past their deadline,
+    so the counts stop changing. SLA reports read these rows instead of
+    scanning every thread in the window.
+    """
+    class Meta:
+        app_label = 'chat_svc'
+        unique_together = ('tenant', 'date')
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='sla_rollups')
+    date = models.DateField()
+    total_threads = models.PositiveIntegerField(default=0)
+    breached_threads = models.PositiveIntegerField(default=0)
+    # Threads with at least one message, and the summed hours to their last message
+    resolved_threads = models.PositiveIntegerField(default=0)
+    resolution_hours = models.FloatField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.date}: {self.breached_threads}/{self.total_threads} breached"
+
+
+class ActivityCounter(models.Model):
+    """Messages, threads and users created per tenant in one hour or one day.
+
+    Kept up to date incrementally by ``chat_svc.signals`` and rebuilt by
+    ``manage.py backfill_activity_counters``. Dashboards sum these rows
+    instead of counting the underlying tables.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+
+    class Meta:
+        app_label = 'chat_svc'
+        unique_together = ('tenant', 'period', 'bucket')
+        indexes = [models.Index(fields=['period', 'bucket'], name='activity_period_idx')]
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='activity_counters')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    # Start of the hour or day, in the server's time zone
+    bucket = models.DateTimeField()
+    messages = models.BigIntegerField(default=0)
+    threads = models.BigIntegerField(default=0)
+    users = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.period} {self.bucket:%Y-%m-%d %H:00}"
+
+
+class TenantStatsSnapshot(models.Model):
+    """Precomputed usage and SLA statistics for one tenant.
+
+    Written by ``TenantStatsService`` for many tenants at once and embedded
+    by the tenant serializers until older than ``TENANT_STATS_MAX_AGE_SECONDS``.
+    """
+    class Meta:
+        app_label = 'chat_svc'
+
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, related_name='stats_snapshot')
+    stats = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.tenant_id} stats @ {self.computed_at:%Y-%m-%d %H:%M}"
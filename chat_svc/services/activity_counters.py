@@ -0,0 +1,136 @@
+"""
+Hourly and daily activity counters per tenant
+Creations are counted into ActivityCounter rows once their transaction
+commits; deletions subtract from the buckets the rows were counted in.
+Counter writes never fail the write they describe, and the backfill
+repairs any drift
+"""
+
+import logging
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from chat_svc.models import ActivityCounter, ChatThread, Message, User
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("messages", "threads", "users")
+
+
+class ActivityCounters:
+    """Service for maintaining and reading ``ActivityCounter`` rows"""
+
+    @staticmethod
+    def buckets(ts):
+        """(period, bucket start) pairs containing a timestamp"""
+        hour = timezone.localtime(ts).replace(minute=0, second=0, microsecond=0)
+        return ((ActivityCounter.HOUR, hour), (ActivityCounter.DAY, hour.replace(hour=0)))
+
+    @staticmethod
+    def _bump(tenant_id, period, bucket, deltas):
+        rows = ActivityCounter.objects.filter(tenant_id=tenant_id, period=period, bucket=bucket)
+        updates = {metric: F(metric) + delta for metric, delta in deltas.items()}
+        if rows.update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                ActivityCounter.objects.create(tenant_id=tenant_id, period=period, bucket=bucket, **deltas)
+        except IntegrityError:
+            # Another writer created the bucket first
+            rows.update(**updates)
+
+    @classmethod
+    def _bump_safe(cls, tenant_id, period, bucket, deltas):
+        try:
+            cls._bump(tenant_id, period, bucket, deltas)
+        except Exception:
+            logger.exception("Failed to update activity counters for tenant %s", tenant_id)
+
+    @classmethod
+    def add(cls, tenant_id, ts, **deltas):
+        """Add ``deltas`` to the hour and day buckets containing ``ts``"""
+        if tenant_id is None or not any(deltas.values()):
+            return
+        for period, bucket in cls.buckets(ts):
+            cls._bump_safe(tenant_id, period, bucket, deltas)
+
+    @classmethod
+    def record(cls, tenant_id, ts, **deltas):
+        """Count a creation after commit, keeping counter rows out of the write's transaction"""
+        if tenant_id is not None:
+            transaction.on_commit(lambda: cls.add(tenant_id, ts, **deltas))
+
+    @classmethod
+    def remove_messages(cls, messages):
+        """Subtract a message queryset about to be deleted, in one grouped query"""
+        rows = (
+            messages.annotate(hour=TruncHour("created_at"))
+            .order_by().values_list("thread__tenant_id", "hour").annotate(n=Count("id"))
+        )
+        by_day = defaultdict(int)
+        for tenant_id, hour, n in rows:
+            cls._bump_safe(tenant_id, ActivityCounter.HOUR, hour, {"messages": -n})
+            by_day[(tenant_id, cls.buckets(hour)[1][1])] += n
+        for (tenant_id, day), n in by_day.items():
+            cls._bump_safe(tenant_id, ActivityCounter.DAY, day, {"messages": -n})
+
+    @staticmethod
+    def totals_by_tenant():
+        """``{tenant_id: {metric: total}}`` summed from the daily rows"""
+        rows = (
+            ActivityCounter.objects.filter(period=ActivityCounter.DAY).order_by()
+            .values("tenant_id").annotate(**{f"total_{m}": Sum(m) for m in METRICS})
+        )
+        return {row["tenant_id"]: {m: row[f"total_{m}"] or 0 for m in METRICS} for row in rows}
+
+    @staticmethod
+    def recent(hours_since, days_since, tenant_id=None):
+        """Per-bucket totals across tenants: ``(hourly, daily)`` dicts keyed by bucket start"""
+        rows = ActivityCounter.objects.filter(
+            Q(period=ActivityCounter.HOUR, bucket__gte=hours_since)
+            | Q(period=ActivityCounter.DAY, bucket__gte=days_since)
+        )
+        if tenant_id is not None:
+            rows = rows.filter(tenant_id=tenant_id)
+        rows = rows.order_by().values("period", "bucket").annotate(**{f"total_{m}": Sum(m) for m in METRICS})
+
+        hourly, daily = {}, {}
+        for row in rows:
+            target = hourly if row["period"] == ActivityCounter.HOUR else daily
+            target[timezone.localtime(row["bucket"])] = {m: row[f"total_{m}"] or 0 for m in METRICS}
+        return hourly, daily
+
+    @classmethod
+    def backfill(cls, tenant_id=None):
+        """Rebuild counters from the source tables; returns rows written"""
+        sources = (
+            ("messages", Message.objects.all(), "thread__tenant_id", "created_at"),
+            ("threads", ChatThread.objects.all(), "tenant_id", "created_at"),
+            ("users", User.objects.filter(tenant__isnull=False), "tenant_id", "date_joined"),
+        )
+        counters = []
+        for period, trunc in ((ActivityCounter.HOUR, TruncHour), (ActivityCounter.DAY, TruncDay)):
+            counts = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+            for metric, queryset, tenant_field, date_field in sources:
+                if tenant_id is not None:
+                    queryset = queryset.filter(**{tenant_field: tenant_id})
+                rows = (
+                    queryset.annotate(bucket=trunc(date_field)).order_by()
+                    .values_list(tenant_field, "bucket").annotate(n=Count("id"))
+                )
+                for row_tenant, bucket, n in rows:
+                    counts[(row_tenant, bucket)][metric] = n
+            counters.extend(
+                ActivityCounter(tenant_id=row_tenant, period=period, bucket=bucket, **values)
+                for (row_tenant, bucket), values in counts.items()
+            )
+
+        with transaction.atomic():
+            existing = ActivityCounter.objects.all()
+            if tenant_id is not None:
+                existing = existing.filter(tenant_id=tenant_id)
+            existing.delete()
+            ActivityCounter.objects.bulk_create(counters, batch_size=1000)
+        return len(counters)
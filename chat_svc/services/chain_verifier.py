@@ -0,0 +1,169 @@
+"""
+Hash-chain verification for thread messages
+Re-verifies only the messages written since a thread's last signed checkpoint
+and can fan out across threads with a process pool
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac, constant_time_compare
+from chat_svc.models import ChatThread, Message, MessageChainHead, ChainCheckpoint
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_SALT = "chat_svc.chain_checkpoint"
+
+
+class ChainVerifier:
+    """Service for verifying message hash chains"""
+
+    @classmethod
+    def checkpoint_interval(cls):
+        return getattr(settings, 'CHAIN_CHECKPOINT_INTERVAL', 1000)
+
+    @classmethod
+    def sign(cls, thread_id, sequence, chain_hash):
+        """HMAC over the checkpoint contents, keyed by CHAIN_CHECKPOINT_KEY"""
+        secret = getattr(settings, 'CHAIN_CHECKPOINT_KEY', None) or settings.SECRET_KEY
+        value = f"{thread_id}:{sequence}:{chain_hash}"
+        return salted_hmac(SIGNATURE_SALT, value, secret=secret, algorithm='sha256').hexdigest()
+
+    @classmethod
+    def _latest_valid_checkpoint(cls, thread_id):
+        """Newest checkpoint whose signature verifies, and whether any were rejected"""
+        tampered = False
+        for checkpoint in ChainCheckpoint.objects.filter(thread_id=thread_id).order_by('-sequence'):
+            expected = cls.sign(thread_id, checkpoint.sequence, checkpoint.hash)
+            if constant_time_compare(expected, checkpoint.signature):
+                return checkpoint, tampered
+            tampered = True
+        return None, tampered
+
+    @classmethod
+    def verify_thread(cls, thread_id, full=False):
+        """Verify one thread's chain and return a result dict"""
+        started = timezone.now()
+        checkpoint, tampered = (None, False) if full else cls._latest_valid_checkpoint(thread_id)
+        # Read the tip first; messages written after it are left for the next run
+        head = MessageChainHead.objects.filter(thread_id=thread_id).values_list('last_sequence', 'last_hash').first()
+        head_sequence, head_hash = head or (0, "")
+
+        expected_sequence = checkpoint.sequence + 1 if checkpoint else 1
+        running_hash = checkpoint.hash if checkpoint else ""
+        verified_from = expected_sequence
+        interval = cls.checkpoint_interval()
+        checked = 0
+        error = None
+
+        messages = (
+            Message.objects.filter(thread_id=thread_id, sequence__gte=expected_sequence, sequence__lte=head_sequence)
+            .order_by('sequence')
+            .only('id', 'sequence', 'sender_id', 'content', 'previous_hash', 'hash')
+        )
+        for msg in messages.iterator(chunk_size=2000):
+            if msg.sequence != expected_sequence:
+                error = {'message_id': msg.id, 'sequence': msg.sequence,
+                         'reason': f'sequence gap, expected {expected_sequence}'}
+                break
+            if msg.previous_hash != running_hash:
+                error = {'message_id': msg.id, 'sequence': msg.sequence,
+                         'reason': 'previous_hash does not match preceding message'}
+                break
+            sha = hashlib.sha256()
+            sha.update((running_hash + str(msg.sender_id) + msg.content).encode())
+            if sha.hexdigest() != msg.hash:
+                error = {'message_id': msg.id, 'sequence': msg.sequence,
+                         'reason': 'hash does not match message contents'}
+                break
+
+            running_hash = msg.hash
+            checked += 1
+            if msg.sequence % interval == 0:
+                ChainCheckpoint.objects.update_or_create(
+                    thread_id=thread_id, sequence=msg.sequence,
+                    defaults={
+                        'hash': msg.hash,
+                        'signature': cls.sign(thread_id, msg.sequence, msg.hash),
+                    }
+                )
+            expected_sequence += 1
+
+        # Deleting the newest messages leaves an intact prefix; the tip must match the chain head
+        if error is None and expected_sequence - 1 != head_sequence:
+            error = {'message_id': None, 'sequence': expected_sequence - 1,
+                     'reason': f'chain ends before chain head at sequence {head_sequence}'}
+        elif error is None and running_hash != head_hash:
+            error = {'message_id': None, 'sequence': head_sequence,
+                     'reason': 'last hash does not match chain head'}
+
+        return {
+            'thread_id': thread_id,
+            'status': 'broken' if error else 'ok',
+            'resumed_from_checkpoint': checkpoint.sequence if checkpoint else None,
+            'rejected_checkpoints': tampered,
+            'verified_from': verified_from,
+            'verified_to': expected_sequence - 1,
+            'messages_checked': checked,
+            'error': error,
+            'duration_ms': int((timezone.now() - started).total_seconds() * 1000),
+        }
+
+    @classmethod
+    async def stream_many(cls, thread_ids, full=False):
+        """Async-iterate verification results one thread at a time, for streaming responses"""
+        thread_ids = await sync_to_async(list)(thread_ids)
+        for thread_id in thread_ids:
+            yield await sync_to_async(cls.verify_thread)(thread_id, full=full)
+
+    @classmethod
+    def verify_many(cls, thread_ids=None, full=False, workers=1):
+        """Yield verification results as each thread finishes.
+
+        With ``workers`` > 1 threads are verified in a process pool, so
+        results arrive in completion order rather than thread order.
+        """
+        if thread_ids is None:
+            thread_ids = ChatThread.objects.order_by('id').values_list('id', flat=True)
+        thread_ids = list(thread_ids)
+
+        if workers <= 1:
+            for thread_id in thread_ids:
+                yield cls.verify_thread(thread_id, full=full)
+            return
+
+        # Children must open their own database connections
+        from django.db import connections
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(_verify_thread_worker, thread_id, full): thread_id
+                for thread_id in thread_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.exception(f"Chain verification failed for thread {futures[future]}")
+                    yield {
+                        'thread_id': futures[future],
+                        'status': 'error',
+                        'error': {'reason': str(e)},
+                    }
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    from django.db import connections
+    connections.close_all()
+
+
+def _verify_thread_worker(thread_id, full):
+    return ChainVerifier.verify_thread(thread_id, full=full)
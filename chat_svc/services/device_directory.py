@@ -0,0 +1,97 @@
+"""
+In-process directory of push device tokens, keyed by tenant and user
+Lookups on the notification hot path are served from memory. Each tenant
+has a version counter in Redis that the Device and User signal handlers
+bump, so every worker process drops its stale copy on the next lookup
+"""
+
+import logging
+import threading
+import time
+from django.conf import settings
+from chat_svc.models import Device
+from integrations import redis_client
+
+logger = logging.getLogger(__name__)
+
+VERSION_PREFIX = "devices:version"
+
+
+class DeviceTokenDirectory:
+    """Cached ``{user_id: (is_staff, [tokens])}`` per tenant for active users"""
+
+    _entries = {}   # tenant_id -> (version, loaded_at, users)
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @classmethod
+    def _version(cls, tenant_id):
+        """Current Redis version for a tenant, or None when Redis is unavailable"""
+        try:
+            return int(redis_client.get_client().get(f"{VERSION_PREFIX}:{tenant_id}") or 0)
+        except Exception:
+            logger.warning("Device directory version check failed for tenant %s", tenant_id)
+            return None
+
+    @classmethod
+    def _load(cls, tenant_id):
+        users = {}
+        rows = Device.objects.filter(
+            user__tenant_id=tenant_id, user__is_active=True
+        ).values_list("user_id", "user__is_staff", "token")
+        for user_id, is_staff, token in rows:
+            users.setdefault(user_id, (is_staff, []))[1].append(token)
+        return users
+
+    @classmethod
+    def _users(cls, tenant_id):
+        version = cls._version(tenant_id)
+        ttl = getattr(settings, "DEVICE_DIRECTORY_TTL_SECONDS", 300)
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(tenant_id)
+            # Without Redis the TTL alone bounds staleness
+            if entry and (version is None or entry[0] == version) and now - entry[1] < ttl:
+                cls._stats["hits"] += 1
+                return entry[2]
+            cls._stats["misses"] += 1
+
+        users = cls._load(tenant_id)
+        with cls._lock:
+            cls._entries[tenant_id] = (version, now, users)
+        return users
+
+    @classmethod
+    def tenant_tokens(cls, tenant_id, exclude_user_ids=(), staff_only=False):
+        """Tokens of every active user in the tenant, minus ``exclude_user_ids``"""
+        exclude = set(exclude_user_ids)
+        return [
+            token
+            for user_id, (is_staff, tokens) in cls._users(tenant_id).items()
+            if user_id not in exclude and (is_staff or not staff_only)
+            for token in tokens
+        ]
+
+    @classmethod
+    def tokens_by_user(cls, tenant_id, user_ids):
+        """``{user_id: [tokens]}`` for the given users of a tenant"""
+        users = cls._users(tenant_id)
+        return {u: users[u][1] for u in user_ids if u in users}
+
+    @classmethod
+    def invalidate(cls, tenant_id):
+        """Drop the tenant's entry here and in every other process"""
+        if tenant_id is None:
+            return
+        with cls._lock:
+            cls._entries.pop(tenant_id, None)
+            cls._stats["invalidations"] += 1
+        try:
+            redis_client.get_client().incr(f"{VERSION_PREFIX}:{tenant_id}")
+        except Exception:
+            logger.warning("Failed to publish device directory invalidation for tenant %s", tenant_id)
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            return {**cls._stats, "tenants_cached": len(cls._entries)}
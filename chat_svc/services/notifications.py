@@ -0,0 +1,173 @@
+"""
+Notification fan-out for thread activity
+Resolves who should hear about a message from the thread's subscriptions
+(participants, assignees, watchers) rather than every device in the tenant,
+skips subscribers who are online in the thread, and folds bursts into
+per-user digests tracked in Redis
+"""
+
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from chat_svc.models import ChatThread, ThreadSubscription
+from chat_svc.services.device_directory import DeviceTokenDirectory
+from integrations import push, redis_client
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PREFIX = "notify:digest"
+DUE_KEY = f"{DIGEST_PREFIX}:due"
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+class NotificationService:
+    """Service for pushing thread activity to subscribed users
+
+    The first message a user is notified about opens a digest window of
+    ``PUSH_DIGEST_WINDOW_SECONDS`` and is pushed straight away. Further
+    messages in the window are only counted; when it closes the user gets
+    one "N new messages in <incident>" push, unless they came online in the
+    thread meanwhile. Windows, counters and the due queue live in Redis, so
+    every worker process shares them.
+    """
+
+    @staticmethod
+    def _online_usernames(thread_id):
+        from chat_svc.chat_api.services import PresenceService
+
+        return set(PresenceService().get_online_users_sync(thread_id))
+
+    @staticmethod
+    def _digest_keys(thread_id, user_id):
+        return (f"{DIGEST_PREFIX}:{thread_id}:{user_id}:window",
+                f"{DIGEST_PREFIX}:{thread_id}:{user_id}:count")
+
+    @classmethod
+    def offline_subscribers(cls, thread_id, exclude_user_id=None):
+        """User ids of subscribers who are not connected to the thread right now"""
+        subscribers = ThreadSubscription.objects.filter(thread_id=thread_id, user__is_active=True)
+        if exclude_user_id:
+            subscribers = subscribers.exclude(user_id=exclude_user_id)
+        subscribers = list(subscribers.values_list("user_id", "user__username"))
+        if not subscribers or not getattr(settings, "PUSH_SUPPRESS_ONLINE", True):
+            return [user_id for user_id, _ in subscribers]
+        try:
+            online = cls._online_usernames(thread_id)
+        except Exception:
+            logger.exception("Presence lookup failed; notifying every subscriber of thread %s", thread_id)
+            online = set()
+        return [user_id for user_id, username in subscribers if username not in online]
+
+    @classmethod
+    def _open_windows(cls, thread_id, user_ids):
+        """Split users into those to push now and those folded into a digest"""
+        window = getattr(settings, "PUSH_DIGEST_WINDOW_SECONDS", 60)
+        if window <= 0 or not user_ids:
+            return list(user_ids)
+
+        # Any notifying process also flushes, so digests survive the one that queued them
+        _ensure_flusher()
+        r = redis_client.get_client()
+        now = time.time()
+        with r.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                # The window key holds the time the window opened
+                pipe.set(cls._digest_keys(thread_id, user_id)[0], now, nx=True, ex=window)
+            opened = pipe.execute()
+
+        immediate = [u for u, first in zip(user_ids, opened) if first]
+        folded = [u for u, first in zip(user_ids, opened) if not first]
+        if folded:
+            opened_at = r.mget([cls._digest_keys(thread_id, user_id)[0] for user_id in folded])
+            with r.pipeline(transaction=False) as pipe:
+                for user_id, started in zip(folded, opened_at):
+                    count_key = cls._digest_keys(thread_id, user_id)[1]
+                    pipe.incr(count_key)
+                    pipe.expire(count_key, window * 2)
+                    # Due when the window that was open closes; a window that
+                    # expired meanwhile counts as opened now
+                    due = (float(started) if started else now) + window
+                    pipe.zadd(DUE_KEY, {f"{thread_id}:{user_id}": due}, nx=True)
+                pipe.execute()
+        return immediate
+
+    @classmethod
+    def notify_message(cls, thread, message, title="New message", body=None):
+        """Push a new message to offline subscribers of the thread, except its sender"""
+        user_ids = cls.offline_subscribers(thread.id, exclude_user_id=message.sender_id)
+        try:
+            user_ids = cls._open_windows(thread.id, user_ids)
+        except Exception:
+            logger.exception("Digest tracking failed; pushing thread %s without coalescing", thread.id)
+
+        by_user = DeviceTokenDirectory.tokens_by_user(thread.tenant_id, user_ids)
+        tokens = [t for user_tokens in by_user.values() for t in user_tokens]
+        if tokens:
+            push.send_push(tokens, title, message.content if body is None else body)
+        return len(tokens)
+
+    @classmethod
+    def flush_due_digests(cls, now=None):
+        """Send every digest whose window has closed; returns the number of digests sent"""
+        r = redis_client.get_client()
+        members = r.zrangebyscore(DUE_KEY, "-inf", now or time.time())
+        if not members:
+            return 0
+
+        counts = {}
+        for member in members:
+            # ZREM succeeds for exactly one process, which then owns the digest
+            if not r.zrem(DUE_KEY, member):
+                continue
+            thread_id, user_id = (int(part) for part in member.split(":"))
+            count_key = cls._digest_keys(thread_id, user_id)[1]
+            with r.pipeline(transaction=True) as pipe:
+                pipe.get(count_key)
+                pipe.delete(count_key)
+                count = int(pipe.execute()[0] or 0)
+            if count:
+                counts.setdefault(thread_id, {})[user_id] = count
+
+        sent = 0
+        threads = ChatThread.objects.in_bulk(list(counts))
+        for thread_id, per_user in counts.items():
+            thread = threads.get(thread_id)
+            if thread is None:
+                continue
+            offline = set(cls.offline_subscribers(thread_id)) & set(per_user)
+            tokens = DeviceTokenDirectory.tokens_by_user(thread.tenant_id, offline)
+            for user_id in offline:
+                if tokens.get(user_id):
+                    n = per_user[user_id]
+                    push.send_push(
+                        tokens[user_id], f"New messages in {thread.incident_id}",
+                        f"{n} new message{'s' if n != 1 else ''} in {thread.incident_id}",
+                    )
+                    sent += 1
+        return sent
+
+
+def _flush_loop():
+    interval = getattr(settings, "PUSH_DIGEST_POLL_SECONDS", 5)
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            NotificationService.flush_due_digests()
+        except Exception:
+            logger.exception("Failed to flush notification digests")
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    """Start this process's digest flusher thread on first use"""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="push-digests", daemon=True)
+            _flusher.start()
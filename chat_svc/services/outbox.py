@@ -0,0 +1,105 @@
+"""
+Transactional outbox for chat, thread and SLA events
+Events are written as OutboxEvent rows inside the caller's transaction and
+published later by the relay, so broker latency or outages never reach the
+request path and no event is lost when the broker is down
+"""
+
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from chat_svc.models import OutboxEvent
+from integrations import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """Service for recording events and relaying them to the event bus"""
+
+    @staticmethod
+    def emit(topic, event, key=None):
+        """Record ``event`` for publishing.
+
+        Call inside the ``transaction.atomic()`` block that writes the rows the
+        event describes: the event becomes visible to the relay only if that
+        transaction commits. ``key`` (usually the thread id) is the partition
+        key, which keeps one thread's events in order on the broker.
+        """
+        return OutboxEvent.objects.create(
+            topic=topic,
+            key="" if key is None else str(key),
+            payload=event,
+        )
+
+    @classmethod
+    def batch_size(cls):
+        return getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+
+    @classmethod
+    def relay_batch(cls, batch_size=None):
+        """Publish the oldest unpublished events and return how many were published.
+
+        Delivery is at-least-once: a batch is marked published only after the
+        transport acknowledged it. On the first failed record the batch stops
+        there and the rest is retried next time, in order; records after it
+        that did reach the broker are sent again and carry the same
+        ``event_id`` so consumers can drop the duplicates.
+        """
+        transport = event_bus.get_transport()
+        if not transport.available:
+            logger.warning("Event bus transport not configured; outbox relay idle")
+            return 0
+
+        with transaction.atomic():
+            # Row locks keep concurrent relays from publishing the same batch twice
+            batch = list(
+                OutboxEvent.objects.select_for_update()
+                .filter(published_at__isnull=True)
+                .order_by('id')[:batch_size or cls.batch_size()]
+            )
+            if not batch:
+                return 0
+
+            records = [
+                (row.topic, {**row.payload, "event_id": str(row.event_id)}, row.key or None)
+                for row in batch
+            ]
+            try:
+                failures = transport.send_batch(records)
+            except Exception as e:
+                logger.exception("Outbox relay failed to publish batch")
+                failures = [(0, e)]
+
+            # send_batch reports failures by index into records
+            delivered, error = len(batch), ""
+            if failures:
+                delivered, exc = min(failures, key=lambda failure: failure[0])
+                error = str(exc)
+
+            now = timezone.now()
+            OutboxEvent.objects.filter(id__in=[row.id for row in batch[:delivered]]).update(
+                published_at=now, attempts=F('attempts') + 1, last_error=""
+            )
+            if delivered < len(batch):
+                stuck = batch[delivered]
+                OutboxEvent.objects.filter(id=stuck.id).update(
+                    attempts=F('attempts') + 1, last_error=error[:1000]
+                )
+                logger.error(f"Outbox event {stuck.event_id} failed to publish: {error}")
+        return delivered
+
+    @classmethod
+    def replay(cls, since):
+        """Mark events created at or after ``since`` unpublished so the relay sends them again"""
+        return OutboxEvent.objects.filter(created_at__gte=since).update(published_at=None)
+
+    @classmethod
+    def purge(cls, older_than):
+        """Delete published events created before ``older_than``"""
+        deleted, _ = OutboxEvent.objects.filter(
+            published_at__isnull=False, created_at__lt=older_than
+        ).delete()
+        return deleted
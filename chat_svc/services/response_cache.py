@@ -0,0 +1,196 @@
+"""
+Stale-while-revalidate caching for expensive read-only admin endpoints
+Responses are kept in the configured Django cache. A fresh entry is served
+as is; an expired one, or one older than its tenant's last write, is still
+served while a single background refresh rebuilds it. Concurrent misses for
+the same key share one computation: in-process through a Future, across
+processes through a short cache lock.
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.test import RequestFactory
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "respcache"
+GLOBAL_SCOPE = "all"
+
+_inflight = {}  # entry key -> Future of (status, data), for callers in this process
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ADMIN_CACHE_REFRESH_WORKERS", 2),
+                thread_name_prefix="respcache",
+            )
+    return _executor
+
+
+def _gen_key(scope):
+    return f"{PREFIX}:gen:{scope}"
+
+
+def invalidate(*tenant_ids):
+    """Bump the generation of each tenant's scope and of the global scope"""
+    for scope in {GLOBAL_SCOPE, *(t for t in tenant_ids if t is not None)}:
+        key = _gen_key(scope)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # First write for this scope; a racing writer may have added it meanwhile
+                if not cache.add(key, 1, timeout=None):
+                    cache.incr(key)
+        except Exception:
+            logger.warning("Failed to invalidate cached responses for scope %s", scope)
+
+
+def _store(key, gen, ttl, stale, status, data):
+    if status == 200:
+        entry = {"data": data, "gen": gen, "fresh_until": time.time() + ttl}
+        cache.set(key, entry, timeout=ttl + stale)
+
+
+def _compute(key, gen, ttl, stale, fn):
+    """Run ``fn`` once per key for every concurrent caller in this process"""
+    with _lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        response = fn()
+        result = (response.status_code, response.data)
+        _store(key, gen, ttl, stale, *result)
+        future.set_result(result)
+        return result
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def _compute_shared(key, gen, ttl, stale, fn):
+    """Compute a missing entry, letting another process finish first if it holds the lock"""
+    wait = getattr(settings, "ADMIN_CACHE_WAIT_SECONDS", 10)
+    lock_key = f"{key}:lock"
+    owner = cache.add(lock_key, 1, timeout=wait)
+    if not owner:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return 200, entry["data"]
+            if cache.get(lock_key) is None:
+                # Released without storing an entry, e.g. the response was not a 200
+                break
+        owner = cache.add(lock_key, 1, timeout=wait)
+    try:
+        return _compute(key, gen, ttl, stale, fn)
+    finally:
+        # Never release a lock another process holds
+        if owner:
+            cache.delete(lock_key)
+
+
+def _refresh(key, gen, ttl, stale, fn):
+    close_old_connections()
+    try:
+        _compute(key, gen, ttl, stale, fn)
+    except Exception:
+        logger.exception("Failed to refresh cached response %s", key)
+    finally:
+        cache.delete(f"{key}:lock")
+        close_old_connections()
+
+
+def _detached(view, args, kwargs, request):
+    """Rebuild the view call on a new GET request with only the path, query string and user.
+
+    A background refresh outlives the request that triggered it, so it must
+    not reuse that request or its viewset.
+    """
+    path, host, secure, user = request.get_full_path(), request.get_host(), request.is_secure(), request.user
+
+    def call():
+        fresh = Request(RequestFactory().get(path, HTTP_HOST=host, secure=secure))
+        fresh.user = user
+        call_args = [fresh if arg is request else arg for arg in args]
+        if call_args[0] is not fresh:
+            viewset = copy.copy(call_args[0])
+            viewset.request = fresh
+            call_args[0] = viewset
+        return view(*call_args, **kwargs)
+    return call
+
+
+def cached_endpoint(name, ttl=None, stale=None, tenant_kwarg=None):
+    """Cache a GET view's 200 responses per query string, with stale-while-revalidate.
+
+    ``tenant_kwarg`` names the URL kwarg holding the tenant id; such entries
+    follow that tenant's generation, others the global one. Apply below
+    ``@api_view``/``@action`` so permissions are checked on every request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Function views get (request, ...), viewset actions (self, request, ...)
+            request = args[0] if hasattr(args[0], "query_params") else args[1]
+            if request.method != "GET" or not getattr(settings, "ADMIN_CACHE_ENABLED", True):
+                return view(*args, **kwargs)
+
+            fresh_for = ttl or getattr(settings, "ADMIN_CACHE_TTL_SECONDS", 30)
+            stale_for = stale or getattr(settings, "ADMIN_CACHE_STALE_SECONDS", 300)
+            scope = kwargs.get(tenant_kwarg) if tenant_kwarg else GLOBAL_SCOPE
+            params = hashlib.md5(
+                "&".join(f"{k}={v}" for k, v in sorted(request.query_params.lists())).encode()
+            ).hexdigest()
+            key = f"{PREFIX}:{name}:{scope}:{params}"
+            fn = lambda: view(*args, **kwargs)  # noqa: E731
+
+            try:
+                found = cache.get_many([key, _gen_key(scope)])
+            except Exception:
+                logger.warning("Response cache unavailable; computing %s directly", name)
+                return view(*args, **kwargs)
+            entry, gen = found.get(key), found.get(_gen_key(scope), 0)
+
+            if entry is None:
+                status_code, data = _compute_shared(key, gen, fresh_for, stale_for, fn)
+                state = "MISS"
+            elif entry["gen"] == gen and time.time() < entry["fresh_until"]:
+                status_code, data, state = 200, entry["data"], "HIT"
+            else:
+                # One refresh per key across processes; everyone else keeps the stale copy
+                if cache.add(f"{key}:lock", 1, timeout=getattr(settings, "ADMIN_CACHE_WAIT_SECONDS", 10)):
+                    refresh = _detached(view, args, kwargs, request)
+                    _get_executor().submit(_refresh, key, gen, fresh_for, stale_for, refresh)
+                status_code, data, state = 200, entry["data"], "STALE"
+
+            response = Response(data, status=status_code)
+            response["X-Cache"] = state
+            return response
+        return wrapper
+    return decorator
@@ -3,13 +3,23 @@ SLA Service for tenant configuration and enforcement
 Handles SLA monitoring, escalation, and enforcement based on tenant settings
 """
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
-from django.db.models import Q
-from chat_svc.models import ChatThread, TenantConfiguration, Message
-from integrations import event_bus, push
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Mod, TruncDate
+from chat_svc.models import ChatThread, TenantConfiguration, Message, SLADailyRollup, User
+from integrations import push
+from chat_svc.services.device_directory import DeviceTokenDirectory
+from chat_svc.services.outbox import OutboxService
+from integrations import redis_client
 import logging
+import os
+import random
+import socket
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -17,28 +27,65 @@ logger = logging.getLogger(__name__)
 class SLAService:
     """Service for managing SLA compliance and enforcement"""
     
-    @classmethod
-    def get_sla_hours_for_thread(cls, thread):
-        """Get SLA hours for a specific thread based on tenant configuration"""
+    # TenantConfiguration field holding the SLA hours for each thread priority
+    PRIORITY_HOURS_FIELDS = {
+        None: 'default_sla_hours',
+        ChatThread.PRIORITY_HIGH: 'high_priority_sla_hours',
+        ChatThread.PRIORITY_MEDIUM: 'medium_priority_sla_hours',
+        ChatThread.PRIORITY_LOW: 'low_priority_sla_hours',
+    }
+    
+    @staticmethod
+    def _config(tenant):
         try:
-            config = thread.tenant.config
-            # For now, use default SLA. In the future, this could be based on
-            # thread priority, template type, or other factors
-            return config.default_sla_hours
+            return tenant.config
         except (AttributeError, TenantConfiguration.DoesNotExist):
+            return None
+    
+    @classmethod
+    def sla_hours(cls, config, priority=None):
+        """SLA hours for a priority under a tenant configuration"""
+        if config is None:
             # Fallback to global setting
             return getattr(settings, 'INCIDENT_SLA_HOURS', 24)
+        return getattr(config, cls.PRIORITY_HOURS_FIELDS.get(priority, 'default_sla_hours'))
+    
+    @staticmethod
+    def warning_lead(config, sla_hours):
+        """Hours before the deadline a thread turns at risk and the SLA warning goes out"""
+        if config is None:
+            return sla_hours * 0.2
+        # The last 20% of the SLA, but no earlier than escalation_warning_hours
+        # before the deadline
+        return min(sla_hours * 0.2, config.escalation_warning_hours)
+    
+    @staticmethod
+    def auto_escalates(config):
+        return config is not None and config.enable_auto_escalation
     
     @classmethod
-    def get_thread_sla_status(cls, thread):
+    def get_sla_hours_for_thread(cls, thread):
+        """Get SLA hours for a specific thread based on its priority and tenant configuration"""
+        return cls.sla_hours(cls._config(thread.tenant), thread.priority)
+    
+    @classmethod
+    def compute_deadlines(cls, thread):
+        """(sla_warning_at, sla_deadline) from the thread's priority and tenant settings"""
+        config = cls._config(thread.tenant)
+        sla_hours = cls.sla_hours(config, thread.priority)
+        deadline = thread.created_at + timedelta(hours=sla_hours)
+        return deadline - timedelta(hours=cls.warning_lead(config, sla_hours)), deadline
+    
+    @classmethod
+    def get_thread_sla_status(cls, thread, now=None):
         """Get detailed SLA status for a thread"""
-        sla_hours = cls.get_sla_hours_for_thread(thread)
-        
         # Calculate thresholds
-        sla_deadline = thread.created_at + timedelta(hours=sla_hours)
-        warning_threshold = thread.created_at + timedelta(hours=sla_hours * 0.8)
+        if thread.sla_deadline:
+            warning_threshold, sla_deadline = thread.sla_warning_at, thread.sla_deadline
+        else:
+            warning_threshold, sla_deadline = cls.compute_deadlines(thread)
         
-        now = timezone.now()
+        now = now or timezone.now()
         
         if now > sla_deadline:
             return {
@@ -63,123 +110,239 @@ class SLAService:
             }
     
     @classmethod
-    def check_all_sla_violations(cls):
-        """Check all active threads for SLA violations and trigger actions"""
+    def filter_by_status(cls, queryset, status, now=None):
+        """Restrict a thread queryset to one SLA status with index range filters"""
+        now = now or timezone.now()
+        if status == 'breached':
+            return queryset.filter(sla_deadline__lt=now)
+        if status == 'at_risk':
+            return queryset.filter(sla_warning_at__lt=now, sla_deadline__gte=now)
+        if status == 'active':
+            return queryset.filter(sla_warning_at__gte=now)
+        return queryset
+    
+    @classmethod
+    def _escalation_at(cls, thread):
+        """When the SLA warning is due (``sla_warning_at``), or None when the tenant has no auto-escalation"""
+        if not cls.auto_escalates(cls._config(thread.tenant)):
+            return None
+        return thread.sla_warning_at or cls.compute_deadlines(thread)[0]
+    
+    @classmethod
+    def next_due_at(cls, thread, stage=None):
+        """When the stage after ``stage`` is due, or None once the thread has breached"""
+        stage = stage or thread.sla_stage
+        if stage == ChatThread.SLA_STAGE_BREACHED:
+            return None
+        deadline = thread.sla_deadline or cls.compute_deadlines(thread)[1]
+        if stage == ChatThread.SLA_STAGE_ACTIVE:
+            escalation_at = cls._escalation_at(thread)
+            if escalation_at:
+                return escalation_at
+        return deadline
+    
+    @classmethod
+    def schedule(cls, thread, now=None):
+        """Store the thread's deadlines and when its next SLA stage is due.
+
+        Run when a thread is created or its priority changes. A deadline that
+        moved later re-arms the warning and breach it no longer deserves.
+        """
+        now = now or timezone.now()
+        warning_at, deadline = cls.compute_deadlines(thread)
+        stage = thread.sla_stage
+        if stage == ChatThread.SLA_STAGE_BREACHED and deadline >= now:
+            stage = ChatThread.SLA_STAGE_WARNED
+        thread.sla_warning_at, thread.sla_deadline = warning_at, deadline
+        if stage == ChatThread.SLA_STAGE_WARNED:
+            escalation_at = cls._escalation_at(thread)
+            if escalation_at and escalation_at > now:
+                stage = ChatThread.SLA_STAGE_ACTIVE
+        
+        fields = {
+            'sla_warning_at': warning_at,
+            'sla_deadline': deadline,
+            'sla_stage': stage,
+            'sla_next_at': cls.next_due_at(thread, stage),
+        }
+        for name, value in fields.items():
+            setattr(thread, name, value)
+        ChatThread.objects.filter(pk=thread.pk).update(**fields)
+        return thread.sla_next_at
+    
+    @classmethod
+    def recalculate_tenant(cls, tenant_id, now=None):
+        """Re-derive deadlines and due times for every thread of a tenant.
+
+        Runs a few set-based UPDATEs per priority after the tenant's SLA
+        settings change, instead of loading the threads.
+        """
+        now = now or timezone.now()
+        config = TenantConfiguration.objects.filter(tenant_id=tenant_id).first()
+        threads = ChatThread.objects.filter(tenant_id=tenant_id)
+        created = F('created_at')
+        
+        escalates = cls.auto_escalates(config)
+        
+        with transaction.atomic():
+            for priority in cls.PRIORITY_HOURS_FIELDS:
+                sla_hours = cls.sla_hours(config, priority)
+                lead = cls.warning_lead(config, sla_hours)
+                qs = threads.filter(Q(priority=priority) if priority else Q(priority__isnull=True) | Q(priority=''))
+                
+                qs.update(
+                    sla_deadline=created + timedelta(hours=sla_hours),
+                    sla_warning_at=created + timedelta(hours=sla_hours - lead),
+                )
+                # Re-arm stages whose deadline or warning moved into the future
+                qs.filter(
+                    sla_stage=ChatThread.SLA_STAGE_BREACHED, sla_deadline__gte=now
+                ).update(sla_stage=ChatThread.SLA_STAGE_WARNED)
+                if escalates:
+                    qs.filter(
+                        sla_stage=ChatThread.SLA_STAGE_WARNED, sla_warning_at__gt=now,
+                    ).update(sla_stage=ChatThread.SLA_STAGE_ACTIVE)
+                
+                qs.filter(sla_stage=ChatThread.SLA_STAGE_ACTIVE).update(
+                    sla_next_at=F('sla_warning_at') if escalates else F('sla_deadline')
+                )
+                qs.filter(sla_stage=ChatThread.SLA_STAGE_WARNED).update(sla_next_at=F('sla_deadline'))
+                qs.filter(sla_stage=ChatThread.SLA_STAGE_BREACHED).update(sla_next_at=None)
+        
+            cls.invalidate_rollups(tenant_id)
+        
+        logger.info(f"Recalculated SLA deadlines for tenant {tenant_id}")
+    
+    @classmethod
+    def _claim(cls, thread, stage):
+        """Advance a due thread to ``stage``; False if another worker already did.
+
+        The update only matches while the row still has the stage and due time
+        this worker read, so each transition is recorded exactly once. Call it
+        inside the transaction that records the transition.
+        """
+        next_at = cls.next_due_at(thread, stage)
+        claimed = ChatThread.objects.filter(
+            pk=thread.pk, sla_stage=thread.sla_stage, sla_next_at=thread.sla_next_at
+        ).update(sla_stage=stage, sla_next_at=next_at)
+        if claimed:
+            thread.sla_stage, thread.sla_next_at = stage, next_at
+        return bool(claimed)
+    
+    @classmethod
+    def process_due(cls, shards=None, total_shards=None, limit=None, now=None):
+        """Record every SLA transition that has come due.
+
+        Only threads whose ``sla_next_at`` has passed are read, through the
+        ``thread_sla_due_idx`` index, so a run costs in proportion to the due
+        threads. ``shards`` restricts the run to threads with
+        ``id % total_shards`` in that set (see ``ShardLease``).
+        """
+        now = now or timezone.now()
+        limit = limit or getattr(settings, 'SLA_BATCH_SIZE', 500)
+        
+        due = ChatThread.objects.filter(sla_next_at__lte=now)
+        if shards is not None:
+            total_shards = total_shards or getattr(settings, 'SLA_SHARDS', 16)
+            due = due.annotate(sla_shard=Mod('id', total_shards)).filter(sla_shard__in=list(shards))
+        due = list(due.select_related('tenant', 'tenant__config').order_by('sla_next_at')[:limit])
+        
         violations = []
         warnings = []
+        if due:
+            system_user = User.objects.filter(is_staff=True).order_by('id').first()
         
-        # Get all active threads
-        active_threads = ChatThread.objects.select_related('tenant', 'tenant__config').all()
-        
-        for thread in active_threads:
-            sla_status = cls.get_thread_sla_status(thread)
+        for thread in due:
+            sla_status = cls.get_thread_sla_status(thread, now)
+            entry = {'thread': thread, 'status': sla_status, 'tenant': thread.tenant}
             
             if sla_status['status'] == 'breached':
-                violations.append({
-                    'thread': thread,
-                    'status': sla_status,
-                    'tenant': thread.tenant
-                })
-                cls._handle_sla_breach(thread, sla_status)
-            
-            elif sla_status['status'] == 'at_risk':
-                warnings.append({
-                    'thread': thread,
-                    'status': sla_status,
-                    'tenant': thread.tenant
-                })
-                cls._handle_sla_warning(thread, sla_status)
+                if cls._handle_sla_breach(thread, sla_status, system_user):
+                    violations.append(entry)
+            elif thread.sla_stage == ChatThread.SLA_STAGE_ACTIVE and now >= (
+                cls._escalation_at(thread) or sla_status['deadline']
+            ):
+                if cls._handle_sla_warning(thread, sla_status, system_user):
+                    warnings.append(entry)
+            else:
+                # SLA hours changed since the thread was scheduled
+                ChatThread.objects.filter(
+                    pk=thread.pk, sla_stage=thread.sla_stage, sla_next_at=thread.sla_next_at
+                ).update(sla_next_at=cls.next_due_at(thread))
         
-        logger.info(f"SLA Check completed: {len(violations)} violations, {len(warnings)} warnings")
+        if due:
+            logger.info(f"SLA run completed: {len(due)} due, {len(violations)} violations, {len(warnings)} warnings")
         
         return {
             'violations': violations,
             'warnings': warnings,
-            'total_threads_checked': active_threads.count()
+            'total_threads_checked': len(due)
         }
     
     @classmethod
-    def _handle_sla_breach(cls, thread, sla_status):
+    def check_all_sla_violations(cls):
+        """Record due SLA transitions for every shard, up to one batch"""
+        return cls.process_due()
+    
+    @classmethod
+    def _handle_sla_breach(cls, thread, sla_status, system_user=None):
         """Handle SLA breach - escalation and notifications"""
         try:
-            config = thread.tenant.config
-            
             # Create escalation message
             escalation_message = f"SLA BREACH: Thread {thread.incident_id} exceeded SLA by {sla_status['hours_overdue']:.1f} hours"
             
-            # Add system message to thread
-            from chat_svc.models import User
-            system_user = User.objects.filter(is_staff=True).first()
-            if system_user:
-                Message.objects.create(
-                    thread=thread,
-                    sender=system_user,
-                    content=escalation_message
-                )
+            # Add system message to thread and record the escalation event with it
+            with transaction.atomic():
+                if not cls._claim(thread, ChatThread.SLA_STAGE_BREACHED):
+                    return False
+                if system_user:
+                    Message.objects.create(
+                        thread=thread,
+                        sender=system_user,
+                        content=escalation_message
+                    )
+                OutboxService.emit("sla-events", {
+                    "type": "sla_breach",
+                    "thread_id": thread.id,
+                    "tenant_id": thread.tenant_id,
+                    "incident_id": thread.incident_id,
+                    "hours_overdue": sla_status['hours_overdue'],
+                    "deadline": sla_status['deadline'].isoformat(),
+                    "escalation_level": "critical"
+                }, key=thread.id)
             
             # Send escalation email if configured
-            if config.escalation_email:
+            config = getattr(thread.tenant, 'config', None)
+            if config and config.escalation_email:
                 cls._send_escalation_email(thread, sla_status, config.escalation_email)
             
-            # Publish escalation event
-            event_bus.publish_event("sla-events", {
-                "type": "sla_breach",
-                "thread_id": thread.id,
-                "tenant_id": thread.tenant_id,
-                "incident_id": thread.incident_id,
-                "hours_overdue": sla_status['hours_overdue'],
-                "deadline": sla_status['deadline'].isoformat(),
-                "escalation_level": "critical"
-            })
-            
             logger.warning(f"SLA breach handled for thread {thread.incident_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to handle SLA breach for thread {thread.incident_id}: {e}")
+            return False
     
     @classmethod
-    def _handle_sla_warning(cls, thread, sla_status):
+    def _handle_sla_warning(cls, thread, sla_status, system_user=None):
         """Handle SLA warning - notifications and alerts"""
         try:
-            config = thread.tenant.config
-            
-            # Only send warning if escalation is enabled and within warning threshold
-            if not config.enable_auto_escalation:
-                return
-            
             hours_remaining = sla_status['hours_remaining']
-            warning_hours = config.escalation_warning_hours
             
-            if hours_remaining <= warning_hours:
-                # Create warning message
-                warning_message = f"SLA WARNING: Thread {thread.incident_id} approaching SLA deadline in {hours_remaining:.1f} hours"
-                
-                # Add system message to thread
-                from chat_svc.models import User
-                system_user = User.objects.filter(is_staff=True).first()
+            # Create warning message
+            warning_message = f"SLA WARNING: Thread {thread.incident_id} approaching SLA deadline in {hours_remaining:.1f} hours"
+            
+            # Add system message to thread and record the warning event with it
+            with transaction.atomic():
+                if not cls._claim(thread, ChatThread.SLA_STAGE_WARNED):
+                    return False
                 if system_user:
                     Message.objects.create(
                         thread=thread,
                         sender=system_user,
                         content=warning_message
                     )
-                
-                # Send push notifications to tenant users
-                from chat_svc.models import Device
-                tokens = Device.objects.filter(
-                    user__tenant_id=thread.tenant_id,
-                    user__is_staff=True
-                ).values_list("token", flat=True)
-                
-                if tokens:
-                    push.send_push(
-                        tokens, 
-                        "SLA Warning", 
-                        f"Thread {thread.incident_id} approaching deadline"
-                    )
-                
-                # Publish warning event
-                event_bus.publish_event("sla-events", {
+                OutboxService.emit("sla-events", {
                     "type": "sla_warning",
                     "thread_id": thread.id,
                     "tenant_id": thread.tenant_id,
@@ -187,12 +350,24 @@ class SLAService:
                     "hours_remaining": hours_remaining,
                     "deadline": sla_status['deadline'].isoformat(),
                     "escalation_level": "warning"
-                })
-                
-                logger.info(f"SLA warning sent for thread {thread.incident_id}")
+                }, key=thread.id)
+            
+            # Send push notifications to tenant staff
+            tokens = DeviceTokenDirectory.tenant_tokens(thread.tenant_id, staff_only=True)
+            
+            if tokens:
+                push.send_push(
+                    tokens, 
+                    "SLA Warning", 
+                    f"Thread {thread.incident_id} approaching deadline"
+                )
+            
+            logger.info(f"SLA warning sent for thread {thread.incident_id}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to handle SLA warning for thread {thread.incident_id}: {e}")
+            return False
     
     @classmethod
     def _send_escalation_email(cls, thread, sla_status, email):
@@ -208,17 +383,142 @@ class SLAService:
         except Exception as e:
             logger.error(f"Failed to send escalation email: {e}")
     
+    @classmethod
+    def max_sla_hours(cls, config):
+        """Longest SLA any thread of the tenant can have"""
+        return max(cls.sla_hours(config, priority) for priority in cls.PRIORITY_HOURS_FIELDS)
+    
+    @staticmethod
+    def _day_start(day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    
+    @classmethod
+    def settled_before(cls, tenant, now=None):
+        """First day whose threads may still change SLA status; earlier days are final"""
+        now = now or timezone.now()
+        return timezone.localtime(now - timedelta(hours=cls.max_sla_hours(cls._config(tenant)))).date()
+    
+    @staticmethod
+    def _with_last_message(threads):
+        return threads.annotate(last_message_at=Subquery(
+            Message.objects.filter(thread=OuterRef('pk')).order_by('-sequence').values('created_at')[:1]
+        ))
+    
+    @staticmethod
+    def _report_aggregates(now):
+        """Aggregates over threads annotated by ``_with_last_message``"""
+        return {
+            'total_threads': Count('id'),
+            'breached_threads': Count('id', filter=Q(sla_deadline__lt=now)),
+            'at_risk_threads': Count('id', filter=Q(sla_warning_at__lt=now, sla_deadline__gte=now)),
+            'resolved_threads': Count('last_message_at'),
+            'resolution': Sum(ExpressionWrapper(
+                F('last_message_at') - F('created_at'), output_field=DurationField()
+            )),
+        }
+    
+    @classmethod
+    def refresh_rollups(cls, tenant, start, end, now=None):
+        """Recompute daily SLA rollups for settled days in [start, end); returns rows written"""
+        now = now or timezone.now()
+        end = min(end, cls.settled_before(tenant, now))
+        if start >= end:
+            return 0
+        
+        threads = cls._with_last_message(ChatThread.objects.filter(
+            tenant=tenant, created_at__gte=cls._day_start(start), created_at__lt=cls._day_start(end)
+        ))
+        by_day = {
+            row['day']: row
+            for row in threads.annotate(day=TruncDate('created_at')).order_by()
+            .values('day').annotate(**cls._report_aggregates(now))
+        }
+        
+        # Days without threads get a zero row too, so a report can tell them from missing days
+        rollups = []
+        day = start
+        while day < end:
+            row = by_day.get(day, {})
+            rollups.append(SLADailyRollup(
+                tenant=tenant,
+                date=day,
+                total_threads=row.get('total_threads', 0),
+                breached_threads=row.get('breached_threads', 0),
+                resolved_threads=row.get('resolved_threads', 0),
+                resolution_hours=row['resolution'].total_seconds() / 3600 if row.get('resolution') else 0,
+            ))
+            day += timedelta(days=1)
+        
+        with transaction.atomic():
+            SLADailyRollup.objects.filter(tenant=tenant, date__gte=start, date__lt=end).delete()
+            SLADailyRollup.objects.bulk_create(rollups)
+        return len(rollups)
+    
+    @classmethod
+    def invalidate_rollups(cls, tenant_id, day=None):
+        """Drop rollups that no longer match their threads; reports rebuild them"""
+        rollups = SLADailyRollup.objects.filter(tenant_id=tenant_id)
+        if day is not None:
+            rollups = rollups.filter(date=day)
+        rollups.delete()
+    
+    @classmethod
+    def invalidate_thread_rollup(cls, thread, now=None):
+        """Drop the rollup holding ``thread`` once a message changes its resolution figures"""
+        day = timezone.localtime(thread.created_at).date()
+        # Rollups only cover settled days, and today never is one
+        if day < timezone.localdate(now or timezone.now()):
+            cls.invalidate_rollups(thread.tenant_id, day)
+    
     @classmethod
     def get_tenant_sla_report(cls, tenant, days=30):
-        """Generate SLA performance report for a tenant"""
-        from django.db.models import Count, Avg
+        """Generate SLA performance report for a tenant.
+
+        Settled days come from ``SLADailyRollup`` rows, built on first use.
+        Only the partial first day and the days whose threads can still
+        breach are aggregated live, in one query.
+        """
+        now = timezone.now()
+        cutoff_date = now - timedelta(days=days)
+        first_full_day = timezone.localtime(cutoff_date).date() + timedelta(days=1)
+        settled_before = cls.settled_before(tenant, now)
         
-        cutoff_date = timezone.now() - timedelta(days=days)
+        totals = {'total_threads': 0, 'breached_threads': 0, 'at_risk_threads': 0,
+                  'resolved_threads': 0, 'resolution_hours': 0.0}
+        live = Q(created_at__gte=cutoff_date)
         
-        # Get threads created in the period
-        threads = tenant.chatthread_set.filter(created_at__gte=cutoff_date)
+        if first_full_day < settled_before:
+            rollups = SLADailyRollup.objects.filter(
+                tenant=tenant, date__gte=first_full_day, date__lt=settled_before
+            ).values_list('date', 'total_threads', 'breached_threads', 'resolved_threads', 'resolution_hours')
+            rows = list(rollups)
+            if len(rows) < (settled_before - first_full_day).days:
+                have = {row[0] for row in rows}
+                missing = [first_full_day + timedelta(days=i)
+                           for i in range((settled_before - first_full_day).days)
+                           if first_full_day + timedelta(days=i) not in have]
+                cls.refresh_rollups(tenant, missing[0], missing[-1] + timedelta(days=1), now)
+                rows = list(rollups.all())
+            
+            for _, total, breached, resolved, hours in rows:
+                totals['total_threads'] += total
+                totals['breached_threads'] += breached
+                totals['resolved_threads'] += resolved
+                totals['resolution_hours'] += hours
+            live = (
+                Q(created_at__gte=cutoff_date, created_at__lt=cls._day_start(first_full_day))
+                | Q(created_at__gte=cls._day_start(settled_before))
+            )
         
-        total_threads = threads.count()
+        current = cls._with_last_message(ChatThread.objects.filter(live, tenant=tenant)).aggregate(
+            **cls._report_aggregates(now)
+        )
+        for key in ('total_threads', 'breached_threads', 'at_risk_threads', 'resolved_threads'):
+            totals[key] += current[key]
+        if current['resolution']:
+            totals['resolution_hours'] += current['resolution'].total_seconds() / 3600
+        
+        total_threads = totals['total_threads']
         if total_threads == 0:
             return {
                 'total_threads': 0,
@@ -229,49 +529,98 @@ class SLAService:
                 'period_days': days
             }
         
-        # Calculate SLA compliance
-        breached_count = 0
-        at_risk_count = 0
-        resolution_times = []
-        
-        for thread in threads:
-            sla_status = cls.get_thread_sla_status(thread)
-            
-            if sla_status['status'] == 'breached':
-                breached_count += 1
-            elif sla_status['status'] == 'at_risk':
-                at_risk_count += 1
-            
-            # Calculate resolution time if thread has messages
-            last_message = thread.messages.order_by('-created_at').first()
-            if last_message:
-                resolution_time = (last_message.created_at - thread.created_at).total_seconds() / 3600
-                resolution_times.append(resolution_time)
-        
         # Calculate metrics
-        compliance_rate = ((total_threads - breached_count) / total_threads) * 100
-        avg_resolution_time = sum(resolution_times) / len(resolution_times) if resolution_times else 0
+        compliance_rate = ((total_threads - totals['breached_threads']) / total_threads) * 100
+        avg_resolution_time = (
+            totals['resolution_hours'] / totals['resolved_threads'] if totals['resolved_threads'] else 0
+        )
         
         return {
             'total_threads': total_threads,
             'sla_compliance_rate': round(compliance_rate, 2),
-            'breached_threads': breached_count,
-            'at_risk_threads': at_risk_count,
+            'breached_threads': totals['breached_threads'],
+            'at_risk_threads': totals['at_risk_threads'],
             'avg_resolution_time': round(avg_resolution_time, 2),
             'period_days': days,
-            'report_generated_at': timezone.now().isoformat()
+            'report_generated_at': now.isoformat()
         }
     
     @classmethod
     def update_thread_priority(cls, thread, priority):
         """Update thread priority and recalculate SLA"""
-        # This would be extended to support priority-based SLA
-        # For now, we'll just log the change
+        thread.priority = priority or None
+        # Saving the priority reschedules the thread (see chat_svc.signals)
+        thread.save(update_fields=['priority'])
         logger.info(f"Thread {thread.incident_id} priority updated to {priority}")
         
-        # Future implementation could:
-        # 1. Update thread priority field
-        # 2. Recalculate SLA based on new priority
-        # 3. Send notifications if SLA status changes
-        
-        return cls.get_thread_sla_status(thread)
\ No newline at end of file
+        return cls.get_thread_sla_status(thread)
+
+
+class ShardLease:
+    """Redis leases that split the SLA shards between scheduler workers
+
+    Threads fall into ``SLA_SHARDS`` shards by ``id % SLA_SHARDS``. Each live
+    worker holds at most its fair share of shard leases and renews them every
+    tick; leases of a worker that stops expire after ``SLA_LEASE_SECONDS`` and
+    are picked up by the others. Leases only spread the work: the conditional
+    update in ``SLAService._claim`` keeps transitions exactly-once even if two
+    workers briefly hold the same shard.
+    """
+
+    KEY_PREFIX = "sla:lease"
+    WORKERS_KEY = "sla:workers"
+
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, shards=None, lease_seconds=None, owner=None):
+        self.shards = shards or getattr(settings, 'SLA_SHARDS', 16)
+        self.lease_seconds = lease_seconds or getattr(settings, 'SLA_LEASE_SECONDS', 30)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held = set()
+
+    def _key(self, shard):
+        return f"{self.KEY_PREFIX}:{shard}"
+
+    def acquire(self):
+        """Renew held leases and claim free shards up to a fair share; returns the shards held"""
+        r = redis_client.get_client()
+        now = time.time()
+        ttl_ms = int(self.lease_seconds * 1000)
+
+        with r.pipeline(transaction=False) as pipe:
+            pipe.zadd(self.WORKERS_KEY, {self.owner: now})
+            pipe.zremrangebyscore(self.WORKERS_KEY, '-inf', now - self.lease_seconds)
+            pipe.zcard(self.WORKERS_KEY)
+            live = max(1, pipe.execute()[-1])
+        share = -(-self.shards // live)
+
+        owned = set()
+        for shard in sorted(self.held):
+            if len(owned) < share and r.eval(self._RENEW, 1, self._key(shard), self.owner, ttl_ms):
+                owned.add(shard)
+            elif len(owned) >= share:
+                # More workers joined; hand the surplus back
+                r.eval(self._RELEASE, 1, self._key(shard), self.owner)
+
+        free = [shard for shard in range(self.shards) if shard not in owned]
+        random.shuffle(free)
+        for shard in free:
+            if len(owned) >= share:
+                break
+            if r.set(self._key(shard), self.owner, nx=True, px=ttl_ms):
+                owned.add(shard)
+
+        self.held = owned
+        return owned
+
+    def release(self):
+        """Give up every lease so other workers can take the shards at once"""
+        try:
+            r = redis_client.get_client()
+            for shard in self.held:
+                r.eval(self._RELEASE, 1, self._key(shard), self.owner)
+            r.zrem(self.WORKERS_KEY, self.owner)
+        except Exception:
+            logger.warning("Failed to release SLA shard leases for %s", self.owner)
+        self.held = set()
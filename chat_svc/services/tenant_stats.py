@@ -0,0 +1,166 @@
+"""
+Per-tenant statistics snapshots
+Usage, storage and SLA figures for any number of tenants come from a fixed
+set of grouped queries and are stored in TenantStatsSnapshot rows, so list
+views embed them without recounting each tenant's threads and messages
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from chat_svc.models import Attachment, ChatThread, Message, Tenant, TenantStatsSnapshot, User
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_GB = 1024 ** 3
+
+
+class TenantStatsService:
+    """Service for computing and reading tenant statistics snapshots"""
+
+    @staticmethod
+    def max_age():
+        return timedelta(seconds=getattr(settings, 'TENANT_STATS_MAX_AGE_SECONDS', 300))
+
+    @staticmethod
+    def _grouped(queryset, tenant_field, tenant_ids, **aggregates):
+        """``{tenant_id: {name: value}}`` from one GROUP BY tenant query"""
+        if tenant_ids is not None:
+            queryset = queryset.filter(**{f'{tenant_field}__in': tenant_ids})
+        rows = queryset.order_by().values(tenant_field).annotate(**aggregates)
+        return {row.pop(tenant_field): row for row in rows}
+
+    @classmethod
+    def compute(cls, tenant_ids=None, now=None):
+        """Statistics for each tenant (all when ``tenant_ids`` is None), in six queries"""
+        now = now or timezone.now()
+        today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        week_ago = today - timedelta(days=7)
+        month_ago = today - timedelta(days=30)
+
+        tenants = Tenant.objects.all()
+        if tenant_ids is not None:
+            tenants = tenants.filter(id__in=tenant_ids)
+        max_users = dict(tenants.values_list('id', 'max_users'))
+
+        users = cls._grouped(
+            User.objects.filter(is_active=True), 'tenant_id', tenant_ids, total=Count('id'),
+        )
+        threads = cls._grouped(
+            ChatThread.objects.all(), 'tenant_id', tenant_ids,
+            total=Count('id'),
+            today=Count('id', filter=Q(created_at__gte=today)),
+            week=Count('id', filter=Q(created_at__gte=week_ago)),
+            month=Count('id', filter=Q(created_at__gte=month_ago)),
+            # Same ranges as SLAService.filter_by_status
+            breached=Count('id', filter=Q(sla_deadline__lt=now)),
+            at_risk=Count('id', filter=Q(sla_warning_at__lt=now, sla_deadline__gte=now)),
+        )
+        messages = cls._grouped(
+            Message.objects.all(), 'thread__tenant_id', tenant_ids,
+            total=Count('id'),
+            today=Count('id', filter=Q(created_at__gte=today)),
+            week=Count('id', filter=Q(created_at__gte=week_ago)),
+            month=Count('id', filter=Q(created_at__gte=month_ago)),
+            # Tenant members who sent a message today, and threads with one
+            active_users=Count('sender', distinct=True, filter=Q(
+                created_at__gte=today, sender__is_active=True, sender__tenant_id=F('thread__tenant_id'),
+            )),
+            active_threads=Count('thread', distinct=True, filter=Q(created_at__gte=today)),
+        )
+        storage = cls._grouped(
+            Attachment.objects.all(), 'message__thread__tenant_id', tenant_ids, bytes=Sum('size'),
+        )
+
+        # Response time: thread creation to the first message from someone
+        # other than the opener, over the last 30 days' threads
+        thread_messages = Message.objects.filter(thread=OuterRef('pk')).order_by('sequence')
+        responded = ChatThread.objects.filter(created_at__gte=month_ago).annotate(
+            opener_id=Subquery(thread_messages.values('sender_id')[:1]),
+        ).annotate(
+            first_response_at=Subquery(
+                thread_messages.exclude(sender_id=OuterRef('opener_id')).values('created_at')[:1]
+            ),
+        ).filter(first_response_at__isnull=False)
+        responses = cls._grouped(
+            responded, 'tenant_id', tenant_ids,
+            responded=Count('id'),
+            response_time=Sum(ExpressionWrapper(
+                F('first_response_at') - F('created_at'), output_field=DurationField()
+            )),
+        )
+
+        storage_limit = Decimal(str(getattr(settings, 'TENANT_STORAGE_LIMIT_GB', 100))).quantize(Decimal('0.01'))
+        results = {}
+        for tenant_id, tenant_max_users in max_users.items():
+            user_row = users.get(tenant_id, {})
+            thread_row = threads.get(tenant_id, {})
+            message_row = messages.get(tenant_id, {})
+            response_row = responses.get(tenant_id, {})
+            total_users = user_row.get('total', 0)
+            used_bytes = storage.get(tenant_id, {}).get('bytes') or 0
+            response_time = response_row.get('response_time')
+
+            results[tenant_id] = {
+                'total_users': total_users,
+                'active_users': message_row.get('active_users', 0),
+                'total_threads': thread_row.get('total', 0),
+                'active_threads': message_row.get('active_threads', 0),
+                'total_messages': message_row.get('total', 0),
+                'messages_today': message_row.get('today', 0),
+                'messages_this_week': message_row.get('week', 0),
+                'messages_this_month': message_row.get('month', 0),
+                'threads_today': thread_row.get('today', 0),
+                'threads_this_week': thread_row.get('week', 0),
+                'threads_this_month': thread_row.get('month', 0),
+                # Decimals as strings, as DRF renders them
+                'storage_used_gb': str((Decimal(used_bytes) / BYTES_PER_GB).quantize(Decimal('0.01'))),
+                'storage_limit_gb': str(storage_limit),
+                'user_limit_utilization': (total_users / tenant_max_users * 100) if tenant_max_users > 0 else 0,
+                'sla_breached_count': thread_row.get('breached', 0),
+                'sla_at_risk_count': thread_row.get('at_risk', 0),
+                'avg_response_time_hours': round(
+                    response_time.total_seconds() / 3600 / response_row['responded'], 2
+                ) if response_time else 0,
+            }
+        return results
+
+    @classmethod
+    def refresh(cls, tenant_ids=None, now=None):
+        """Recompute and store snapshots; returns ``{tenant_id: stats}`` including ``computed_at``"""
+        now = now or timezone.now()
+        results = cls.compute(tenant_ids, now)
+        for stats in results.values():
+            stats['computed_at'] = now.isoformat()
+        TenantStatsSnapshot.objects.bulk_create(
+            [TenantStatsSnapshot(tenant_id=tenant_id, stats=stats, computed_at=now)
+             for tenant_id, stats in results.items()],
+            update_conflicts=True,
+            unique_fields=['tenant'],
+            update_fields=['stats', 'computed_at'],
+        )
+        return results
+
+    @classmethod
+    def get_many(cls, tenant_ids, max_age=None):
+        """Snapshots for ``tenant_ids``; missing or stale ones are refreshed together"""
+        tenant_ids = list(tenant_ids)
+        if not tenant_ids:
+            return {}
+        now = timezone.now()
+        fresh_after = now - (cls.max_age() if max_age is None else max_age)
+        snapshots = dict(
+            TenantStatsSnapshot.objects.filter(tenant_id__in=tenant_ids, computed_at__gt=fresh_after)
+            .values_list('tenant_id', 'stats')
+        )
+        missing = [tenant_id for tenant_id in tenant_ids if tenant_id not in snapshots]
+        if missing:
+            snapshots.update(cls.refresh(missing, now))
+        return snapshots
+
+    @classmethod
+    def get(cls, tenant, max_age=None):
+        return cls.get_many([tenant.id], max_age).get(tenant.id, {})
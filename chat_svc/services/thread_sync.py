@@ -0,0 +1,124 @@
+"""
+Delta sync for reconnecting chat clients
+Returns only what changed in a thread since a client-held cursor: new messages,
+new read receipts on older messages, template responses and current presence
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from chat_svc.models import Message, MessageChainHead, ReadReceipt, ThreadTemplateResponse
+from chat_svc.tenant_api.serializers import MessageSerializer
+from chat_svc.chat_api.services import PresenceService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadSyncService:
+    """Service for building thread catch-up payloads"""
+
+    # Rows stamped just before a cursor was issued may commit just after it;
+    # re-sending that window is harmless because receipts and responses are idempotent
+    CLOCK_SKEW = timedelta(seconds=5)
+    DEFAULT_LIMIT = 200
+    MAX_LIMIT = 500
+
+    @staticmethod
+    def encode_cursor(sequence, moment):
+        """Opaque-ish cursor: ``<last sequence>:<epoch milliseconds>``"""
+        return f"{int(sequence)}:{int(moment.timestamp() * 1000)}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Parse a cursor into (sequence, datetime); raises ValueError when malformed"""
+        try:
+            sequence, millis = str(cursor).split(':', 1)
+            sequence, millis = int(sequence), int(millis)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid sync cursor: {cursor!r}")
+        if sequence < 0 or millis < 0:
+            raise ValueError(f"Invalid sync cursor: {cursor!r}")
+        return sequence, datetime.fromtimestamp(millis / 1000, tz=dt_timezone.utc)
+
+    @classmethod
+    def cursor_for(cls, thread_id, moment=None):
+        """Cursor pointing at the current tip of a thread, read from its chain head"""
+        last = (
+            MessageChainHead.objects.filter(thread_id=thread_id)
+            .values_list('last_sequence', flat=True)
+            .first()
+        ) or 0
+        return cls.encode_cursor(last, moment or timezone.now())
+
+    @classmethod
+    def sync(cls, thread, cursor, limit=None, include_presence=True, request=None):
+        """Build the delta for ``thread`` since ``cursor``.
+
+        ``has_more`` is set when more than ``limit`` messages arrived; the
+        client calls again with the returned cursor until it is false.
+        """
+        since_sequence, since_time = cls.decode_cursor(cursor)
+        limit = min(limit or cls.DEFAULT_LIMIT, cls.MAX_LIMIT)
+        # Taken before any reads so nothing written meanwhile falls behind the new cursor
+        now = timezone.now()
+        window_start = since_time - cls.CLOCK_SKEW
+
+        messages = list(
+            Message.objects.filter(thread=thread, sequence__gt=since_sequence)
+            .select_related('sender')
+            .prefetch_related('receipts__user', 'structured__template', 'attachments')
+            .order_by('sequence')[:limit + 1]
+        )
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        last_sequence = messages[-1].sequence if messages else since_sequence
+
+        # Receipts on new messages ride along inside the message payloads
+        receipts = (
+            ReadReceipt.objects.filter(
+                message__thread=thread,
+                message__sequence__lte=since_sequence,
+                timestamp__gte=window_start,
+            )
+            .select_related('user')
+            .order_by('timestamp')
+        )
+        responses = (
+            ThreadTemplateResponse.objects.filter(thread=thread, updated_at__gte=window_start)
+            .select_related('user')
+            .order_by('updated_at')
+        )
+
+        payload = {
+            'thread_id': thread.id,
+            'messages': MessageSerializer(messages, many=True, context={'request': request}).data,
+            'read_receipts': [
+                {
+                    'message_id': receipt.message_id,
+                    'user': receipt.user.username,
+                    'timestamp': receipt.timestamp.isoformat(),
+                }
+                for receipt in receipts
+            ],
+            'template_responses': [
+                {
+                    'user': response.user.username,
+                    'response_data': response.response_data,
+                    'created_at': response.created_at.isoformat(),
+                    'updated_at': response.updated_at.isoformat(),
+                }
+                for response in responses
+            ],
+            'has_more': has_more,
+            # While paging through a backlog keep the old time so receipts are not skipped
+            'cursor': cls.encode_cursor(last_sequence, since_time if has_more else now),
+        }
+
+        if include_presence:
+            try:
+                payload['online'] = PresenceService().get_online_users_sync(thread.id)
+            except Exception:
+                logger.exception(f"Presence lookup failed during sync of thread {thread.id}")
+                payload['online'] = None
+
+        return payload
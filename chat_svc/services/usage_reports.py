@@ -0,0 +1,105 @@
+"""
+Tenant usage reporting
+Daily thread, message and active-user series for any date range, bucketed
+by calendar day in the tenant's own timezone. Each series comes from one
+grouped, date-truncated query, so the cost does not grow with the number
+of threads or days in the range
+"""
+
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from chat_svc.models import ChatThread, Message
+
+logger = logging.getLogger(__name__)
+
+
+class UsageReportService:
+    """Service for building tenant usage reports"""
+
+    # Longest range a single report may cover
+    MAX_DAYS = 1096
+
+    @staticmethod
+    def tenant_timezone(tenant):
+        try:
+            return ZoneInfo(tenant.timezone or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Unknown timezone %r for tenant %s; reporting in UTC", tenant.timezone, tenant.id)
+            return ZoneInfo("UTC")
+
+    @classmethod
+    def resolve_range(cls, tz, start=None, end=None, days=30):
+        """Inclusive (start, end) dates; the defaults end today in ``tz``"""
+        end = end or timezone.now().astimezone(tz).date()
+        start = start or end - timedelta(days=days)
+        if start > end:
+            raise ValueError("start must not be after end")
+        if (end - start).days + 1 > cls.MAX_DAYS:
+            raise ValueError(f"range must not exceed {cls.MAX_DAYS} days")
+        return start, end
+
+    @classmethod
+    def build(cls, tenant, start, end, tz=None):
+        """Usage summary and daily breakdown for ``start``..``end`` inclusive"""
+        tz = tz or cls.tenant_timezone(tenant)
+        window_start = datetime.combine(start, datetime.min.time()).replace(tzinfo=tz)
+        window_end = datetime.combine(end + timedelta(days=1), datetime.min.time()).replace(tzinfo=tz)
+        day = TruncDate("created_at", tzinfo=tz)
+
+        threads_by_day = dict(
+            ChatThread.objects.filter(
+                tenant=tenant, created_at__gte=window_start, created_at__lt=window_end
+            ).annotate(day=day).order_by().values_list("day").annotate(n=Count("id"))
+        )
+
+        messages = Message.objects.filter(
+            thread__tenant=tenant, created_at__gte=window_start, created_at__lt=window_end
+        )
+        # Active users are the tenant's own active members who sent a message
+        active = Q(sender__tenant=tenant, sender__is_active=True)
+        messages_by_day = {
+            row_day: (sent, users)
+            for row_day, sent, users in messages.annotate(day=day).order_by().values_list("day").annotate(
+                sent=Count("id"), users=Count("sender", distinct=True, filter=active)
+            )
+        }
+        unique_active_users = messages.aggregate(n=Count("sender", distinct=True, filter=active))["n"]
+
+        daily_stats = []
+        current = start
+        while current <= end:
+            sent, users = messages_by_day.get(current, (0, 0))
+            daily_stats.append({
+                "date": current.isoformat(),
+                "threads_created": threads_by_day.get(current, 0),
+                "messages_sent": sent,
+                "active_users": users,
+            })
+            current += timedelta(days=1)
+
+        days = len(daily_stats)
+        total_threads = sum(row["threads_created"] for row in daily_stats)
+        total_messages = sum(row["messages_sent"] for row in daily_stats)
+        return {
+            "period": {
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat(),
+                "days": days,
+                "timezone": str(tz),
+            },
+            "totals": {
+                "threads_created": total_threads,
+                "messages_sent": total_messages,
+                "unique_active_users": unique_active_users,
+            },
+            "averages": {
+                "threads_per_day": total_threads / days if days > 0 else 0,
+                "messages_per_day": total_messages / days if days > 0 else 0,
+                "messages_per_thread": total_messages / total_threads if total_threads > 0 else 0,
+            },
+            "daily_breakdown": daily_stats,
+        }
@@ -144,15 +144,97 @@ CORS_ALLOW_CREDENTIALS = True
 ITSM_API_URL = os.environ.get('ITSM_API_URL')
 ITSM_API_TOKEN = os.environ.get('ITSM_API_TOKEN')
 INCIDENT_SLA_HOURS = int(os.environ.get('INCIDENT_SLA_HOURS', '24'))
+# SLA scheduler (`manage.py run_sla_scheduler`): threads are split into
+# SLA_SHARDS shards leased to workers through Redis; each tick handles up to
+# SLA_BATCH_SIZE due threads per worker
+SLA_SHARDS = int(os.environ.get('SLA_SHARDS', '16'))
+SLA_LEASE_SECONDS = int(os.environ.get('SLA_LEASE_SECONDS', '30'))
+SLA_BATCH_SIZE = int(os.environ.get('SLA_BATCH_SIZE', '500'))
+
+# ITSM client: per-tenant TenantIntegration settings take precedence over the
+# ITSM_API_* fallback; calls run on a background pool behind a circuit breaker
+ITSM_TIMEOUT_SECONDS = int(os.environ.get('ITSM_TIMEOUT_SECONDS', '5'))
+ITSM_RETRY_ATTEMPTS = int(os.environ.get('ITSM_RETRY_ATTEMPTS', '2'))
+ITSM_WORKERS = int(os.environ.get('ITSM_WORKERS', '4'))
+ITSM_QUEUE_SIZE = int(os.environ.get('ITSM_QUEUE_SIZE', '1000'))
+ITSM_POOL_SIZE = int(os.environ.get('ITSM_POOL_SIZE', '4'))
+ITSM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('ITSM_CIRCUIT_FAILURE_THRESHOLD', '5'))
+ITSM_CIRCUIT_RESET_SECONDS = int(os.environ.get('ITSM_CIRCUIT_RESET_SECONDS', '30'))
+ITSM_CONFIG_TTL_SECONDS = int(os.environ.get('ITSM_CONFIG_TTL_SECONDS', '60'))
+# Timeline updates for one incident are batched into a single ITSM entry for up
+# to this many seconds or entries (0 seconds sends every message on its own)
+ITSM_COALESCE_WINDOW_SECONDS = float(os.environ.get('ITSM_COALESCE_WINDOW_SECONDS', '10'))
+ITSM_COALESCE_MAX_ENTRIES = int(os.environ.get('ITSM_COALESCE_MAX_ENTRIES', '20'))
+
+# Message hash-chain verification
+CHAIN_CHECKPOINT_INTERVAL = int(os.environ.get('CHAIN_CHECKPOINT_INTERVAL', '1000'))
+CHAIN_CHECKPOINT_KEY = os.environ.get('CHAIN_CHECKPOINT_KEY')  # falls back to SECRET_KEY
 
 # Kafka configuration
 KAFKA_BOOTSTRAP_SERVERS = os.environ.get('KAFKA_BOOTSTRAP_SERVERS', '')
 
+# Event bus transport: kafka, memory, file or a dotted path. Events are
+# batched by the outbox relay (OUTBOX_BATCH_SIZE below).
+EVENT_BUS_TRANSPORT = os.environ.get('EVENT_BUS_TRANSPORT', 'kafka')
+EVENT_BUS_LINGER_MS = int(os.environ.get('EVENT_BUS_LINGER_MS', '50'))
+EVENT_BUS_FILE_PATH = os.environ.get('EVENT_BUS_FILE_PATH', str(BASE_DIR / 'logs' / 'events.jsonl'))
+
+# Transactional outbox: events are stored with the rows they describe and
+# published by `manage.py relay_outbox` in batches of this size
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '500'))
+
 # Redis configuration
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', '50'))
+
+# Presence tracking (per-connection TTL, refreshed by heartbeats)
+PRESENCE_TTL_SECONDS = int(os.environ.get('PRESENCE_TTL_SECONDS', '60'))
+PRESENCE_HEARTBEAT_SECONDS = int(os.environ.get('PRESENCE_HEARTBEAT_SECONDS', '20'))
+
+# WebSocket write-behind pipeline: confirm once the message row, structured
+# reply and outbox event are durable and run audit log and push work in a
+# bounded async stage, drained on disconnect and on shutdown
+CHAT_WRITE_BEHIND_ENABLED = os.environ.get('CHAT_WRITE_BEHIND_ENABLED', 'False').lower() == 'true'
+CHAT_WRITE_BEHIND_QUEUE_SIZE = int(os.environ.get('CHAT_WRITE_BEHIND_QUEUE_SIZE', '1000'))
+CHAT_WRITE_BEHIND_WORKERS = int(os.environ.get('CHAT_WRITE_BEHIND_WORKERS', '4'))
+CHAT_WRITE_BEHIND_DRAIN_SECONDS = int(os.environ.get('CHAT_WRITE_BEHIND_DRAIN_SECONDS', '10'))
+# Newest messages embedded in thread list/detail responses; older ones are
+# paged through the messages endpoint
+THREAD_EMBEDDED_MESSAGES = int(os.environ.get('THREAD_EMBEDDED_MESSAGES', '50'))
+
+# Read events from one connection are coalesced for this long before one bulk write
+READ_RECEIPT_COALESCE_MS = int(os.environ.get('READ_RECEIPT_COALESCE_MS', '250'))
 
 # Push notifications
 FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY')
+FCM_URL = os.environ.get('FCM_URL', 'https://fcm.googleapis.com/fcm/send')
+FCM_MAX_TOKENS_PER_REQUEST = int(os.environ.get('FCM_MAX_TOKENS_PER_REQUEST', '1000'))
+# Notifications are sent by PUSH_WORKERS background workers, each posting up
+# to PUSH_CONCURRENCY token chunks in parallel over a shared pooled session
+PUSH_WORKERS = int(os.environ.get('PUSH_WORKERS', '2'))
+PUSH_CONCURRENCY = int(os.environ.get('PUSH_CONCURRENCY', '8'))
+PUSH_QUEUE_SIZE = int(os.environ.get('PUSH_QUEUE_SIZE', '1000'))
+PUSH_TIMEOUT_SECONDS = int(os.environ.get('PUSH_TIMEOUT_SECONDS', '5'))
+# Subscribers online in a thread get no push; offline ones get the first message
+# straight away and then one digest per window (0 disables digests)
+PUSH_SUPPRESS_ONLINE = os.environ.get('PUSH_SUPPRESS_ONLINE', 'True').lower() == 'true'
+PUSH_DIGEST_WINDOW_SECONDS = int(os.environ.get('PUSH_DIGEST_WINDOW_SECONDS', '60'))
+PUSH_DIGEST_POLL_SECONDS = int(os.environ.get('PUSH_DIGEST_POLL_SECONDS', '5'))
+# In-process device token cache; invalidated through Redis on Device/User
+# changes, the TTL only bounds staleness when Redis is unreachable
+DEVICE_DIRECTORY_TTL_SECONDS = int(os.environ.get('DEVICE_DIRECTORY_TTL_SECONDS', '300'))
+
+# Admin analytics responses are cached in the default cache: fresh for the TTL,
+# then served stale for up to ADMIN_CACHE_STALE_SECONDS while one worker
+# recomputes; tenant, user and thread writes mark them stale at once
+ADMIN_CACHE_ENABLED = os.environ.get('ADMIN_CACHE_ENABLED', 'True').lower() == 'true'
+ADMIN_CACHE_TTL_SECONDS = int(os.environ.get('ADMIN_CACHE_TTL_SECONDS', '30'))
+ADMIN_CACHE_STALE_SECONDS = int(os.environ.get('ADMIN_CACHE_STALE_SECONDS', '300'))
+ADMIN_CACHE_WAIT_SECONDS = int(os.environ.get('ADMIN_CACHE_WAIT_SECONDS', '10'))
+# Tenant stats snapshots older than this are recomputed on read, in one
+# batch for every stale tenant in the response
+TENANT_STATS_MAX_AGE_SECONDS = int(os.environ.get('TENANT_STATS_MAX_AGE_SECONDS', '300'))
+TENANT_STORAGE_LIMIT_GB = int(os.environ.get('TENANT_STORAGE_LIMIT_GB', '100'))
 
 # Channels configuration
 CHANNEL_LAYERS = {
@@ -0,0 +1,178 @@
+"""
+Signal handlers for the core models
+Keeps the device token directory in step with Device and User changes,
+thread SLA deadlines in step with priorities and tenant SLA settings, the
+hourly/daily activity counters in step with message, thread and user writes,
+and marks cached admin responses stale when tenant data changes
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from chat_svc.models import (
+    ChatThread, Device, Message, Tenant, TenantBilling, TenantConfiguration,
+    TenantIntegration, TenantTheme, User,
+)
+from chat_svc.services import response_cache
+from chat_svc.services.activity_counters import ActivityCounters
+from chat_svc.services.device_directory import DeviceTokenDirectory
+from chat_svc.services.sla_service import SLAService
+
+# User fields the device directory and cached admin responses depend on
+DIRECTORY_FIELDS = {"tenant", "tenant_id", "is_active", "is_staff"}
+USER_DIRECTORY_FIELDS = ("tenant_id", "is_active", "is_staff")
+
+# ChatThread fields its own SLA deadlines are derived from
+SLA_THREAD_FIELDS = ("priority", "tenant_id", "created_at")
+
+# TenantConfiguration fields thread SLA deadlines are derived from
+SLA_CONFIG_FIELDS = (
+    "default_sla_hours", "high_priority_sla_hours", "medium_priority_sla_hours",
+    "low_priority_sla_hours", "enable_auto_escalation", "escalation_warning_hours",
+)
+
+
+def _invalidate_on_commit(*tenant_ids):
+    for tenant_id in {t for t in tenant_ids if t is not None}:
+        transaction.on_commit(lambda t=tenant_id: DeviceTokenDirectory.invalidate(t))
+
+
+@receiver([post_save, post_delete], sender=Device)
+def device_changed(sender, instance, **kwargs):
+    tenant_id = User.objects.filter(id=instance.user_id).values_list("tenant_id", flat=True).first()
+    _invalidate_on_commit(tenant_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_directory_fields(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and (update_fields is None or DIRECTORY_FIELDS & set(update_fields)):
+        instance._previous_directory_fields = (
+            User.objects.filter(pk=instance.pk).values_list(*USER_DIRECTORY_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login; nothing cached depends on it
+    if update_fields is not None and not DIRECTORY_FIELDS & set(update_fields):
+        return
+    # Nor on full saves that leave these fields alone, such as profile edits
+    previous = getattr(instance, "_previous_directory_fields", None)
+    if not created and previous == tuple(getattr(instance, field) for field in USER_DIRECTORY_FIELDS):
+        return
+    tenant_ids = (instance.tenant_id, previous[0] if previous else None)
+    _invalidate_on_commit(*tenant_ids)
+    if not raw:
+        transaction.on_commit(lambda: response_cache.invalidate(*tenant_ids))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.tenant_id)
+
+
+@receiver(pre_save, sender=ChatThread)
+def remember_thread_sla_inputs(sender, instance, raw=False, update_fields=None, **kwargs):
+    if instance.pk and not raw and update_fields is None:
+        instance._previous_sla_inputs = (
+            ChatThread.objects.filter(pk=instance.pk).values_list(*SLA_THREAD_FIELDS).first()
+        )
+
+
+def _sla_inputs_changed(instance, update_fields):
+    if update_fields is not None:
+        return bool({"priority", "tenant", "tenant_id"} & set(update_fields))
+    current = tuple(getattr(instance, field) for field in SLA_THREAD_FIELDS)
+    return getattr(instance, "_previous_sla_inputs", None) != current
+
+
+@receiver(post_save, sender=ChatThread)
+def thread_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        ActivityCounters.record(instance.tenant_id, instance.created_at, threads=1)
+    if created or _sla_inputs_changed(instance, update_fields):
+        SLAService.schedule(instance)
+        if not created:
+            # The deadline may have moved under a settled daily rollup, or the
+            # thread moved out of its previous tenant's or day's rollup
+            rollup_days = {(instance.tenant_id, timezone.localtime(instance.created_at).date())}
+            previous = getattr(instance, "_previous_sla_inputs", None)
+            if previous:
+                rollup_days.add((previous[1], timezone.localtime(previous[2]).date()))
+            for tenant_id, day in rollup_days:
+                SLAService.invalidate_rollups(tenant_id, day)
+
+
+@receiver(post_delete, sender=ChatThread)
+def thread_deleted(sender, instance, **kwargs):
+    SLAService.invalidate_rollups(instance.tenant_id, timezone.localtime(instance.created_at).date())
+
+
+@receiver(pre_save, sender=TenantConfiguration)
+def remember_sla_settings(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_sla_settings = (
+            TenantConfiguration.objects.filter(pk=instance.pk).values_list(*SLA_CONFIG_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=TenantConfiguration)
+def sla_settings_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = tuple(getattr(instance, field) for field in SLA_CONFIG_FIELDS)
+    if created or getattr(instance, "_previous_sla_settings", None) != current:
+        transaction.on_commit(lambda: SLAService.recalculate_tenant(instance.tenant_id))
+
+
+# Deletions are counted from pre_delete on threads and users rather than from
+# per-message receivers, which would stop Django fast-deleting cascaded messages.
+# Counters go away with their tenant, so tenant cascades are skipped.
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ActivityCounters.record(instance.thread.tenant_id, instance.created_at, messages=1)
+        # A later message moves the thread's resolution time
+        SLAService.invalidate_thread_rollup(instance.thread)
+
+
+@receiver(pre_delete, sender=ChatThread)
+def thread_deleting(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Tenant):
+        return
+    ActivityCounters.remove_messages(instance.messages.all())
+    ActivityCounters.add(instance.tenant_id, instance.created_at, threads=-1)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ActivityCounters.record(instance.tenant_id, instance.date_joined, users=1)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Tenant):
+        return
+    ActivityCounters.remove_messages(Message.objects.filter(sender=instance))
+    ActivityCounters.add(instance.tenant_id, instance.date_joined, users=-1)
+
+
+# Messages are left out: they arrive constantly and the cache TTL already
+# bounds how stale message volumes get
+def admin_data_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    tenant_id = instance.pk if sender is Tenant else instance.tenant_id
+    transaction.on_commit(lambda: response_cache.invalidate(tenant_id))
+
+
+# Users are handled in user_changed, so logins do not wipe the cache
+for _model in (Tenant, TenantConfiguration, TenantBilling, TenantTheme, TenantIntegration, ChatThread):
+    post_save.connect(admin_data_changed, sender=_model, dispatch_uid=f"admin_cache_{_model.__name__}_save")
+    post_delete.connect(admin_data_changed, sender=_model, dispatch_uid=f"admin_cache_{_model.__name__}_delete")
+post_delete.connect(admin_data_changed, sender=User, dispatch_uid="admin_cache_User_delete")
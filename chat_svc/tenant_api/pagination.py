@@ -0,0 +1,93 @@
+"""
+Keyset pagination for thread messages
+Pages are addressed by message sequence number, so fetching any page of a long
+thread is an index range scan on (thread, sequence) rather than an OFFSET
+"""
+
+from urllib.parse import urlencode
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class MessageCursorPagination(BasePagination):
+    """Sequence-keyed cursors for a single thread's messages.
+
+    - no cursor: the newest ``page_size`` messages
+    - ``?before=<sequence>``: the page immediately older than that message
+    - ``?after=<sequence>``: the page immediately newer than that message
+
+    Results are always returned oldest first.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    before_query_param = 'before'
+    after_query_param = 'after'
+
+    def _int_param(self, request, name):
+        value = request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise NotFound(f"Invalid {name} cursor")
+        if value < 0:
+            raise NotFound(f"Invalid {name} cursor")
+        return value
+
+    def get_page_size(self, request):
+        size = self._int_param(request, self.page_size_query_param)
+        if not size:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        before = self._int_param(request, self.before_query_param)
+        after = self._int_param(request, self.after_query_param)
+
+        if after is not None:
+            rows = list(queryset.filter(sequence__gt=after).order_by('sequence')[:size + 1])
+            self.has_newer = len(rows) > size
+            rows = rows[:size]
+            self.has_older = after > 0 and queryset.filter(sequence__lte=after).exists()
+        else:
+            if before is not None:
+                queryset_page = queryset.filter(sequence__lt=before)
+            else:
+                queryset_page = queryset
+            rows = list(queryset_page.order_by('-sequence')[:size + 1])
+            self.has_older = len(rows) > size
+            rows = rows[:size][::-1]
+            self.has_newer = before is not None and queryset.filter(sequence__gte=before).exists()
+
+        self.first_sequence = rows[0].sequence if rows else None
+        self.last_sequence = rows[-1].sequence if rows else after
+        return rows
+
+    def _link(self, name, sequence):
+        params = {name: sequence}
+        size = self.request.query_params.get(self.page_size_query_param)
+        if size:
+            params[self.page_size_query_param] = size
+        return f"{self.request.build_absolute_uri(self.request.path)}?{urlencode(params)}"
+
+    def get_paginated_response(self, data):
+        older = newer = None
+        if self.has_older and self.first_sequence is not None:
+            older = self._link(self.before_query_param, self.first_sequence)
+        if self.last_sequence is not None:
+            # Always hand out a forward cursor so clients can poll for new messages
+            newer = self._link(self.after_query_param, self.last_sequence)
+        return Response({
+            'results': data,
+            'has_older': self.has_older,
+            'has_newer': self.has_newer,
+            'before_cursor': self.first_sequence,
+            'after_cursor': self.last_sequence,
+            'previous': older,
+            'next': newer,
+        })
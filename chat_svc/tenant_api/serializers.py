@@ -1,4 +1,8 @@
 from rest_framework import serializers
+from django.db.models import Count, IntegerField, Max, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.utils import timezone
 import json
 import re
 import string
@@ -11,10 +15,34 @@ from chat_svc.models import (
     Device,
     User,
     ReadReceipt,
+    ThreadReadState,
     ThreadTemplateResponse,
 )
 
 
+def read_watermark_annotation(user):
+    """The user's read watermark for each thread of a queryset (0 when unread)"""
+    watermark = ThreadReadState.objects.filter(
+        user=user, thread=OuterRef('pk')
+    ).values('last_read_sequence')[:1]
+    return Coalesce(Subquery(watermark), Value(0))
+
+
+def unread_count_annotation(user):
+    """Messages from others past ``read_watermark`` without a receipt from the user"""
+    unread = (
+        Message.objects.filter(
+            thread=OuterRef('pk'), sequence__gt=OuterRef('read_watermark')
+        )
+        .exclude(sender=user)
+        .exclude(receipts__user=user)
+        .values('thread')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+
+
 class MessageSerializer(serializers.ModelSerializer):
     structured = serializers.SerializerMethodField()
     attachments = serializers.SerializerMethodField()
@@ -107,7 +135,8 @@ class MessageSerializer(serializers.ModelSerializer):
 
     def get_read_receipts(self, obj):
         """Get detailed read receipt information"""
-        receipts = obj.receipts.select_related('user').all()
+        # .all() keeps a 'receipts__user' prefetch in play
+        receipts = obj.receipts.all()
         return [
             {
                 'user': receipt.user.username,
@@ -118,7 +147,7 @@ class MessageSerializer(serializers.ModelSerializer):
 
     def get_read_by(self, obj):
         """Get list of usernames who have read this message"""
-        return list(obj.receipts.values_list('user__username', flat=True))
+        return [receipt.user.username for receipt in obj.receipts.all()]
 
     def get_read_count(self, obj):
         """Get count of users who have read this message"""
@@ -127,11 +156,11 @@ class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = [
-            'id', 'thread', 'sender', 'content', 'created_at',
+            'id', 'thread', 'sequence', 'sender', 'content', 'created_at',
             'structured', 'attachments', 'template', 'answer', 'files',
             'read_receipts', 'read_by', 'read_count'
         ]
-        read_only_fields = ['created_at']
+        read_only_fields = ['created_at', 'sequence']
 
 
 class StructuredReplySerializer(serializers.ModelSerializer):
@@ -201,6 +230,7 @@ class ChatThreadSerializer(serializers.ModelSerializer):
     unread_count = serializers.SerializerMethodField()
     total_messages = serializers.SerializerMethodField()
     last_read_at = serializers.SerializerMethodField()
+    sync_cursor = serializers.SerializerMethodField()
 
     # Show dropdown in DRF UI and allow None
     template_id = serializers.PrimaryKeyRelatedField(
@@ -219,12 +249,12 @@ class ChatThreadSerializer(serializers.ModelSerializer):
         model = ChatThread
         fields = [
             'id', 'tenant', 'incident_id', 'created_at',
-            'messages', 'sla_status',
+            'messages', 'sla_status', 'priority', 'sla_deadline',
             'template', 'template_id',
             'template_responses',
-            'unread_count', 'total_messages', 'last_read_at'
+            'unread_count', 'total_messages', 'last_read_at', 'sync_cursor'
         ]
-        read_only_fields = ['tenant', 'created_at']
+        read_only_fields = ['tenant', 'created_at', 'sla_deadline']
 
     def validate(self, attrs):
         request = self.context.get("request")
@@ -253,10 +283,20 @@ class ChatThreadSerializer(serializers.ModelSerializer):
         return None
 
 
+    @staticmethod
+    def embedded_message_limit():
+        return getattr(settings, 'THREAD_EMBEDDED_MESSAGES', 50)
+
+    def _recent_messages(self, obj):
+        """Newest messages, oldest first, from the viewset's prefetch when present"""
+        messages = getattr(obj, 'recent_messages', None)
+        if messages is None:
+            messages = obj.recent_messages = list(obj.messages.order_by('-sequence')[:self.embedded_message_limit()])
+        return messages[::-1]
+
     def get_messages(self, obj):
-        """Get messages ordered chronologically by created_at"""
-        messages = obj.messages.order_by('created_at')
-        return MessageSerializer(messages, many=True, context=self.context).data
+        """The newest messages in thread order; page older ones with messages/?before="""
+        return MessageSerializer(self._recent_messages(obj), many=True, context=self.context).data
 
     def get_template_responses(self, obj):
         return [
@@ -268,22 +308,65 @@ class ChatThreadSerializer(serializers.ModelSerializer):
             for r in obj.template_responses.all()
         ]
 
+    @staticmethod
+    def annotate_queryset(queryset, user):
+        """Add the read-state prefetch and unread annotations the list/detail views use"""
+        latest_receipt = ReadReceipt.objects.filter(
+            user=user, message__thread=OuterRef('pk'), message__sequence__gt=OuterRef('read_watermark')
+        ).order_by('-timestamp').values('timestamp')[:1]
+        return queryset.annotate(
+            read_watermark=read_watermark_annotation(user),
+            unread_count=unread_count_annotation(user),
+            # Receipts past the watermark come from out-of-order reads
+            latest_receipt_at=Subquery(latest_receipt),
+        ).prefetch_related(
+            Prefetch('read_states', queryset=ThreadReadState.objects.filter(user=user), to_attr='user_read_states')
+        )
+
+    def _read_state(self, obj):
+        """Current user's read watermark for this thread, looked up once per thread"""
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return None
+        prefetched = getattr(obj, 'user_read_states', None)
+        if prefetched is not None:
+            return prefetched[0] if prefetched else None
+        cache = self.context.setdefault('_read_states', {})
+        if obj.pk not in cache:
+            cache[obj.pk] = ThreadReadState.objects.filter(
+                user=request.user, thread=obj
+            ).first()
+        return cache[obj.pk]
+
     def get_unread_count(self, obj):
         """Get count of unread messages for the current user"""
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return 0
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
         
-        # Count messages not read by current user
-        from django.db.models import Q
-        unread_messages = obj.messages.exclude(
-            Q(receipts__user=request.user) | Q(sender=request.user)
-        ).count()
-        return unread_messages
+        # Only messages past the read watermark can be unread; receipts
+        # are checked for that tail alone to catch out-of-order reads
+        state = self._read_state(obj)
+        watermark = state.last_read_sequence if state else 0
+        return (
+            obj.messages.filter(sequence__gt=watermark)
+            .exclude(sender=request.user)
+            .exclude(receipts__user=request.user)
+            .count()
+        )
+
+    def get_sync_cursor(self, obj):
+        """Cursor for the thread sync endpoint / WebSocket ?since= after this snapshot"""
+        from chat_svc.services.thread_sync import ThreadSyncService
+        messages = self._recent_messages(obj)
+        return ThreadSyncService.encode_cursor(messages[-1].sequence if messages else 0, timezone.now())
 
     def get_total_messages(self, obj):
         """Get total message count in thread"""
-        return obj.messages.count()
+        count = getattr(obj, 'message_count', None)
+        return count if count is not None else obj.messages.count()
 
     def get_last_read_at(self, obj):
         """Get timestamp of last message read by current user"""
@@ -291,16 +374,85 @@ class ChatThreadSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return None
         
-        last_receipt = obj.messages.filter(
-            receipts__user=request.user
-        ).order_by('-receipts__timestamp').first()
+        state = self._read_state(obj)
+        if hasattr(obj, 'latest_receipt_at'):
+            latest_receipt = obj.latest_receipt_at
+        else:
+            watermark = state.last_read_sequence if state else 0
+            # Receipts past the watermark come from out-of-order reads
+            latest_receipt = ReadReceipt.objects.filter(
+                user=request.user, message__thread=obj, message__sequence__gt=watermark
+            ).aggregate(latest=Max('timestamp'))['latest']
         
-        if last_receipt:
-            receipt = last_receipt.receipts.filter(user=request.user).first()
-            return receipt.timestamp if receipt else None
-        return None
+        candidates = [t for t in (latest_receipt, state and state.last_read_at) if t]
+        return max(candidates) if candidates else None
+
+
+
+
+class ChatThreadSummarySerializer(serializers.ModelSerializer):
+    """Inbox representation of a thread: counts and a last-message preview, no history.
 
+    Expects the queryset from ``annotate_queryset`` so every field comes from
+    annotations or the sliced ``latest_messages`` prefetch.
+    """
+    PREVIEW_LENGTH = 120
 
+    sla_status = serializers.CharField(read_only=True)
+    template = serializers.SerializerMethodField()
+    total_messages = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    last_activity_at = serializers.DateTimeField(read_only=True)
+    last_message = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatThread
+        fields = [
+            'id', 'tenant', 'incident_id', 'created_at', 'sla_status',
+            'priority', 'sla_deadline',
+            'template', 'total_messages', 'unread_count',
+            'last_activity_at', 'last_message'
+        ]
+        read_only_fields = fields
+
+    @staticmethod
+    def annotate_queryset(queryset, user):
+        """Add summary annotations and the last-message prefetch to a thread queryset"""
+        thread_messages = Message.objects.filter(thread=OuterRef('pk'))
+        total = thread_messages.values('thread').annotate(count=Count('id')).values('count')
+        last_created = thread_messages.order_by('-sequence').values('created_at')[:1]
+
+        return queryset.select_related('template').annotate(
+            read_watermark=read_watermark_annotation(user),
+            total_messages=Coalesce(Subquery(total, output_field=IntegerField()), Value(0)),
+            unread_count=unread_count_annotation(user),
+            last_activity_at=Coalesce(Subquery(last_created), 'created_at'),
+        ).prefetch_related(
+            Prefetch(
+                'messages',
+                queryset=Message.objects.select_related('sender').order_by('-sequence')[:1],
+                to_attr='latest_messages',
+            )
+        )
+
+    def get_template(self, obj):
+        if obj.template:
+            return {"id": obj.template.id, "name": obj.template.name}
+        return None
+
+    def get_last_message(self, obj):
+        latest = getattr(obj, 'latest_messages', None)
+        if not latest:
+            return None
+        message = latest[0]
+        content = message.content or ''
+        return {
+            "id": message.id,
+            "sender": message.sender.username,
+            "preview": content[:self.PREVIEW_LENGTH],
+            "truncated": len(content) > self.PREVIEW_LENGTH,
+            "created_at": message.created_at,
+        }
 
 
 class DeviceSerializer(serializers.ModelSerializer):
@@ -1,5 +1,3 @@
-from datetime import timedelta
-from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework.generics import GenericAPIView, CreateAPIView
@@ -10,24 +8,35 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from pprint import pprint
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch, Q
 from rest_framework.exceptions import PermissionDenied
 import csv
 import io
-from django.http import HttpResponse, JsonResponse
+import json
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from rest_framework.utils.encoders import JSONEncoder
 from chat_svc.models import (
     Tenant, ChatThread, Message, QuestionTemplate,
     StructuredReply, Attachment, Device, ThreadTemplateResponse,
-    MessageLog, User, ReadReceipt
+    MessageLog, User, ReadReceipt, ThreadReadState, ThreadSubscription
 )
 
 from .serializers import (
-    ChatThreadSerializer, MessageSerializer, QuestionTemplateSerializer,
+    ChatThreadSerializer, ChatThreadSummarySerializer, MessageSerializer, QuestionTemplateSerializer,
     AttachmentSerializer, DeviceSerializer, UserSerializer, ReadReceiptSerializer
 )
 
+from .pagination import MessageCursorPagination
 from .permissions import IsTenantMember, IsTenantOwner, IsActiveTenantMember
-from integrations import event_bus, push, itsm
+from chat_svc.services.activity_counters import ActivityCounters
+from chat_svc.services.device_directory import DeviceTokenDirectory
+from chat_svc.services.notifications import NotificationService
+from chat_svc.services.outbox import OutboxService
+from chat_svc.services.sla_service import SLAService
+from chat_svc.services.thread_sync import ThreadSyncService
+from integrations import push, itsm
 
 
 class LoginSerializer(serializers.Serializer):
@@ -91,36 +100,56 @@ class ChatThreadViewSet(viewsets.ModelViewSet):
     serializer_class = ChatThreadSerializer
     permission_classes = [IsActiveTenantMember, IsTenantMember]
 
+    def _summary_view(self):
+        """``?view=summary`` on the list endpoint returns inbox rows without message history"""
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_serializer_class(self):
+        if self._summary_view():
+            return ChatThreadSummarySerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
-        return self.queryset.filter(
+        if self._summary_view():
+            return ChatThreadSummarySerializer.annotate_queryset(
+                self.queryset.filter(tenant_id=self.request.user.tenant_id),
+                self.request.user,
+            ).order_by('-created_at')
+
+        queryset = self.queryset.filter(
             tenant_id=self.request.user.tenant_id
-        ).select_related('tenant', 'template').prefetch_related(
-            'messages__sender', 
-            'messages__receipts__user',
-            'messages__structured__template',
-            'messages__attachments',
+        ).select_related('tenant', 'template')
+        if self.action not in ('list', 'retrieve'):
+            # Detail actions page or stream messages themselves
+            return queryset.order_by('-created_at')
+
+        # Embed only each thread's newest messages; older ones are paged via messages/
+        recent = Message.objects.order_by('-sequence')[:ChatThreadSerializer.embedded_message_limit()]
+        queryset = ChatThreadSerializer.annotate_queryset(queryset, self.request.user)
+        return queryset.annotate(message_count=Count('messages', distinct=True)).prefetch_related(
+            Prefetch('messages', queryset=recent, to_attr='recent_messages'),
+            'recent_messages__sender', 
+            'recent_messages__receipts__user',
+            'recent_messages__structured__template',
+            'recent_messages__attachments',
             'template_responses__user'
         ).order_by('-created_at')
 
     def perform_create(self, serializer):
         tenant_id = self.request.user.tenant_id
-        thread = serializer.save(tenant_id=tenant_id)
-        
-        # Publish event
-        event_bus.publish_event("chat-events", {
-            "type": "thread_created",
-            "thread_id": thread.id,
-            "tenant_id": tenant_id,
-            "incident_id": thread.incident_id,
-            "created_by": self.request.user.username,
-        })
+        with transaction.atomic():
+            thread = serializer.save(tenant_id=tenant_id)
+            ThreadSubscription.subscribe(thread.id, [self.request.user.id])
+            OutboxService.emit("chat-events", {
+                "type": "thread_created",
+                "thread_id": thread.id,
+                "tenant_id": tenant_id,
+                "incident_id": thread.incident_id,
+                "created_by": self.request.user.username,
+            }, key=thread.id)
         
-        # Send push notifications to all tenant users
-        tokens = Device.objects.filter(
-            user__tenant_id=tenant_id
-        ).exclude(
-            user=self.request.user
-        ).values_list("token", flat=True)
+        # A new incident has no subscribers yet, so announce it to the whole tenant
+        tokens = DeviceTokenDirectory.tenant_tokens(tenant_id, exclude_user_ids=[self.request.user.id])
         
         push.send_push(tokens, "New thread", f"Incident {thread.incident_id}")
 
@@ -140,41 +169,99 @@ class ChatThreadViewSet(viewsets.ModelViewSet):
             except QuestionTemplate.DoesNotExist:
                 return Response({"error": "Template not found."}, status=400)
 
-        # Create thread and assign template
-        thread = ChatThread.objects.create(
-            tenant_id=tenant_id,
-            incident_id=incident_id,
-            template=template  # assign it to thread
-        )
-
-        # If template is valid, use it to render first message
-        if template:
-            try:
-                content = template.render(metadata)
-                Message.objects.create(thread=thread, sender=request.user, content=content)
-            except ValueError:
-                pass  # Skip if placeholders not filled
-
-        event_bus.publish_event("chat-events", {
-            "type": "thread_created",
-            "thread_id": thread.id,
-            "tenant_id": tenant_id,
-            "incident_id": incident_id,
-        })
-
-        tokens = Device.objects.filter(user__tenant_id=tenant_id).values_list("token", flat=True)
+        with transaction.atomic():
+            # Create thread and assign template
+            thread = ChatThread.objects.create(
+                tenant_id=tenant_id,
+                incident_id=incident_id,
+                template=template  # assign it to thread
+            )
+            ThreadSubscription.subscribe(thread.id, [request.user.id])
+
+            # If template is valid, use it to render first message
+            if template:
+                try:
+                    content = template.render(metadata)
+                    Message.objects.create(thread=thread, sender=request.user, content=content)
+                except ValueError:
+                    pass  # Skip if placeholders not filled
+
+            OutboxService.emit("chat-events", {
+                "type": "thread_created",
+                "thread_id": thread.id,
+                "tenant_id": tenant_id,
+                "incident_id": incident_id,
+            }, key=thread.id)
+
+        tokens = DeviceTokenDirectory.tenant_tokens(tenant_id)
         push.send_push(tokens, "New thread", f"Incident {incident_id}")
 
         serializer = self.get_serializer(thread)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+    @action(detail=True, methods=["get"], url_path="messages")
+    def messages(self, request, pk=None):
+        """Page through a thread's messages with ?before= / ?after= sequence cursors"""
+        thread = self.get_object()
+        queryset = Message.objects.filter(thread=thread).select_related('sender').prefetch_related(
+            'receipts__user',
+            'structured__template',
+            'attachments'
+        )
+        paginator = MessageCursorPagination()
+        issued_at = timezone.now()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        data = MessageSerializer(page, many=True, context={'request': request}).data
+        response = paginator.get_paginated_response(data)
+        if not paginator.has_newer and paginator.last_sequence is not None:
+            response.data['sync_cursor'] = ThreadSyncService.encode_cursor(
+                paginator.last_sequence, issued_at
+            )
+        return response
+
+    @action(detail=True, methods=["get"], url_path="sync")
+    def sync(self, request, pk=None):
+        """Catch up on a thread: everything that changed since ?cursor="""
+        thread = self.get_object()
+        cursor = request.query_params.get('cursor')
+        if not cursor:
+            return Response({"detail": "cursor is required"}, status=400)
+        try:
+            limit = int(request.query_params.get('limit', ThreadSyncService.DEFAULT_LIMIT))
+            return Response(ThreadSyncService.sync(thread, cursor, limit=limit, request=request))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
     @action(detail=True, methods=["get"], url_path="export")
     def export(self, request, pk=None):
+        """Stream the full thread history as a JSON array, one chunk of messages at a time"""
         thread = self.get_object()
-        messages = thread.messages.order_by("created_at")
-        data = MessageSerializer(messages, many=True).data
-        return Response(data)
+        chunk_size = 500
+
+        def fetch_chunk(after):
+            messages = list(
+                Message.objects.filter(thread=thread, sequence__gt=after).order_by('sequence')
+                .select_related('sender').prefetch_related('receipts__user', 'structured__template', 'attachments')
+                [:chunk_size]
+            )
+            data = MessageSerializer(messages, many=True, context={'request': request}).data
+            return [json.dumps(item, cls=JSONEncoder) for item in data], (
+                messages[-1].sequence if messages else None
+            )
+
+        async def stream():
+            # Async so ASGI servers send each chunk as it is read
+            yield '['
+            after, first = 0, True
+            while after is not None:
+                items, after = await sync_to_async(fetch_chunk)(after)
+                if items:
+                    yield ('' if first else ',') + ','.join(items)
+                    first = False
+            yield ']'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
 
     @action(detail=True, methods=['post'], url_path='template-response')
     def template_response(self, request, pk=None):
@@ -207,14 +294,25 @@ class ChatThreadViewSet(viewsets.ModelViewSet):
             id__in=message_ids
         ).exclude(sender=request.user)
         
+        unread_ids = list(
+            messages.exclude(receipts__user=request.user).values_list('id', flat=True)
+        )
+        
         created_receipts = []
-        for message in messages:
-            receipt, created = ReadReceipt.objects.get_or_create(
-                message=message,
-                user=request.user
+        if unread_ids:
+            timestamp = timezone.now()
+            ReadReceipt.objects.bulk_create(
+                [ReadReceipt(message_id=i, user=request.user, timestamp=timestamp) for i in unread_ids],
+                ignore_conflicts=True,
+                batch_size=1000,
+            )
+            # Receipts a concurrent request wrote first keep their own timestamp
+            created_receipts = list(
+                ReadReceipt.objects.filter(message_id__in=unread_ids, user=request.user, timestamp=timestamp)
+                .select_related('message', 'user')
             )
-            if created:
-                created_receipts.append(receipt)
+        if created_receipts:
+            ThreadReadState.advance(request.user.id, thread.id)
         
         # Return the newly created receipts
         serializer = ReadReceiptSerializer(created_receipts, many=True)
@@ -228,20 +326,28 @@ class ChatThreadViewSet(viewsets.ModelViewSet):
         """Mark all messages in thread as read"""
         thread = self.get_object()
         
+        # Messages arriving after this head are neither receipted nor covered by the watermark
+        head = thread.messages.aggregate(last=Max('sequence'))['last'] or 0
+        
         # Get all messages not sent by current user
-        messages = thread.messages.exclude(sender=request.user)
+        messages = thread.messages.filter(sequence__lte=head).exclude(sender=request.user)
+        unread_ids = list(
+            messages.exclude(receipts__user=request.user).values_list('id', flat=True)
+        )
         
-        created_receipts = []
-        for message in messages:
-            receipt, created = ReadReceipt.objects.get_or_create(
-                message=message,
-                user=request.user
+        with transaction.atomic():
+            # Per-message receipts keep read_by / read_receipts accurate;
+            # the watermark is what unread counts are computed from
+            timestamp = timezone.now()
+            ReadReceipt.objects.bulk_create(
+                [ReadReceipt(message_id=i, user=request.user, timestamp=timestamp) for i in unread_ids],
+                ignore_conflicts=True,
+                batch_size=1000,
             )
-            if created:
-                created_receipts.append(receipt)
+            ThreadReadState.mark_through(request.user.id, thread.id, head, timestamp)
         
         return Response({
-            'marked_read_count': len(created_receipts),
+            'marked_read_count': len(unread_ids),
             'total_messages': messages.count()
         })
 
@@ -256,6 +362,20 @@ class ChatThreadViewSet(viewsets.ModelViewSet):
         serializer = ReadReceiptSerializer(receipts, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get', 'post', 'delete'], url_path='watch')
+    def watch(self, request, pk=None):
+        """Get, start (POST) or stop (DELETE) notifications for this thread"""
+        thread = self.get_object()
+        if request.method == 'POST':
+            ThreadSubscription.subscribe(thread.id, [request.user.id], ThreadSubscription.WATCHER)
+        elif request.method == 'DELETE':
+            ThreadSubscription.objects.filter(thread=thread, user=request.user).delete()
+
+        reason = ThreadSubscription.objects.filter(
+            thread=thread, user=request.user
+        ).values_list('reason', flat=True).first()
+        return Response({'subscribed': reason is not None, 'reason': reason})
+
 
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
@@ -264,28 +384,44 @@ class MessageViewSet(viewsets.ModelViewSet):
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
     def get_queryset(self):
-        return self.queryset.filter(thread__tenant_id=self.request.user.tenant_id)
+        return self.queryset.filter(
+            thread__tenant_id=self.request.user.tenant_id
+        ).select_related('sender').prefetch_related(
+            'receipts__user',
+            'structured__template',
+            'attachments'
+        )
 
     def perform_create(self, serializer):
         template = serializer.validated_data.pop('template', None)
         answer = serializer.validated_data.pop('answer', None)
         files = serializer.validated_data.pop('files', [])
-        msg = serializer.save(sender=self.request.user)
-        for f in files:
-            Attachment.objects.create(message=msg, file=f)
-        template = template or msg.thread.template
-        if template and answer is not None:
-            StructuredReply.objects.create(message=msg, template=template, answer=answer)
-        integration.update_ticket_timeline(msg.thread.incident_id, msg.content)
-        event_bus.publish_event("chat-events", {
-            "type": "message_created",
-            "message_id": msg.id,
-            "thread_id": msg.thread_id,
-            "tenant_id": msg.thread.tenant_id,
-            "sender_id": msg.sender_id,
-        })
-        tokens = Device.objects.filter(user__tenant_id=msg.thread.tenant_id).exclude(user=msg.sender).values_list("token", flat=True)
-        push.send_push(tokens, "New message", msg.content)
+        with transaction.atomic():
+            msg = serializer.save(sender=self.request.user)
+            ThreadSubscription.subscribe_sender(msg.thread_id, self.request.user)
+            for f in files:
+                Attachment.objects.create(message=msg, file=f)
+            template = template or msg.thread.template
+            if template and answer is not None:
+                StructuredReply.objects.create(message=msg, template=template, answer=answer)
+            OutboxService.emit("chat-events", {
+                "type": "message_created",
+                "message_id": msg.id,
+                "thread_id": msg.thread_id,
+                "tenant_id": msg.thread.tenant_id,
+                "sender_id": msg.sender_id,
+            }, key=msg.thread_id)
+        itsm.update_ticket_timeline(
+            msg.thread.incident_id, msg.content, tenant_id=msg.thread.tenant_id,
+            author=msg.sender.username, timestamp=msg.created_at,
+        )
+        NotificationService.notify_message(msg.thread, msg)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            ActivityCounters.remove_messages(Message.objects.filter(pk=instance.pk))
+            instance.delete()
+            SLAService.invalidate_thread_rollup(instance.thread)
 
     @action(detail=False, methods=["get"], url_path="search")
     def search(self, request):
@@ -339,12 +475,11 @@ class AdminThreadViewSet(viewsets.ReadOnlyModelViewSet):
             qs = qs.filter(tenant_id=tenant)
         if incident:
             qs = qs.filter(incident_id=incident)
-        if sla in {"breached", "active"}:
-            threshold = timezone.now() - timedelta(hours=settings.INCIDENT_SLA_HOURS)
-            if sla == "breached":
-                qs = qs.filter(created_at__lt=threshold)
-            else:
-                qs = qs.filter(created_at__gte=threshold)
+        if sla == "breached":
+            qs = SLAService.filter_by_status(qs, sla)
+        elif sla == "active":
+            # Anything not yet breached, at risk included
+            qs = qs.filter(sla_deadline__gte=timezone.now())
         return qs
 
 
@@ -0,0 +1,68 @@
+from django.test import TestCase, override_settings
+from chat_svc.models import ChainCheckpoint, ChatThread, Message, Tenant, User
+from chat_svc.services.chain_verifier import ChainVerifier
+
+
+@override_settings(CHAIN_CHECKPOINT_INTERVAL=2)
+class ChainVerifierTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Acme")
+        self.user = User.objects.create(username="analyst", tenant=tenant)
+        self.thread = ChatThread.objects.create(tenant=tenant, incident_id="INC-1")
+        self.messages = [
+            Message.objects.create(thread=self.thread, sender=self.user, content=f"m{i}") for i in range(5)
+        ]
+
+    def test_intact_chain_writes_checkpoints(self):
+        result = ChainVerifier.verify_thread(self.thread.id)
+
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['verified_to'], 5)
+        self.assertEqual(
+            list(ChainCheckpoint.objects.filter(thread=self.thread).values_list('sequence', flat=True)), [2, 4]
+        )
+
+    def test_resumes_from_latest_checkpoint(self):
+        ChainVerifier.verify_thread(self.thread.id)
+
+        result = ChainVerifier.verify_thread(self.thread.id)
+
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['resumed_from_checkpoint'], 4)
+        self.assertEqual(result['messages_checked'], 1)
+
+    def test_tampered_message_breaks_chain(self):
+        Message.objects.filter(pk=self.messages[2].pk).update(content="edited")
+
+        result = ChainVerifier.verify_thread(self.thread.id)
+
+        self.assertEqual(result['status'], 'broken')
+        self.assertEqual(result['error']['sequence'], 3)
+        self.assertEqual(result['error']['reason'], 'hash does not match message contents')
+
+    def test_tampered_row_behind_checkpoint_found_by_full_run(self):
+        ChainVerifier.verify_thread(self.thread.id)
+        Message.objects.filter(pk=self.messages[0].pk).update(content="edited")
+
+        self.assertEqual(ChainVerifier.verify_thread(self.thread.id)['status'], 'ok')
+        self.assertEqual(ChainVerifier.verify_thread(self.thread.id, full=True)['status'], 'broken')
+
+    def test_forged_checkpoint_is_rejected(self):
+        ChainVerifier.verify_thread(self.thread.id)
+        ChainCheckpoint.objects.filter(thread=self.thread, sequence=4).update(hash="0" * 64)
+        Message.objects.filter(pk=self.messages[3].pk).update(content="edited")
+
+        result = ChainVerifier.verify_thread(self.thread.id)
+
+        self.assertTrue(result['rejected_checkpoints'])
+        self.assertEqual(result['resumed_from_checkpoint'], 2)
+        self.assertEqual(result['status'], 'broken')
+        self.assertEqual(result['error']['sequence'], 4)
+
+    def test_deleted_tail_is_detected(self):
+        Message.objects.filter(pk=self.messages[-1].pk).delete()
+
+        result = ChainVerifier.verify_thread(self.thread.id)
+
+        self.assertEqual(result['status'], 'broken')
+        self.assertIsNone(result['error']['message_id'])
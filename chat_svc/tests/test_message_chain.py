@@ -0,0 +1,79 @@
+import threading
+import time
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from chat_svc.models import ChatThread, Message, MessageChainHead, Tenant, User
+
+
+class MessageSequenceTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Acme")
+        self.user = User.objects.create(username="analyst", tenant=tenant)
+        self.thread = ChatThread.objects.create(tenant=tenant, incident_id="INC-1")
+
+    def test_sequences_and_chain_follow_insert_order(self):
+        messages = [Message.objects.create(thread=self.thread, sender=self.user, content=f"m{i}") for i in range(3)]
+
+        self.assertEqual([m.sequence for m in messages], [1, 2, 3])
+        self.assertEqual(messages[0].previous_hash, "")
+        self.assertEqual(messages[1].previous_hash, messages[0].hash)
+        self.assertEqual(messages[2].previous_hash, messages[1].hash)
+        head = MessageChainHead.objects.get(thread=self.thread)
+        self.assertEqual((head.last_sequence, head.last_hash), (3, messages[2].hash))
+
+    def test_sequences_are_per_thread(self):
+        other = ChatThread.objects.create(tenant=self.thread.tenant, incident_id="INC-2")
+        Message.objects.create(thread=self.thread, sender=self.user, content="a")
+
+        msg = Message.objects.create(thread=other, sender=self.user, content="b")
+
+        self.assertEqual(msg.sequence, 1)
+        self.assertEqual(msg.previous_hash, "")
+
+
+class ConcurrentMessageSequenceTests(TransactionTestCase):
+    writers = 4
+    per_writer = 5
+
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Acme")
+        self.users = [User.objects.create(username=f"analyst{i}", tenant=tenant) for i in range(self.writers)]
+        self.thread = ChatThread.objects.create(tenant=tenant, incident_id="INC-1")
+
+    def _create(self, user, content):
+        # SQLite's shared-cache test database fails a blocked writer instead of
+        # waiting; the rolled-back attempt must not leave a gap, so retry it
+        for _ in range(200):
+            try:
+                return Message.objects.create(thread=self.thread, sender=user, content=content)
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                time.sleep(0.005)
+        raise AssertionError("writer never got the lock")
+
+    def _write(self, user, errors):
+        try:
+            for i in range(self.per_writer):
+                self._create(user, f"{user.username}-{i}")
+        except Exception as e:  # pragma: no cover - reported by the assertion below
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_inserts_leave_gap_free_chain(self):
+        errors = []
+        workers = [threading.Thread(target=self._write, args=(user, errors)) for user in self.users]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        messages = list(Message.objects.filter(thread=self.thread).order_by('sequence'))
+        total = self.writers * self.per_writer
+        self.assertEqual([m.sequence for m in messages], list(range(1, total + 1)))
+        for previous, msg in zip([None] + messages, messages):
+            self.assertEqual(msg.previous_hash, previous.hash if previous else "")
+        head = MessageChainHead.objects.get(thread=self.thread)
+        self.assertEqual((head.last_sequence, head.last_hash), (total, messages[-1].hash))
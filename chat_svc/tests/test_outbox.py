@@ -0,0 +1,68 @@
+from unittest import mock
+from django.test import TestCase
+from chat_svc.models import OutboxEvent
+from chat_svc.services.outbox import OutboxService
+from integrations import event_bus
+
+
+class FailingTransport(event_bus.MemoryTransport):
+    """Delivers every record except those at ``fail_at`` indexes"""
+
+    def __init__(self, *fail_at):
+        super().__init__()
+        self.fail_at = set(fail_at)
+
+    def send_batch(self, records):
+        self.records.extend(r for index, r in enumerate(records) if index not in self.fail_at)
+        return [(index, RuntimeError(f"broker rejected {index}")) for index in sorted(self.fail_at)
+                if index < len(records)]
+
+
+class RelayBatchTests(TestCase):
+    def setUp(self):
+        self.events = [OutboxService.emit("chat-events", {"n": i}, key=1) for i in range(4)]
+
+    def relay(self, transport):
+        with mock.patch.object(event_bus, "get_transport", return_value=transport):
+            return OutboxService.relay_batch()
+
+    def relay_failing(self, transport):
+        with self.assertLogs("chat_svc.services.outbox", "ERROR"):
+            return self.relay(transport)
+
+    def test_marks_whole_batch_published(self):
+        transport = event_bus.MemoryTransport()
+
+        self.assertEqual(self.relay(transport), 4)
+
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+        self.assertEqual([record[1]["n"] for record in transport.records], [0, 1, 2, 3])
+        self.assertEqual(transport.records[0][1]["event_id"], str(self.events[0].event_id))
+
+    def test_stops_at_first_failed_index(self):
+        self.assertEqual(self.relay_failing(FailingTransport(3, 1)), 1)
+
+        published = OutboxEvent.objects.filter(published_at__isnull=False).values_list("id", flat=True)
+        self.assertEqual(list(published), [self.events[0].id])
+        stuck = OutboxEvent.objects.get(id=self.events[1].id)
+        self.assertEqual(stuck.attempts, 1)
+        self.assertEqual(stuck.last_error, "broker rejected 1")
+        # Events after the failure are left untouched for the next run
+        self.assertEqual(OutboxEvent.objects.get(id=self.events[2].id).attempts, 0)
+
+    def test_retry_resends_from_failed_event_in_order(self):
+        self.relay_failing(FailingTransport(2))
+        transport = event_bus.MemoryTransport()
+
+        self.assertEqual(self.relay(transport), 2)
+
+        self.assertEqual([record[1]["n"] for record in transport.records], [2, 3])
+
+    def test_transport_error_publishes_nothing(self):
+        transport = event_bus.MemoryTransport()
+        transport.send_batch = mock.Mock(side_effect=ConnectionError("down"))
+
+        self.assertEqual(self.relay_failing(transport), 0)
+
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=False).exists())
+        self.assertEqual(OutboxEvent.objects.get(id=self.events[0].id).last_error, "down")
@@ -0,0 +1,66 @@
+from django.test import TestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from chat_svc.models import ChatThread, Message, Tenant, User
+from chat_svc.tenant_api.pagination import MessageCursorPagination
+
+
+class MessageCursorPaginationTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Acme")
+        user = User.objects.create(username="analyst", tenant=tenant)
+        self.thread = ChatThread.objects.create(tenant=tenant, incident_id="INC-1")
+        for i in range(7):
+            Message.objects.create(thread=self.thread, sender=user, content=f"m{i}")
+
+    def paginate(self, **params):
+        paginator = MessageCursorPagination()
+        request = Request(APIRequestFactory().get('/messages/', {'page_size': 3, **params}))
+        rows = paginator.paginate_queryset(Message.objects.filter(thread=self.thread), request)
+        return paginator, [row.sequence for row in rows]
+
+    def test_default_page_is_newest(self):
+        paginator, sequences = self.paginate()
+
+        self.assertEqual(sequences, [5, 6, 7])
+        self.assertTrue(paginator.has_older)
+        self.assertFalse(paginator.has_newer)
+
+    def test_before_excludes_cursor(self):
+        paginator, sequences = self.paginate(before=5)
+
+        self.assertEqual(sequences, [2, 3, 4])
+        self.assertTrue(paginator.has_older)
+        self.assertTrue(paginator.has_newer)
+
+    def test_before_reaching_first_message(self):
+        paginator, sequences = self.paginate(before=3)
+
+        self.assertEqual(sequences, [1, 2])
+        self.assertFalse(paginator.has_older)
+
+    def test_after_excludes_cursor(self):
+        paginator, sequences = self.paginate(after=2)
+
+        self.assertEqual(sequences, [3, 4, 5])
+        self.assertTrue(paginator.has_older)
+        self.assertTrue(paginator.has_newer)
+
+    def test_after_tip_is_empty_and_keeps_cursor(self):
+        paginator, sequences = self.paginate(after=7)
+
+        self.assertEqual(sequences, [])
+        self.assertFalse(paginator.has_newer)
+        self.assertEqual(paginator.last_sequence, 7)
+
+    def test_after_zero_has_nothing_older(self):
+        paginator, sequences = self.paginate(after=0)
+
+        self.assertEqual(sequences, [1, 2, 3])
+        self.assertFalse(paginator.has_older)
+
+    def test_invalid_cursor(self):
+        for params in ({'before': 'abc'}, {'after': '-1'}):
+            with self.subTest(params=params), self.assertRaises(NotFound):
+                self.paginate(**params)
@@ -0,0 +1,43 @@
+from django.test import TestCase
+from chat_svc.models import ChatThread, Message, ReadReceipt, Tenant, ThreadReadState, User
+
+
+class ThreadReadStateTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Acme")
+        self.reader = User.objects.create(username="reader", tenant=tenant)
+        self.sender = User.objects.create(username="sender", tenant=tenant)
+        self.thread = ChatThread.objects.create(tenant=tenant, incident_id="INC-1")
+        self.messages = [
+            Message.objects.create(thread=self.thread, sender=self.sender, content=f"m{i}") for i in range(4)
+        ]
+
+    def read(self, *indexes):
+        for index in indexes:
+            ReadReceipt.objects.create(message=self.messages[index], user=self.reader)
+        return ThreadReadState.advance(self.reader.id, self.thread.id)
+
+    def watermark(self):
+        return ThreadReadState.objects.get(user=self.reader, thread=self.thread).last_read_sequence
+
+    def test_out_of_order_reads_stop_at_first_unread(self):
+        self.assertEqual(self.read(1, 2), 0)
+        self.assertFalse(ThreadReadState.objects.filter(user=self.reader, thread=self.thread).exists())
+
+        self.assertEqual(self.read(0), 3)
+        self.assertEqual(self.watermark(), 3)
+
+        self.assertEqual(self.read(3), 4)
+        self.assertEqual(self.watermark(), 4)
+
+    def test_own_messages_do_not_hold_back_watermark(self):
+        Message.objects.create(thread=self.thread, sender=self.reader, content="reply")
+
+        self.assertEqual(self.read(0, 1, 2, 3), 5)
+
+    def test_watermark_never_moves_back(self):
+        self.read(0, 1, 2, 3)
+
+        ThreadReadState.mark_through(self.reader.id, self.thread.id, 2)
+
+        self.assertEqual(self.watermark(), 4)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from chat_svc.models import (
+    ChatThread, Message, OutboxEvent, SLADailyRollup, Tenant, TenantConfiguration, User,
+)
+from chat_svc.services.sla_service import SLAService
+
+
+class TenantSLAReportTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Acme")
+        now = timezone.now()
+        for i in range(5):
+            ChatThread.objects.create(tenant=self.tenant, incident_id=f"INC-{i}")
+        # Settled day: created three days ago, two threads past their deadline
+        created = now - timedelta(days=3)
+        threads = ChatThread.objects.filter(tenant=self.tenant).order_by('id')
+        ChatThread.objects.filter(id__in=list(threads.values_list('id', flat=True)[:2])).update(
+            created_at=created, sla_warning_at=created, sla_deadline=created + timedelta(hours=1),
+        )
+        ChatThread.objects.filter(id__in=list(threads.values_list('id', flat=True)[2:])).update(
+            created_at=created, sla_warning_at=now + timedelta(days=1), sla_deadline=now + timedelta(days=2),
+        )
+
+    def test_report_includes_rollups_built_on_first_use(self):
+        self.assertFalse(SLADailyRollup.objects.filter(tenant=self.tenant).exists())
+
+        report = SLAService.get_tenant_sla_report(self.tenant, days=7)
+
+        self.assertEqual(report['total_threads'], 5)
+        self.assertEqual(report['breached_threads'], 2)
+        self.assertEqual(report['sla_compliance_rate'], 60.0)
+        self.assertTrue(SLADailyRollup.objects.filter(tenant=self.tenant).exists())
+
+    def test_report_after_rollup_invalidated(self):
+        first = SLAService.get_tenant_sla_report(self.tenant, days=7)
+        SLAService.invalidate_rollups(self.tenant.id)
+
+        second = SLAService.get_tenant_sla_report(self.tenant, days=7)
+
+        self.assertEqual(second['total_threads'], first['total_threads'])
+        self.assertEqual(second['breached_threads'], first['breached_threads'])
+
+
+class SLAClaimTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Acme")
+        TenantConfiguration.objects.create(tenant=self.tenant)
+        self.staff = User.objects.create(username="system", is_staff=True)
+        self.thread = ChatThread.objects.create(tenant=self.tenant, incident_id="INC-1")
+
+    def test_only_one_worker_claims_a_transition(self):
+        first = ChatThread.objects.get(pk=self.thread.pk)
+        second = ChatThread.objects.get(pk=self.thread.pk)
+
+        self.assertTrue(SLAService._claim(first, ChatThread.SLA_STAGE_WARNED))
+        self.assertFalse(SLAService._claim(second, ChatThread.SLA_STAGE_WARNED))
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.sla_stage, ChatThread.SLA_STAGE_WARNED)
+        self.assertEqual(self.thread.sla_next_at, self.thread.sla_deadline)
+
+    def test_due_breach_is_recorded_once(self):
+        ChatThread.objects.filter(pk=self.thread.pk).update(created_at=timezone.now() - timedelta(days=2))
+        self.thread.refresh_from_db()
+        SLAService.schedule(self.thread)
+        stale = ChatThread.objects.get(pk=self.thread.pk)
+
+        first = SLAService.process_due()
+        second = SLAService.process_due()
+
+        self.assertEqual(len(first['violations']), 1)
+        self.assertEqual(second['total_threads_checked'], 0)
+        self.assertFalse(SLAService._handle_sla_breach(stale, SLAService.get_thread_sla_status(stale), self.staff))
+        self.assertEqual(Message.objects.filter(thread=self.thread, sender=self.staff).count(), 1)
+        self.assertEqual(OutboxEvent.objects.filter(topic="sla-events").count(), 1)
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone as dt_timezone
+from django.test import TestCase
+from rest_framework.test import APIClient
+from chat_svc.models import ChatThread, Message, Tenant, User
+from chat_svc.services.thread_sync import ThreadSyncService
+
+
+class SyncCursorTests(TestCase):
+    def test_round_trip(self):
+        moment = datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=dt_timezone.utc)
+
+        cursor = ThreadSyncService.encode_cursor(42, moment)
+
+        self.assertEqual(cursor, f"42:{int(moment.timestamp() * 1000)}")
+        self.assertEqual(ThreadSyncService.decode_cursor(cursor), (42, moment))
+
+    def test_malformed_cursors(self):
+        for cursor in (None, "", "abc", "42", "x:1", "1:x", "-1:1000", "1:-1000", "1.5:1000"):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                ThreadSyncService.decode_cursor(cursor)
+
+
+class ThreadSyncTests(TestCase):
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Acme")
+        self.user = User.objects.create(username="analyst", tenant=tenant)
+        self.thread = ChatThread.objects.create(tenant=tenant, incident_id="INC-1")
+        for i in range(5):
+            Message.objects.create(thread=self.thread, sender=self.user, content=f"m{i}")
+
+    def test_cursor_for_points_at_chain_head(self):
+        sequence, _ = ThreadSyncService.decode_cursor(ThreadSyncService.cursor_for(self.thread.id))
+
+        self.assertEqual(sequence, 5)
+
+    def test_sync_pages_messages_after_cursor(self):
+        cursor = ThreadSyncService.encode_cursor(1, datetime.now(dt_timezone.utc))
+
+        first = ThreadSyncService.sync(self.thread, cursor, limit=3, include_presence=False)
+        second = ThreadSyncService.sync(self.thread, first['cursor'], limit=3, include_presence=False)
+
+        self.assertEqual([m['sequence'] for m in first['messages']], [2, 3, 4])
+        self.assertTrue(first['has_more'])
+        self.assertEqual([m['sequence'] for m in second['messages']], [5])
+        self.assertFalse(second['has_more'])
+
+    def test_sync_rejects_malformed_cursor(self):
+        with self.assertRaises(ValueError):
+            ThreadSyncService.sync(self.thread, "garbage", include_presence=False)
+
+    def test_admin_thread_sync_cursor_is_thread_head_for_older_pages(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get(f"/api/admin/threads/{self.thread.id}/", {"before": 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['sequence'] for m in response.data['messages']], [1, 2])
+        self.assertEqual(ThreadSyncService.decode_cursor(response.data['sync_cursor'])[0], 5)
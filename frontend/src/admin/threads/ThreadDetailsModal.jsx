@@ -35,7 +35,7 @@ export default function ThreadDetailsModal({ thread, onClose, tenants, templates
       
       if (response.ok) {
         const messageData = await response.json()
-        setMessages(messageData)
+        setMessages(messageData.results || messageData)
       } else {
         console.error('Failed to load messages:', response.status)
       }
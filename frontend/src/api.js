@@ -50,6 +50,7 @@ export async function getThreads(token, params = {}) {
   if (params.sort_direction) queryParams.append('sort_direction', params.sort_direction)
   if (params.page_size) queryParams.append('page_size', params.page_size)
   if (params.page) queryParams.append('page', params.page)
+  if (params.view) queryParams.append('view', params.view)
   
   const queryString = queryParams.toString()
   const url = `${API_BASE}/threads/${queryString ? `?${queryString}` : ''}`
@@ -72,6 +73,21 @@ export async function getMessages(threadId, token) {
   return Array.isArray(messages) ? messages.filter(m => m.thread === threadId) : messages
 }
 
+export async function getThreadMessages(threadId, token, params = {}) {
+  const queryParams = new URLSearchParams()
+  if (params.before) queryParams.append('before', params.before)
+  if (params.after) queryParams.append('after', params.after)
+  if (params.page_size) queryParams.append('page_size', params.page_size)
+
+  const queryString = queryParams.toString()
+  const url = `${API_BASE}/threads/${threadId}/messages/${queryString ? `?${queryString}` : ''}`
+  const res = await fetchWithRetry(url, {
+    headers: { Authorization: `Bearer ${token}` }
+  })
+  // { results, has_older, has_newer, before_cursor, after_cursor, previous, next }
+  return res.json()
+}
+
 export async function sendMessage(threadId, content, token) {
   const res = await fetchWithRetry(`${API_BASE}/messages/`, {
     method: 'POST',
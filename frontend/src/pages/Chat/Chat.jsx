@@ -54,7 +54,7 @@ export default function Chat() {
     wsRef,
     initialMessageIds,
     messageEls,
-  } = useChatSocket(id, token, messages, setMessages, user)
+  } = useChatSocket(id, token, messages, setMessages, user, threadDetails?.sync_cursor)
 
   useReadReceipts(messages, readReceipts, user, wsRef, initialMessageIds, messageEls)
 
@@ -68,15 +68,13 @@ export default function Chat() {
         !(readReceipts[m.id] || []).includes(user.username)
       )
       
-      // Mark up to 10 messages as read at a time to avoid spam
-      unreadMessages.slice(0, 10).forEach(message => {
-        if (wsRef.current?.readyState === WebSocket.OPEN) {
-          wsRef.current.send(JSON.stringify({ 
-            type: 'read', 
-            message_id: message.id 
-          }))
-        }
-      })
+      // Mark everything loaded as read in a single batched frame
+      if (unreadMessages.length > 0 && wsRef.current?.readyState === WebSocket.OPEN) {
+        wsRef.current.send(JSON.stringify({ 
+          type: 'read', 
+          message_ids: unreadMessages.map(m => m.id)
+        }))
+      }
     }, 2000) // 2 second delay after messages load
     
     return () => clearTimeout(timer)
@@ -136,15 +134,13 @@ export default function Chat() {
           })
           .map(m => m.id)
         
-        // Send read receipts for all unread messages
-        unreadMessageIds.forEach(msgId => {
-          if (wsRef.current?.readyState === WebSocket.OPEN) {
-            wsRef.current.send(JSON.stringify({ 
-              type: 'read', 
-              message_id: msgId 
-            }))
-          }
-        })
+        // Send read receipts for all unread messages in one frame
+        if (unreadMessageIds.length > 0 && wsRef.current?.readyState === WebSocket.OPEN) {
+          wsRef.current.send(JSON.stringify({ 
+            type: 'read', 
+            message_ids: unreadMessageIds
+          }))
+        }
       }
     } catch (error) {
       console.error('Failed to mark all as read:', error)
@@ -1,8 +1,10 @@
 // src/hooks/useChatSocket.js
 import { useEffect, useRef, useState } from 'react'
 
-export function useChatSocket(id, token, messages, setMessages, user) {
+export function useChatSocket(id, token, messages, setMessages, user, syncCursor) {
   const wsRef = useRef(null)
+  // "<last sequence>:<epoch ms>" — lets a reconnect fetch only what it missed
+  const cursorRef = useRef(null)
   const initialMessageIds = useRef(new Set(messages.map(m => m.id)))
   const messageEls = useRef({})
   const [online, setOnline] = useState([])
@@ -10,6 +12,10 @@ export function useChatSocket(id, token, messages, setMessages, user) {
   const [readReceipts, setReadReceipts] = useState({})
   const [wsError, setWsError] = useState('')
 
+  useEffect(() => {
+    if (syncCursor && !cursorRef.current) cursorRef.current = syncCursor
+  }, [syncCursor])
+
   useEffect(() => {
     if (!token) {
       return // Don't try to connect without a valid token
@@ -21,7 +27,8 @@ export function useChatSocket(id, token, messages, setMessages, user) {
       const scheme = location.protocol === 'https:' ? 'wss' : 'ws'
       // Use Django server port for WebSocket connections
       const wsBase = `${scheme}://localhost:8000/ws/chat`
-      const wsUrl = `${wsBase}/${id}/?token=${token}`
+      const since = cursorRef.current ? `&since=${encodeURIComponent(cursorRef.current)}` : ''
+      const wsUrl = `${wsBase}/${id}/?token=${token}${since}`
       
       console.log(`Attempting WebSocket connection to: ${wsUrl}`)
       socket = new WebSocket(wsUrl)
@@ -36,6 +43,10 @@ export function useChatSocket(id, token, messages, setMessages, user) {
         const msg = JSON.parse(evt.data)
         switch (msg.type) {
           case 'message':
+            if (msg.sequence && cursorRef.current) {
+              const [seq, time] = cursorRef.current.split(':')
+              if (msg.sequence > Number(seq)) cursorRef.current = `${msg.sequence}:${time}`
+            }
             setMessages(prev => {
               // Check if message already exists
               if (prev.some(m => m.id === msg.id)) return prev
@@ -45,6 +56,32 @@ export function useChatSocket(id, token, messages, setMessages, user) {
               return updatedMessages.sort((a, b) => new Date(a.created_at) - new Date(b.created_at))
             })
             break
+          case 'sync': {
+            // Catch-up after (re)connecting: merge missed messages and receipts
+            cursorRef.current = msg.cursor
+            const receiptsByMessage = {}
+            msg.read_receipts.forEach(r => {
+              (receiptsByMessage[r.message_id] = receiptsByMessage[r.message_id] || []).push(r)
+            })
+            setMessages(prev => {
+              const known = new Set(prev.map(m => m.id))
+              const merged = prev.map(message => {
+                const added = (receiptsByMessage[message.id] || [])
+                  .filter(r => !(message.read_receipts || []).some(e => e.user === r.user))
+                if (added.length === 0) return message
+                const receipts = [...(message.read_receipts || []), ...added.map(r => ({ user: r.user, timestamp: r.timestamp }))]
+                return {
+                  ...message,
+                  read_receipts: receipts,
+                  read_by: receipts.map(r => r.user),
+                  read_count: receipts.length
+                }
+              })
+              msg.messages.forEach(m => { if (!known.has(m.id)) merged.push(m) })
+              return merged.sort((a, b) => (a.sequence || 0) - (b.sequence || 0) || new Date(a.created_at) - new Date(b.created_at))
+            })
+            break
+          }
           case 'typing':
             setTypingUsers(list => {
               if (list.includes(msg.user)) return list
@@ -53,17 +90,21 @@ export function useChatSocket(id, token, messages, setMessages, user) {
               return next
             })
             break
-          case 'read':
+          case 'read': {
+            const ids = msg.message_ids || [msg.message_id]
             setReadReceipts(prev => {
-              const seen = prev[msg.message_id] || []
-              if (seen.includes(msg.user)) return prev
-              return { ...prev, [msg.message_id]: [...seen, msg.user] }
+              const next = { ...prev }
+              ids.forEach(id => {
+                const seen = next[id] || []
+                if (!seen.includes(msg.user)) next[id] = [...seen, msg.user]
+              })
+              return next
             })
             
             // Update messages with enhanced read receipt data
             setMessages(prevMessages => 
               prevMessages.map(message => {
-                if (message.id === msg.message_id) {
+                if (ids.includes(message.id)) {
                   const updatedReceipts = [...(message.read_receipts || [])]
                   const existingReceiptIndex = updatedReceipts.findIndex(r => r.user === msg.user)
                   
@@ -85,6 +126,7 @@ export function useChatSocket(id, token, messages, setMessages, user) {
               })
             )
             break
+          }
           case 'presence':
             setOnline(list => {
               const next = new Set(list)
@@ -92,6 +134,9 @@ export function useChatSocket(id, token, messages, setMessages, user) {
               return Array.from(next)
             })
             break
+          case 'presence_snapshot':
+            setOnline(list => Array.from(new Set([...list, ...msg.users])))
+            break
         }
       }
 
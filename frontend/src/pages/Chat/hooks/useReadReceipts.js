@@ -13,14 +13,11 @@ export function useReadReceipts(messages, readReceipts, user, wsRef, initialMess
       if (pendingReads.current.size > 0 && wsRef.current?.readyState === WebSocket.OPEN) {
         const messageIds = Array.from(pendingReads.current)
         
-        // Send individual read receipts for real-time updates
-        messageIds.forEach(msgId => {
-          wsRef.current.send(JSON.stringify({ 
-            type: 'read', 
-            message_id: parseInt(msgId),
-            timestamp: Date.now()
-          }))
-        })
+        // Send the whole batch in one frame; the server coalesces further
+        wsRef.current.send(JSON.stringify({ 
+          type: 'read', 
+          message_ids: messageIds.map(msgId => parseInt(msgId))
+        }))
         
         pendingReads.current.clear()
         lastBatchSent.current = Date.now()